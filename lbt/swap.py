@@ -4,12 +4,85 @@ from collections.abc import Sequence  # typ.Sequence deprecated
 import os
 from sys import argv
 import json
+import argparse
+import subprocess
 import ntpath
 import re
+import shutil
+import hashlib
+import tempfile
+import csv
+import time
+import datetime
+import multiprocessing
+import collections
+import socketserver
+import contextlib
+import signal
+import sys
 path = os.path
 # from ladybug_rhino.openstudio import load_osm, dump_osm, import_openstudio
 
 
+SWAP_VERSION = "3.2.0"
+CACHE_DPATH = os.environ.get(
+    "THERMAL_CACHE", path.join(path.expanduser("~"), ".thermal_cache"))
+# Sim cache entries past this size are evicted, least recently used first
+SIM_CACHE_MB = float(os.environ.get("THERMAL_SIM_CACHE_MB", 20000))
+SWAP_PORT = int(os.environ.get("THERMAL_SWAP_PORT", 52781))
+REF_BUNDLE_FEATURE = "swap_ref_bundle"
+REF_BUNDLE_FNAME = "ref_bundle.osm"
+# Swap cache entry names of osm, osw, which vary w/ the inputs' names
+SWAP_CACHE_NAMES = ["osm_swap.osm", "osw_swap.osw"]
+SIM_OUT_FNAMES = [
+    "eplusout.sql", "eplustbl.htm", "eplusout.err", "epluszsz.csv"]
+# Compacted outputs (see swap/results.py compact_run), cached in place
+# of the sql once it's archived or dropped
+SIM_COMPACT_FNAMES = ["results.json", "results.npz", "eplusout.sql.gz"]
+SIM_POLL = 1.0  # secs between eplusout.err checks while sim runs
+# "   ** Severe  ** ...", "   **  Fatal  ** ..." lines of eplusout.err
+ERR_LINE_RE = re.compile(
+    r"^\s*\*\*\s*(Warning|Severe|Fatal)\s*\*\*\s?(.*)")
+ERR_CONT_RE = re.compile(r"^\s*\*\*\s*~~~\s*\*\*\s?(.*)")
+ERR_END_RE = re.compile(r"EnergyPlus (Completed Successfully|Terminated)")
+# Object names, numbers stripped from msgs to group them by template
+ERR_TEMPLATE_SUBS = [
+    (re.compile(r'"[^"]*"'), '"*"'),
+    (re.compile(r"'[^']*'"), "'*'"),
+    (re.compile(r"=\s*[^\s,;=\"'*]+"), "=*"),
+    (re.compile(r"[-+]?\d+(\.\d*)?([eE][-+]?\d+)?"), "#")]
+ERR_SEVERITIES = ("Fatal", "Severe", "Warning")
+# Ann Htg 99.6%, Ann Clg .4% DB=>MWB: the DOE prototype sizing days
+DDY_SELECTORS = ("Htg 99.6% Condns DB", "Clg .4% Condns DB=>MWB")
+DDY_COND_RE = re.compile(
+    r"\b((?:Ann|Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Oct|Nov|Dec)\b.*)$")
+ERR_MAX_GROUPS = 1000  # per run, further templates count as '<other>'
+# Representative periods next to a screening osw, see swap/screen.py
+SCREEN_FNAME = "screen.json"
+SCREEN_METERS = ("Electricity:Facility", "NaturalGas:Facility")
+EPLUS_EXE = os.environ.get("THERMAL_EPLUS", "energyplus")
+# Output requests (name, frequency) of each reporting profile, names w/
+# ':' are meters. W/o a profile, the seed model's requests are kept.
+FACILITY_METERS = ("Electricity:Facility", "NaturalGas:Facility")
+COMFORT_VARS = ("Site Outdoor Air Drybulb Temperature",
+                "Zone Mean Air Temperature", "Zone Operative Temperature",
+                "Zone Air Relative Humidity")
+HVAC_VARS = ("Zone Air System Sensible Heating Rate",
+             "Zone Air System Sensible Cooling Rate",
+             "System Node Temperature", "System Node Mass Flow Rate")
+OUTPUT_PROFILES = {
+    "eui-only": [(m, "Monthly") for m in FACILITY_METERS],
+    "comfort-hourly": [(v, "Hourly") for v in
+                       FACILITY_METERS + COMFORT_VARS],
+    "full-debug": [(v, "Timestep") for v in
+                   FACILITY_METERS + COMFORT_VARS + HVAC_VARS]}
+# '*' keys of vars expand to one per object of kind, by name prefix
+OUTPUT_KEY_KINDS = (("Site ", "site"), ("Surface ", "surfaces"),
+                    ("System Node ", "nodes"), ("Air System ", "airloops"))
+SQL_ROW_BYTES = 40  # ReportData row, incl. its index
+SQL_BASE_MB = 5.0  # tabular reports, dictionaries, model tables
+
+
 # TODO: fix the Hardcode edits
 STDTAG_DICT = {
     "Office WholeBuilding - Md Office": {
@@ -32,6 +105,10 @@ class InitError(Exception):
         self.msg = f"Init error for {mobj}:\n"
 
 
+class SimAbortError(Exception):
+    """Simulation killed by the eplusout.err watchdog."""
+
+
 def assert_init(mobj):
     """Identity fn that validates optional model parameters."""
     if not mobj.is_initialized():
@@ -109,6 +186,473 @@ def dump_osw(osw_dict, osw_fpath):
     return osw_fpath
 
 
+def hash_fpaths(*fpaths, extra=()):
+    """Sha256 hexdigest of file contents and extra strings."""
+    h = hashlib.sha256()
+    for fpath in fpaths:
+        with open(fpath, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                h.update(chunk)
+    for s in extra:
+        h.update(str(s).encode('utf-8'))
+    return h.hexdigest()
+
+
+def cache_load(key, dst_fpaths, kind="swap", names=None, required=None):
+    """Copy cached artifacts for key to dst_fpaths, True if cache hit.
+
+    Entry files are looked up by names (default dst basenames). It's a
+    hit only if the required names (default all) are in the entry,
+    others that are missing were never produced.
+    """
+    key_dpath = path.join(CACHE_DPATH, kind, key)
+    names = names or [path.basename(f) for f in dst_fpaths]
+    required = names if required is None else required
+    if not all(path.exists(path.join(key_dpath, n)) for n in required):
+        return False
+    for name, dst_fpath in zip(names, dst_fpaths):
+        src_fpath = path.join(key_dpath, name)
+        if path.exists(src_fpath):
+            shutil.copyfile(src_fpath, dst_fpath)
+    os.utime(key_dpath)  # last used, for cache_prune
+    return True
+
+
+def cache_dump(key, src_fpaths, kind="swap", names=None):
+    """Copy artifacts to cache dir for key as names, return cache dir.
+
+    Files are copied to a tmp dir and renamed, so concurrent swaps
+    never see a half-written cache entry.
+    """
+    key_dpath = path.join(CACHE_DPATH, kind, key)
+    tmp_dpath = "{}.tmp{}".format(key_dpath, os.getpid())
+    os.makedirs(tmp_dpath, exist_ok=True)
+    names = names or [path.basename(f) for f in src_fpaths]
+    for src_fpath, name in zip(src_fpaths, names):
+        shutil.copyfile(src_fpath, path.join(tmp_dpath, name))
+    try:
+        os.replace(tmp_dpath, key_dpath)
+    except OSError:
+        # Already cached by another process
+        shutil.rmtree(tmp_dpath, ignore_errors=True)
+    return key_dpath
+
+
+def cache_prune(kind, max_mb):
+    """Delete least recently used entries of kind past max_mb, return keys.
+
+    The most recent entry is always kept.
+    """
+    kind_dpath = path.join(CACHE_DPATH, kind)
+    if not path.isdir(kind_dpath):
+        return []
+    entries = []
+    for key in os.listdir(kind_dpath):
+        key_dpath = path.join(kind_dpath, key)
+        if ".tmp" in key or not path.isdir(key_dpath):
+            continue
+        size = sum(path.getsize(path.join(key_dpath, f))
+                   for f in os.listdir(key_dpath))
+        entries.append((path.getmtime(key_dpath), size, key))
+    total, keys = 0, []
+    for i, (_, size, key) in enumerate(sorted(entries, reverse=True)):
+        total += size
+        if i and total > max_mb * 1e6:
+            shutil.rmtree(path.join(kind_dpath, key), ignore_errors=True)
+            keys.append(key)
+    return keys
+
+
+def swap_cache_key(osw_dict, osm_fpath, ref_osm_fpath, epw_fpath,
+                   ddy_fpath=None, ddy_select=DDY_SELECTORS,
+                   output_profile=None):
+    """Cache key of swap inputs and swap code (this file) version.
+
+    The seed osw is hashed as canonical json, so an osw_dict passed
+    in-process and the same dict read from file share a key.
+    """
+    osw_json = json.dumps(osw_dict, sort_keys=True)
+    fpaths, extra = [osm_fpath, ref_osm_fpath, epw_fpath, __file__], \
+        [SWAP_VERSION, epw_fpath, osw_json]
+    if ddy_fpath:
+        fpaths.append(ddy_fpath)
+        extra.extend(ddy_select)
+    if output_profile:
+        extra.append("outputs=" + output_profile)
+    return hash_fpaths(*fpaths, extra=extra)
+
+
+def sim_cache_key(osw_fpath):
+    """Cache key of effective sim inputs: seed osm, epw, osw steps.
+
+    Relative seed/weather paths resolve from the osw dir, as openstudio
+    does. Measure code is not hashed, only the step args.
+    """
+    osw_dict = load_osw(osw_fpath)
+    osw_dpath = path.dirname(path.abspath(osw_fpath))
+    osm_fpath, epw_fpath = [
+        path.join(osw_dpath, osw_dict[k])
+        for k in ("seed_file", "weather_file")]
+    steps = json.dumps(osw_dict.get("steps", []), sort_keys=True)
+    fpaths = [osm_fpath, epw_fpath]
+    screen_fpath = path.join(osw_dpath, SCREEN_FNAME)
+    if path.exists(screen_fpath):
+        fpaths.append(screen_fpath)
+    return hash_fpaths(*fpaths, extra=("sim", steps))
+
+
+class ErrWatch:
+    """Incremental reader of eplusout.err while EnergyPlus writes it.
+
+    Each poll reads only what's new since the last one, and counts
+    Warning, Severe, Fatal lines. poll returns an abort reason once a
+    line of abort_on severity appears, or warnings reach max_warnings.
+    """
+
+    def __init__(self, err_fpath, abort_on=("Severe", "Fatal"),
+                 max_warnings=None, max_msgs=20):
+        self.err_fpath, self.abort_on = err_fpath, set(abort_on)
+        self.max_warnings, self.max_msgs = max_warnings, max_msgs
+        self.counts = {"Warning": 0, "Severe": 0, "Fatal": 0}
+        self.msgs, self.reason = [], None
+        self._offset, self._buf = 0, ""
+
+    def poll(self):
+        """Read new err lines, return abort reason or None."""
+        if not path.exists(self.err_fpath):
+            return self.reason
+        with open(self.err_fpath, "rb") as f:
+            _ = f.seek(self._offset)
+            chunk = f.read()
+        self._offset += len(chunk)
+        # Keep partial last line for next poll
+        lines = (self._buf + chunk.decode("latin-1")).split("\n")
+        self._buf = lines.pop()
+        for line in lines:
+            self._parse_line(line)
+        return self.reason
+
+    def _parse_line(self, line):
+        mobj = ERR_LINE_RE.match(line)
+        if not mobj:
+            return
+        severity, msg = mobj.group(1), mobj.group(2).strip()
+        self.counts[severity] += 1
+        if severity != "Warning" and len(self.msgs) < self.max_msgs:
+            self.msgs.append(f"{severity}: {msg}")
+        if self.reason:
+            return
+        if severity in self.abort_on:
+            self.reason = f"{severity}: {msg}"
+        elif self.max_warnings and self.counts["Warning"] >= self.max_warnings:
+            self.reason = f"{self.counts['Warning']} warnings"
+
+    def summary(self):
+        """Json-able counts, severe/fatal msgs and abort reason."""
+        return {"counts": dict(self.counts), "messages": list(self.msgs),
+                "aborted": self.reason}
+
+
+def err_template(msg):
+    """Msg w/ quoted or '=' object names and numbers replaced by * and #.
+
+        'Zone="CORE_ZN" has 3.2 m2 glass' -> 'Zone="*" has # m# glass'
+    """
+    for regex, sub in ERR_TEMPLATE_SUBS:
+        msg = regex.sub(sub, msg)
+    return " ".join(msg.split())
+
+
+def iter_err_msgs(err_fpath, max_lines=5):
+    """Yields (severity, msg) of err file, w/ '~~~' lines joined to msg.
+
+    Streams the file by line, so memory is constant for any size.
+    """
+    severity, lines = None, []
+    with open(err_fpath, "r", encoding="latin-1") as f:
+        for line in f:
+            mobj = ERR_LINE_RE.match(line)
+            if mobj:
+                if severity:
+                    yield severity, " | ".join(lines)
+                severity, lines = mobj.group(1), [mobj.group(2).strip()]
+                continue
+            mobj = ERR_CONT_RE.match(line)
+            if mobj and severity and len(lines) < max_lines:
+                lines.append(mobj.group(1).strip())
+    if severity:
+        yield severity, " | ".join(lines)
+
+
+def _add_err_group(groups, severity, template, example, count=1, runs=1):
+    """Add count to (severity, template) group, w/ bounded group count."""
+    key = (severity, template)
+    if key not in groups and len(groups) >= ERR_MAX_GROUPS:
+        key = (severity, "<other>")
+    group = groups.setdefault(key, {
+        "severity": severity, "template": key[1], "count": 0, "runs": 0,
+        "example": example})
+    group["count"] += count
+    group["runs"] += runs
+
+
+def _sort_err_groups(groups, top=None):
+    """Groups by severity, then count; top per severity if given."""
+    rows = []
+    for severity in ERR_SEVERITIES:
+        sev_rows = sorted((g for g in groups.values()
+                           if g["severity"] == severity),
+                          key=lambda g: -g["count"])
+        rows.extend(sev_rows[:top] if top else sev_rows)
+    return rows
+
+
+def parse_err(err_fpath, top=None):
+    """Summary of eplusout.err, grouped by severity and msg template.
+
+    Returns json-able dict of counts per severity, whether EnergyPlus
+    completed (None if the end line is missing, e.g. killed run) and
+    groups of {severity, template, count, example}.
+    """
+    counts = dict.fromkeys(ERR_SEVERITIES, 0)
+    groups = {}
+    for severity, msg in iter_err_msgs(err_fpath):
+        counts[severity] += 1
+        _add_err_group(groups, severity, err_template(msg.split(" | ")[0]),
+                       msg, runs=0)
+    completed = None
+    with open(err_fpath, "rb") as f:  # end line is in the last few kb
+        _ = f.seek(max(path.getsize(err_fpath) - 4096, 0))
+        mobj = ERR_END_RE.search(f.read().decode("latin-1"))
+        if mobj:
+            completed = mobj.group(1) == "Completed Successfully"
+    for group in groups.values():
+        del group["runs"]
+    return {"fpath": err_fpath, "completed": completed, "counts": counts,
+            "groups": _sort_err_groups(groups, top)}
+
+
+def find_errs(dpath, fname="eplusout.err"):
+    """Yields err fpaths under dpath."""
+    for root, _, fnames in os.walk(dpath):
+        if fname in fnames:
+            yield path.join(root, fname)
+
+
+def aggregate_errs(dpath, top=None):
+    """Summary of all eplusout.err under dpath, e.g. a batch dir.
+
+    Groups are summed across runs, w/ runs = number of runs that have
+    the template. Runs that didn't complete are listed in failed.
+    """
+    counts = dict.fromkeys(ERR_SEVERITIES, 0)
+    groups, runs, failed = {}, 0, []
+    for err_fpath in find_errs(dpath):
+        summary = parse_err(err_fpath)
+        runs += 1
+        if not summary["completed"]:
+            failed.append(err_fpath)
+        for severity, n in summary["counts"].items():
+            counts[severity] += n
+        for g in summary["groups"]:
+            _add_err_group(groups, g["severity"], g["template"],
+                           g["example"], count=g["count"])
+    return {"dpath": dpath, "runs": runs, "failed": failed,
+            "counts": counts, "groups": _sort_err_groups(groups, top)}
+
+
+def dump_err_summary(err_fpath, top=None):
+    """Write parse_err summary next to err file, return json fpath."""
+    return dump_result(parse_err(err_fpath, top), err_fpath + ".json")
+
+
+def _kill_tree(proc):
+    """Kill proc and its children (openstudio spawns energyplus)."""
+    if os.name == "nt":
+        _ = subprocess.run(["taskkill", "/F", "/T", "/PID", str(proc.pid)],
+                           stdout=subprocess.DEVNULL,
+                           stderr=subprocess.DEVNULL)
+    else:
+        try:
+            os.killpg(proc.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+    _ = proc.wait()
+
+
+def _exit_on_signal(signum, frame):
+    """Raise SystemExit, so run_watched kills the sim it started."""
+    raise SystemExit(128 + signum)
+
+
+def run_watched(cmds, err_fpath, watch=None, quiet=False, poll=SIM_POLL):
+    """Run cmds, killing them early if watch flags err_fpath.
+
+    Returns returncode. Raises SimAbortError if killed by the watchdog.
+    """
+    # Don't read the err of the last run
+    if path.exists(err_fpath):
+        os.remove(err_fpath)
+    # Own process group, so we can kill energyplus w/ openstudio
+    group = {"creationflags": subprocess.CREATE_NEW_PROCESS_GROUP} \
+        if os.name == "nt" else {"start_new_session": True}
+    proc = subprocess.Popen(
+        cmds, stdout=subprocess.DEVNULL if quiet else None, **group)
+    try:
+        while True:
+            try:
+                returncode = proc.wait(timeout=poll)
+                break
+            except subprocess.TimeoutExpired:
+                pass
+            if watch and watch.poll():
+                _kill_tree(proc)
+                raise SimAbortError(f"Killed {cmds[0]}, {watch.reason}")
+    except BaseException:
+        if proc.poll() is None:
+            _kill_tree(proc)
+        raise
+    if watch:
+        _ = watch.poll()
+    return returncode
+
+
+def screen_idf(idf_fpath, periods):
+    """Replace RunPeriods of idf w/ screening periods, in place.
+
+    periods are dicts of name, begin_month, begin_day, end_month,
+    end_day. Other fields (years, holidays) are kept from the first
+    RunPeriod. SCREEN_METERS are added at RunPeriod frequency, so each
+    period's totals can be scaled to annual.
+    """
+    objs = list(iter_idf_objects(idf_fpath))
+    base = next((fields for obj_type, fields in objs
+                 if obj_type.lower() == "runperiod"), None)
+    if base is None:
+        raise ValueError(f"No RunPeriod in {idf_fpath}")
+    texts = [idf_text(obj_type, fields) for obj_type, fields in objs
+             if obj_type.lower() != "runperiod"]
+    for period in periods:
+        fields = list(base)
+        fields[:3] = [period["name"], str(period["begin_month"]),
+                      str(period["begin_day"])]
+        fields[4:6] = [str(period["end_month"]), str(period["end_day"])]
+        texts.append(idf_text("RunPeriod", fields))
+    texts.extend(idf_text("Output:Meter", [meter, "RunPeriod"])
+                 for meter in SCREEN_METERS)
+    with open(idf_fpath, "w", encoding="latin-1") as f:
+        f.write("\n".join(texts))
+    return idf_fpath
+
+
+def _screen_cmds(osw_fpath, run_dpath, ops_exe, eplus_exe, err_fpath,
+                 watch=None, quiet=False):
+    """Run osw measures, swap in screening periods, return energyplus cmds.
+
+    openstudio stops after translating to run/in.idf, which is then
+    run by energyplus directly. Both are run_watched, so they're killed
+    together on signals and errors.
+    """
+    osw_dpath = path.dirname(path.abspath(osw_fpath))
+    with open(path.join(osw_dpath, SCREEN_FNAME), "r") as f:
+        screen = json.load(f)
+    cmds = [ops_exe, "run", "--measures_only", "-w", osw_fpath]
+    returncode = run_watched(cmds, err_fpath, watch, quiet=quiet)
+    if returncode != 0:
+        raise subprocess.CalledProcessError(returncode, cmds)
+    idf_fpath = screen_idf(path.join(run_dpath, "in.idf"), screen["periods"])
+    epw_fpath = path.join(osw_dpath, load_osw(osw_fpath)["weather_file"])
+    return [eplus_exe, "-w", epw_fpath, "-d", run_dpath, idf_fpath]
+
+
+def run_sim(osw_fpath, ops_exe="openstudio", cache=True, stats=None,
+            quiet=False, watchdog=True, max_warnings=None,
+            eplus_exe=EPLUS_EXE, cache_mb=SIM_CACHE_MB):
+    """Run osw w/ openstudio, or restore results if inputs cached.
+
+    Returns paths of SIM_OUT_FNAMES in the osw run dir. The run dir is
+    cleared before cached results are restored, and the sim cache is
+    pruned to cache_mb after a run is cached. Compacted entries restore
+    SIM_COMPACT_FNAMES w/o the sql. Optional stats
+    dict is filled w/ output paths, cache hit, seconds and the parsed
+    eplusout.err summary. With watchdog, the run is killed as soon as
+    eplusout.err has a Severe/Fatal error or max_warnings warnings.
+    If there's a SCREEN_FNAME next to the osw, only its representative
+    periods are simulated (see screen_idf).
+    """
+    t0 = time.perf_counter()
+    stats = {} if stats is None else stats
+    run_dpath = path.join(path.dirname(path.abspath(osw_fpath)), "run")
+    out_fpaths = [path.join(run_dpath, f) for f in SIM_OUT_FNAMES]
+    stats["outputs"] = dict(zip(SIM_OUT_FNAMES, out_fpaths))
+
+    if cache:
+        key = sim_cache_key(osw_fpath)
+        key_dpath = path.join(CACHE_DPATH, "sim", key)
+        hits = [f for f in (SIM_OUT_FNAMES[0], SIM_COMPACT_FNAMES[0])
+                if path.exists(path.join(key_dpath, f))]
+        if hits:
+            # Don't mix in outputs of an earlier run
+            shutil.rmtree(run_dpath, ignore_errors=True)
+        os.makedirs(run_dpath, exist_ok=True)
+        fnames = SIM_OUT_FNAMES + SIM_COMPACT_FNAMES
+        if hits and cache_load(
+                key, [path.join(run_dpath, f) for f in fnames], kind="sim",
+                required=hits[:1]):
+            print(f"## Found cached sim {key[:12]}, skipping openstudio.")
+            stats["cache_entry"] = key_dpath
+            err_fpath = stats["outputs"]["eplusout.err"]
+            if path.exists(err_fpath):
+                stats["outputs"]["eplusout.err.json"] = dump_err_summary(
+                    err_fpath, top=20)
+            stats.update(cached=True, seconds=time.perf_counter() - t0)
+            return out_fpaths
+
+    print(f"## Running {ops_exe} run -w {osw_fpath}")
+    cmds = [ops_exe, "run", "-w", osw_fpath]
+    err_fpath = stats["outputs"]["eplusout.err"]
+    # W/o watchdog, still parse err for the summary
+    watch = ErrWatch(err_fpath, max_warnings=max_warnings) \
+        if watchdog else ErrWatch(err_fpath, abort_on=())
+    try:
+        if path.exists(path.join(path.dirname(path.abspath(osw_fpath)),
+                                 SCREEN_FNAME)):
+            stats["screen"] = True
+            cmds = _screen_cmds(osw_fpath, run_dpath, ops_exe, eplus_exe,
+                                err_fpath, watch, quiet)
+        returncode = run_watched(cmds, err_fpath, watch, quiet=quiet)
+    finally:
+        stats.update(errors=watch.summary(), seconds=time.perf_counter() - t0)
+        if path.exists(err_fpath):
+            stats["outputs"]["eplusout.err.json"] = dump_err_summary(
+                err_fpath, top=20)
+    if returncode != 0:
+        raise subprocess.CalledProcessError(returncode, cmds)
+
+    # Only cache runs that produced results
+    if cache and path.exists(out_fpaths[0]):
+        stats["cache_entry"] = cache_dump(
+            key, [f for f in out_fpaths if path.exists(f)], kind="sim")
+        _ = cache_prune("sim", cache_mb)
+    stats.update(cached=False, seconds=time.perf_counter() - t0)
+    return out_fpaths
+
+
+@contextlib.contextmanager
+def step_timer(steps, name):
+    """Record seconds of with-block in steps[name]."""
+    t0 = time.perf_counter()
+    yield
+    steps[name] = round(time.perf_counter() - t0, 3)
+
+
+def dump_result(result, result_fpath):
+    """Dump machine-readable result dict to json file."""
+    with open(result_fpath, 'w') as f:
+        json.dump(result, f, indent=4, default=str)
+    return result_fpath
+
+
 def tokenize(words: str) -> str:
     r"""Tokenizes phrases into tokens w/ sep='_' via regex.
 
@@ -170,6 +714,88 @@ def add_spacetype_std(osm_model, echo=True):
     return osm_model
 
 
+def report_intervals(freq, days, timestep=1):
+    """Rows per output of reporting frequency over days simulated."""
+    freq = freq.lower().replace(" ", "")
+    if freq == "detailed" or freq.endswith("timestep"):
+        return days * 24 * timestep
+    per_day = {"hourly": 24, "daily": 1}
+    if freq in per_day:
+        return days * per_day[freq]
+    if freq == "monthly":
+        return max(1, round(days / 30.4))
+    return 1  # runperiod, environment, annual
+
+
+def estimate_sql_mb(requests, counts, days, timestep=1):
+    """Rough eplusout.sql MB of (name, key, freq) output requests.
+
+    Meters have key None. '*' keys expand to counts of the object kind
+    in OUTPUT_KEY_KINDS (zones for other vars), e.g. {"zones": 18,
+    "surfaces": 400, "nodes": 300, "airloops": 3}.
+    """
+    rows = 0
+    for name, key, freq in requests:
+        n = 1
+        if key in ("*", ""):
+            kind = next((k for prefix, k in OUTPUT_KEY_KINDS
+                         if name.startswith(prefix)), "zones")
+            n = 1 if kind == "site" else counts.get(kind, 1)
+        rows += n * report_intervals(freq, days, timestep)
+    return round(SQL_BASE_MB + rows * SQL_ROW_BYTES / 1e6, 1)
+
+
+def output_requests(model):
+    """(name, key, freq) of model's output variables and meters."""
+    reqs = [(v.variableName(), v.keyValue(), v.reportingFrequency())
+            for v in model.getOutputVariables()]
+    reqs += [(m.name(), None, m.reportingFrequency())
+             for m in model.getOutputMeters()]
+    return reqs
+
+
+def model_sim_size(model):
+    """Object counts, days simulated and timesteps/hr of model."""
+    counts = {"zones": len(model.getThermalZones()),
+              "surfaces": len(model.getSurfaces()) +
+              len(model.getSubSurfaces()),
+              "nodes": len(model.getNodes()),
+              "airloops": len(model.getAirLoopHVACs())}
+    days = 365
+    run_period = model.runPeriod()
+    if run_period.is_initialized():
+        rp = run_period.get()
+        begin = datetime.date(2009, rp.getBeginMonth(),
+                              rp.getBeginDayOfMonth())
+        end = datetime.date(2009, rp.getEndMonth(), rp.getEndDayOfMonth())
+        days = (end - begin).days % 365 + 1
+    days += len(model.getDesignDays())
+    timestep = model.getTimestep().numberOfTimestepsPerHour()
+    return counts, days, timestep
+
+
+def apply_output_profile(ops, model, profile):
+    """Replace model's output requests w/ OUTPUT_PROFILES[profile].
+
+    Returns the new (name, key, freq) requests.
+    """
+    if profile not in OUTPUT_PROFILES:
+        raise ValueError(f"Unknown output profile {profile}, "
+                         f"use one of {list(OUTPUT_PROFILES)}")
+    for obj in list(model.getOutputVariables()) + \
+            list(model.getOutputMeters()):
+        _ = obj.remove()
+    for name, freq in OUTPUT_PROFILES[profile]:
+        if ":" in name:
+            meter = ops.model.OutputMeter(model)
+            _ = meter.setName(name)
+        else:
+            meter = ops.model.OutputVariable(name, model)
+            _ = meter.setKeyValue("*")
+        _ = meter.setReportingFrequency(freq)
+    return output_requests(model)
+
+
 def edit_workflow(ops, model, osw_dict, osw_fpath):
     """Make workflow OSW from osm model from osw_dict."""
 
@@ -217,8 +843,94 @@ def swap_modelobj(ref_modelobj, act_osm):
     return act_modelobj
 
 
+def iter_idf_objects(idf_fpath):
+    """Yields (type, fields) of each object in an idf/osm/ddy file.
+
+    Streams the file and drops '!' comments. Read as latin-1, since
+    ddy comments have degree signs.
+    """
+    buf = []
+    with open(idf_fpath, "r", encoding="latin-1") as f:
+        for line in f:
+            line = line.split("!", 1)[0].strip()
+            if not line:
+                continue
+            buf.append(line)
+            if line.endswith(";"):
+                fields = [v.strip() for v in "".join(buf)[:-1].split(",")]
+                buf = []
+                yield fields[0], fields[1:]
+
+
+def ddy_condition(name):
+    """Design condition of DesignDay name, w/o location prefix.
+
+        'Tucson-Davis-Monthan.AFB_AZ_USA Ann Clg .4% Condns DB=>MWB'
+        -> 'Ann Clg .4% Condns DB=>MWB'
+    """
+    mobj = DDY_COND_RE.search(name)
+    return mobj.group(1) if mobj else name
+
+
+def load_ddy(ddy_fpath):
+    """Index of ddy Site:Location and SizingPeriod:DesignDay objects.
+
+    Returns {"location": {name, latitude, longitude, timezone,
+    elevation, fields}, "design_days": {condition: {name, month, day,
+    day_type, max_db, fields}}}, w/ objects in file order.
+    """
+    index = {"location": None, "design_days": {}}
+    for obj_type, fields in iter_idf_objects(ddy_fpath):
+        obj_type = obj_type.lower()
+        if obj_type == "site:location":
+            index["location"] = {
+                "name": fields[0], "latitude": float(fields[1]),
+                "longitude": float(fields[2]), "timezone": float(fields[3]),
+                "elevation": float(fields[4]), "fields": fields}
+        elif obj_type == "sizingperiod:designday":
+            index["design_days"][ddy_condition(fields[0])] = {
+                "name": fields[0], "month": int(fields[1]),
+                "day": int(fields[2]), "day_type": fields[3],
+                "max_db": float(fields[4]), "fields": fields}
+    return index
+
+
+def select_design_days(index, selectors=DDY_SELECTORS):
+    """Design days of ddy index whose condition contains a selector.
+
+    Selectors are case-insensitive substrings, e.g. 'Clg .4%' selects
+    all four .4% cooling days, 'Clg .4% Condns DB=>MWB' only one.
+    """
+    dds = [dd for cond, dd in index["design_days"].items()
+           if any(sel.lower() in cond.lower() for sel in selectors)]
+    if not dds:
+        raise ValueError(f"No design days match {list(selectors)} in "
+                         f"{list(index['design_days'])}")
+    return dds
+
+
+def idf_text(obj_type, fields):
+    """Idf text of object."""
+    return obj_type + ",\n" + ",\n".join(f"  {v}" for v in fields) + ";\n"
+
+
+def ddy_model(ops, ddy_fpath, selectors=DDY_SELECTORS):
+    """Model w/ only the selected ddy design days, w/o a ref osm."""
+    idf = ops.IdfFile(ops.IddFileType("EnergyPlus"))
+    for dd in select_design_days(load_ddy(ddy_fpath), selectors):
+        idf_obj = ops.IdfObject.load(
+            idf_text("SizingPeriod:DesignDay", dd["fields"]))
+        _ = idf.addObject(assert_init(idf_obj).get())
+    return ops.energyplus.ReverseTranslator().translateWorkspace(
+        ops.Workspace(idf))
+
+
 def swap_design_days(act_osm, ref_osm):
-    """Swap sizing period."""
+    """Swap sizing period.
+
+    ref_osm can be the ref model, or a ddy_model of selected design
+    days.
+    """
 
     def diff(dds, mod_name):
         print(" - {} has {} DesignDay objects.".format(mod_name, len(dds)))
@@ -266,6 +978,104 @@ def swap_spc_equip(act_osm, ref_osm, verbose=False):
 
     return act_osm
 
+def _get_oa_ctrl(_airloop):
+    """Get OA controller given AirloopHVAC obj."""
+    oa_sys = assert_init(
+        _airloop.airLoopHVACOutdoorAirSystem()
+    ).get()
+    return oa_sys.getControllerOutdoorAir()
+
+
+def is_ref_bundle(ref_osm):
+    """True if ref_osm is a compiled ref bundle (see compile_ref)."""
+    props = ref_osm.getBuilding().additionalProperties()
+    return props.hasFeature(REF_BUNDLE_FEATURE)
+
+
+def ref_airloop_props(ref_osm):
+    """Economizer type, availability schedule of first ref airloop.
+
+    Ref bundles store these as building features instead of an airloop.
+    """
+    if is_ref_bundle(ref_osm):
+        props = ref_osm.getBuilding().additionalProperties()
+        econ_type = props.getFeatureAsString("economizer_type").get()
+        sched_name = props.getFeatureAsString("availability_schedule").get()
+        sched = assert_init(ref_osm.getScheduleRulesetByName(sched_name))
+        return econ_type, sched.get()
+
+    ref_airloop = ref_osm.getAirLoopHVACs()[0]
+    econ_type = _get_oa_ctrl(ref_airloop).getEconomizerControlType()
+    return econ_type, ref_airloop.availabilitySchedule()
+
+
+def compile_ref(ops, ref_osm):
+    """Extract the ref objects used by swap fns into a compact model.
+
+    The bundle holds the design days, the first airloop's economizer type
+    and availability schedule, and elevator equipment of 'Core_bottom'
+    spaces (in same-named spaces), so swap fns accept it as ref_osm.
+    """
+    print("## Compile ref bundle")
+    bundle = ops.model.Model()
+    props = bundle.getBuilding().additionalProperties()
+
+    # DesignDays
+    ref_dd = list(ref_osm.getDesignDays())
+    _ = [swap_modelobj(dd, bundle) for dd in ref_dd]
+
+    # Airloop economizer, availability schedule
+    econ_type, sched = ref_airloop_props(ref_osm)
+    sched_clone = assert_init(sched.clone(bundle).to_ScheduleRuleset()).get()
+    props.setFeature("economizer_type", econ_type)
+    props.setFeature("availability_schedule", sched_clone.nameString())
+
+    # Elevator equipment, parented to same-named spaces
+    ref_spcs = [x for x in ref_osm.getSpaces()
+                if "Core_bottom" in x.nameString()]
+    for ref_spc in ref_spcs:
+        spc = ops.model.Space(bundle)
+        spc.setName(ref_spc.nameString())
+        for ref_equip in ref_spc.electricEquipment():
+            if "elevator" not in ref_equip.nameString().lower():
+                continue
+            equip = swap_modelobj(ref_equip, bundle)
+            assert equip.setParent(spc), \
+                "Error! setParent fail for {}".format(equip)
+
+    props.setFeature(REF_BUNDLE_FEATURE, SWAP_VERSION)
+    print(f" - {len(ref_dd)} DesignDays, {len(ref_spcs)} Core_bottom spaces.")
+    return bundle
+
+
+def load_ref(ops, ref_osm_fpath, cache=True):
+    """Load ref bundle for ref_osm_fpath, compiling it on first use.
+
+    The full ref model is only loaded (and released) when no bundle is
+    cached for its contents and the swap code version.
+    """
+    if not cache:
+        return load_osm(ops, ref_osm_fpath)
+
+    key = hash_fpaths(ref_osm_fpath, __file__, extra=("ref",))
+    bundle_fpath = path.join(CACHE_DPATH, "ref", key, REF_BUNDLE_FNAME)
+    if path.exists(bundle_fpath):
+        print(f"## Found cached ref bundle {key[:12]}.")
+        return load_osm(ops, bundle_fpath)
+
+    ref_osm = load_osm(ops, ref_osm_fpath)
+    bundle = compile_ref(ops, ref_osm)
+    del ref_osm
+    tmp_dpath = tempfile.mkdtemp()
+    try:
+        tmp_fpath = dump_osm(
+            ops, bundle, path.join(tmp_dpath, REF_BUNDLE_FNAME))
+        _ = cache_dump(key, [tmp_fpath], kind="ref")
+    finally:
+        shutil.rmtree(tmp_dpath, ignore_errors=True)
+    return bundle
+
+
 def swap_airloops(swp_osm, ref_osm):
     """Change OA system properties.
     
@@ -281,21 +1091,12 @@ def swap_airloops(swp_osm, ref_osm):
     4. Attach return plenum. 
     """
     
-    def _get_oa_ctrl(_airloop):
-        """Get OA controller given AirloopHVAC obj."""
-        oa_sys = assert_init(
-            _airloop.airLoopHVACOutdoorAirSystem()
-        ).get()
-        return oa_sys.getControllerOutdoorAir()
-        
-    ref_airloop = ref_osm.getAirLoopHVACs()[0] 
-    
+    ref_econ_type, ref_sched = ref_airloop_props(ref_osm)
+
     # Add Economizer to mechanical ventilation controller
     print("## Swap airloop economizer") 
     # Airloop -> OASystem -> OA Controller -> Economizer
     # Assume economizer same for all loops
-    ref_oa_ctrl = _get_oa_ctrl(ref_airloop)
-    ref_econ_type = ref_oa_ctrl.getEconomizerControlType()
     for airloop in swp_osm.getAirLoopHVACs():
         oa_ctrl = _get_oa_ctrl(airloop)
         econ_type = oa_ctrl.getEconomizerControlType()
@@ -305,7 +1106,6 @@ def swap_airloops(swp_osm, ref_osm):
     
     # Swap ScheduleRuleset in 'Availability Schedule'
     print("## Swap airloop HVAC availability schedule")
-    ref_sched = ref_airloop.availabilitySchedule()
     ref_sched_clone = assert_init(
         ref_sched.clone(swp_osm).to_ScheduleRuleset()
     ).get()
@@ -337,56 +1137,424 @@ def swap_airloops(swp_osm, ref_osm):
 
 
 
-def run(osw_fpath, osm_fpath, ref_osm_fpath, epw_fpath, echo):
+def run(osw_fpath, osm_fpath, ref_osm_fpath, epw_fpath, echo, cache=True,
+        ref_osm=None, osw_dict=None, stats=None, ddy_fpath=None,
+        ddy_select=DDY_SELECTORS, output_profile=None):
+    """Swap ref objects into osm, return swapped osm, osw fpaths.
 
-    import openstudio as ops
+    Pass a loaded ref_osm to reuse it across calls, or a function that
+    returns it so it's only loaded on a cache miss. ref_osm_fpath is
+    then only used for the cache key. In-process callers can pass the
+    seed osw_dict so osw_fpath needn't be written, and a stats dict
+    that is filled w/ swap paths, cache hit and seconds. W/ ddy_fpath,
+    design days are the ddy_select ones from the ddy, not the ref's.
+    W/ output_profile, the model's output requests are replaced by the
+    OUTPUT_PROFILES ones. The estimated sql size is added to stats.
+    """
+    t0 = time.perf_counter()
+    stats = {} if stats is None else stats
     # Define swap paths
     osm_fpath_swap = osm_fpath.replace(".osm", "_swap.osm")
     osw_fpath_swap = osw_fpath.replace(".osw", "_swap.osw")
+    osw_dict = dict(osw_dict) if osw_dict else load_osw(osw_fpath)
+
+    # Return cached swap if inputs unchanged, w/o loading openstudio
+    swap_fpaths = [osm_fpath_swap, osw_fpath_swap]
+    if cache:
+        key = swap_cache_key(osw_dict, osm_fpath, ref_osm_fpath, epw_fpath,
+                             ddy_fpath, ddy_select, output_profile)
+        if cache_load(key, swap_fpaths, names=SWAP_CACHE_NAMES):
+            print(f"## Found cached swap {key[:12]}.")
+            # Re-point cached osw to this sim dir
+            osw_dict_swap = load_osw(osw_fpath_swap)
+            osw_dict_swap["weather_file"] = epw_fpath
+            osw_dict_swap["seed_file"] = osm_fpath_swap
+            _ = dump_osw(osw_dict_swap, osw_fpath_swap)
+            stats.update(osm_swap=osm_fpath_swap, osw_swap=osw_fpath_swap,
+                         cached=True, seconds=time.perf_counter() - t0)
+            return osm_fpath_swap, osw_fpath_swap
+
+    import openstudio as ops
+    steps = stats["steps"] = {}
 
-    # Load OSM models
-    osm_model_swap = load_osm(ops, osm_fpath)
-    osm_model_ref = load_osm(ops, ref_osm_fpath)
+    # Load OSM models, ref first so full ref is freed before act loads
+    with step_timer(steps, "load"):
+        if callable(ref_osm):
+            ref_osm = ref_osm()
+        osm_model_ref = ref_osm if ref_osm is not None else \
+            load_ref(ops, ref_osm_fpath, cache=cache)
+        osm_model_swap = load_osm(ops, osm_fpath)
 
     # Swap airloop sched
-    osm_model_swap = swap_airloops(osm_model_swap, osm_model_ref)
+    with step_timer(steps, "airloops"):
+        osm_model_swap = swap_airloops(osm_model_swap, osm_model_ref)
     # Swap DDY
-    osm_model_swap = swap_design_days(osm_model_swap, osm_model_ref)
+    with step_timer(steps, "design_days"):
+        dd_model = ddy_model(ops, ddy_fpath, ddy_select) if ddy_fpath \
+            else osm_model_ref
+        osm_model_swap = swap_design_days(osm_model_swap, dd_model)
     # Swap equip
-    osm_model_swap = swap_spc_equip(osm_model_swap, osm_model_ref)    
+    with step_timer(steps, "spc_equip"):
+        osm_model_swap = swap_spc_equip(osm_model_swap, osm_model_ref)
+    # Prune output requests, estimate sql size
+    with step_timer(steps, "outputs"):
+        requests = apply_output_profile(ops, osm_model_swap, output_profile) \
+            if output_profile else output_requests(osm_model_swap)
+        est_mb = estimate_sql_mb(requests, *model_sim_size(osm_model_swap))
+        stats["output_requests"] = {"profile": output_profile or "seed",
+                                    "requests": len(requests),
+                                    "est_sql_mb": est_mb}
+    print(f"## Outputs {output_profile or 'seed'}: {len(requests)} "
+          f"requests, est eplusout.sql {est_mb:.0f} MB")
     # Load, modify OSW
     # osm_model_swap = add_spacetype_std(osm_model_swap, echo=echo)
     print("## Making osw. Skipping measure.")
-    osw_dict = load_osw(osw_fpath)
-    osw_dict["weather_file"] = epw_fpath
-    osw_dict["seed_file"] = osm_fpath_swap
-    osw_fpath_swap = edit_workflow(ops, osm_model_swap, osw_dict, osw_fpath_swap)
+    with step_timer(steps, "workflow"):
+        osw_dict["weather_file"] = epw_fpath
+        osw_dict["seed_file"] = osm_fpath_swap
+        osw_fpath_swap = edit_workflow(
+            ops, osm_model_swap, osw_dict, osw_fpath_swap)
+
+    # Count swapped objects, warn on empty swaps
+    counts = stats["counts"] = {
+        "airloops": len(osm_model_swap.getAirLoopHVACs()),
+        "design_days": len(osm_model_swap.getDesignDays()),
+        "elevators": len([e for e in osm_model_swap.getElectricEquipments()
+                          if "elevator" in e.nameString().lower()])}
+    stats["warnings"] = [f"No {k} in swapped model."
+                         for k, n in counts.items() if n == 0]
 
     # Dump OSM
     if echo:
         simdir = path.dirname(path.abspath(osm_fpath_swap))
         print(f"Saving modified OSW, OSM to {simdir}")
-    osm_fpath_swap = dump_osm(ops, osm_model_swap, osm_fpath_swap)
+    with step_timer(steps, "dump"):
+        osm_fpath_swap = dump_osm(ops, osm_model_swap, osm_fpath_swap)
+    if cache:
+        _ = cache_dump(key, swap_fpaths, names=SWAP_CACHE_NAMES)
+    stats.update(osm_swap=osm_fpath_swap, osw_swap=osw_fpath_swap,
+                 cached=False, seconds=time.perf_counter() - t0)
     return osm_fpath_swap, osw_fpath_swap
 
 
+def load_manifest(manifest_fpath):
+    """Load batch manifest rows of osw, osm, optional epw, ddy, outputs.
+
+    Manifest is a JSON list of dicts, or a CSV w/ header. Relative
+    fpaths resolve from the manifest dir.
+    """
+    with open(manifest_fpath, 'r') as f:
+        if manifest_fpath.lower().endswith(".csv"):
+            rows = [dict(r) for r in csv.DictReader(f)]
+        else:
+            rows = json.load(f)
+
+    man_dpath = path.dirname(path.abspath(manifest_fpath))
+    for row in rows:
+        for k in ("osw", "osm", "epw", "ddy"):
+            if row.get(k):
+                row[k] = path.join(man_dpath, row[k])
+    return rows
+
+
+_BATCH_REF = {}  # worker process ref model, loaded once by _batch_ref
+
+
+def _init_batch(ref_osm_fpath, cache):
+    """Set batch worker process ref. Never raises, or Pool respawns it."""
+    _BATCH_REF.clear()
+    _BATCH_REF["fpath"] = ref_osm_fpath
+    _BATCH_REF["cache"] = cache
+
+
+def _batch_ref():
+    """Ref model of batch worker process, loaded on first cache miss.
+
+    A failed load is remembered, so the rest of the rows fail fast.
+    """
+    if "error" in _BATCH_REF:
+        raise _BATCH_REF["error"]
+    if "osm" not in _BATCH_REF:
+        try:
+            import openstudio as ops
+            _BATCH_REF["osm"] = load_ref(ops, _BATCH_REF["fpath"],
+                                         cache=_BATCH_REF["cache"])
+        except Exception as err:
+            _BATCH_REF["error"] = err
+            raise
+    return _BATCH_REF["osm"]
+
+
+def _run_batch_row(row):
+    """Swap one manifest row against the worker ref, return result.
+
+    A failed row, malformed ones too, is recorded w/ its error.
+    """
+    t0 = time.perf_counter()
+    result = {"osw": row.get("osw"), "osm": row.get("osm"),
+              "epw": row.get("epw"), "osm_swap": None, "osw_swap": None,
+              "error": None}
+    try:
+        if not row.get("epw"):
+            raise ValueError("No epw in manifest row or args")
+        result["osm_swap"], result["osw_swap"] = run(
+            row["osw"], row["osm"], _BATCH_REF["fpath"], row["epw"],
+            echo=False, cache=_BATCH_REF["cache"], ref_osm=_batch_ref,
+            ddy_fpath=row.get("ddy") or None,
+            output_profile=row.get("outputs") or None)
+        result["status"] = "ok"
+    except Exception as err:
+        result["status"] = "fail"
+        result["error"] = f"{type(err).__name__}: {err}"
+    result["seconds"] = round(time.perf_counter() - t0, 3)
+    return result
+
+
+def run_batch(manifest_fpath, ref_osm_fpath, epw_fpath=None, workers=1,
+              cache=True, results_fpath=None):
+    """Swap all manifest models against one ref loaded once per worker.
+
+    Rows w/o epw use epw_fpath. Writes results list to results_fpath,
+    default {manifest}_results.json, and returns it.
+    """
+    rows = load_manifest(manifest_fpath)
+    for row in rows:
+        row["epw"] = row.get("epw") or epw_fpath
+    results_fpath = results_fpath or \
+        path.splitext(manifest_fpath)[0] + "_results.json"
+
+    print(f"## Batch swap {len(rows)} models on {workers} workers.")
+    if workers <= 1:
+        _init_batch(ref_osm_fpath, cache)
+        results = [_run_batch_row(row) for row in rows]
+    else:
+        with multiprocessing.Pool(
+                workers, _init_batch, (ref_osm_fpath, cache)) as pool:
+            results = pool.map(_run_batch_row, rows, chunksize=1)
+
+    fails = [r for r in results if r["status"] != "ok"]
+    print(f" - {len(results) - len(fails)} ok, {len(fails)} failed.")
+    with open(results_fpath, 'w') as f:
+        json.dump(results, f, indent=4)
+    return results
+
+
+class SwapWorker(socketserver.TCPServer):
+    """Local swap server that keeps openstudio, recent refs loaded.
+
+    Takes one JSON request per line and answers with one JSON line:
+        {"cmd": "swap", "osw": .., "osm": .., "ref_osm": .., "epw": ..,
+         "ddy": .. (optional), "ddy_select": [..] (optional),
+         "outputs": .. (optional)}
+        -> {"ok": true, "osm_swap": .., "osw_swap": .., "seconds": ..}
+    Requests are served one at a time since models aren't thread safe.
+    """
+    allow_reuse_address = True
+
+    def __init__(self, port=SWAP_PORT, max_refs=4, cache=True):
+        super().__init__(("127.0.0.1", port), SwapHandler)
+        self.refs = collections.OrderedDict()
+        self.max_refs, self.cache = max_refs, cache
+
+    def get_ref(self, ref_osm_fpath):
+        """LRU of loaded refs, keyed on fpath and mtime."""
+        import openstudio as ops
+        rkey = (ref_osm_fpath, os.stat(ref_osm_fpath).st_mtime)
+        if rkey in self.refs:
+            self.refs.move_to_end(rkey)
+        else:
+            self.refs[rkey] = load_ref(ops, ref_osm_fpath, cache=self.cache)
+            if len(self.refs) > self.max_refs:
+                _ = self.refs.popitem(last=False)
+        return self.refs[rkey]
+
+    def dispatch(self, req):
+        """Run request, return response dict."""
+        if req.get("cmd") == "ping":
+            return {"ok": True, "version": SWAP_VERSION}
+        if req.get("cmd") != "swap":
+            raise ValueError(f"Unknown cmd: {req.get('cmd')}")
+
+        stats = {"ok": True}
+        fpaths = [assert_path(req[k]) for k in ("osw", "osm", "ref_osm", "epw")]
+        ddy_fpath = req.get("ddy") and assert_path(req["ddy"])
+        # Ref is only loaded if the swap isn't cached
+        _ = run(*fpaths, echo=False, cache=self.cache,
+                ref_osm=lambda: self.get_ref(fpaths[2]), stats=stats,
+                ddy_fpath=ddy_fpath,
+                ddy_select=req.get("ddy_select") or DDY_SELECTORS,
+                output_profile=req.get("outputs"))
+        stats["seconds"] = round(stats["seconds"], 3)
+        return stats
+
+
+class SwapHandler(socketserver.StreamRequestHandler):
+    """Handle JSON-line requests for SwapWorker."""
+
+    def handle(self):
+        for line in self.rfile:
+            try:
+                resp = self.server.dispatch(json.loads(line))
+            except Exception as err:
+                resp = {"ok": False, "error": f"{type(err).__name__}: {err}"}
+            self.wfile.write((json.dumps(resp) + "\n").encode('utf-8'))
+            self.wfile.flush()
+
+
+def _add_result_args(parser):
+    """Add result channel args to subcommand parser."""
+    parser.add_argument(
+        "--result", default=None,
+        help="Write json result (paths, timings, counts, warnings) here.")
+    parser.add_argument(
+        "-q", "--quiet", action="store_true", help="No progress on stdout.")
+
+
+def parse_args(args):
+    """Parse CLI args, swap cmd is default for legacy positional args."""
+    parser = argparse.ArgumentParser(
+        prog="swap.py", description=f"Swap v{SWAP_VERSION}")
+    subparsers = parser.add_subparsers(dest="cmd")
+
+    p = subparsers.add_parser("swap", help="Swap ref objects into osm.")
+    for arg in ("osw", "osm", "ref_osm", "epw"):
+        p.add_argument(arg)
+    p.add_argument("--no-cache", dest="cache", action="store_false")
+    p.add_argument("--ddy", default=None,
+                   help="Take design days from ddy instead of ref_osm.")
+    p.add_argument("--ddy-select", action="append", default=None,
+                   help=f"Ddy design day condition, repeatable. "
+                        f"Default: {list(DDY_SELECTORS)}")
+    p.add_argument("--outputs", default=None, choices=list(OUTPUT_PROFILES),
+                   help="Replace output requests w/ a reporting profile.")
+    _add_result_args(p)
+
+    p = subparsers.add_parser("ddy", help="List ddy design day conditions.")
+    p.add_argument("ddy")
+
+    p = subparsers.add_parser("batch", help="Swap manifest of models.")
+    p.add_argument("manifest", help="JSON/CSV rows of osw, osm, [epw].")
+    p.add_argument("ref_osm")
+    p.add_argument("--epw", default=None, help="Default epw for rows.")
+    p.add_argument("--workers", type=int, default=1)
+    p.add_argument("--results", default=None, help="Results JSON fpath.")
+    p.add_argument("--no-cache", dest="cache", action="store_false")
+
+    p = subparsers.add_parser("serve", help="Run local swap worker.")
+    p.add_argument("--port", type=int, default=SWAP_PORT)
+    p.add_argument("--max-refs", type=int, default=4)
+    p.add_argument("--no-cache", dest="cache", action="store_false")
+
+    p = subparsers.add_parser(
+        "errs", help="Summarize eplusout.err, or all in a batch dir.")
+    p.add_argument("err", help="eplusout.err fpath, or dir to search.")
+    p.add_argument("--top", type=int, default=None,
+                   help="Max templates per severity.")
+    p.add_argument("-o", "--out", default=None, help="Json fpath, or stdout.")
+
+    p = subparsers.add_parser("compile", help="Compile ref osm bundle.")
+    p.add_argument("ref_osm")
+    p.add_argument("-o", "--out", default=None,
+                   help="Bundle fpath, default {ref_osm}_bundle.osm")
+
+    p = subparsers.add_parser("sim", help="Run osw, reuse cached results.")
+    p.add_argument("osw")
+    p.add_argument("--ops-exe", default="openstudio")
+    p.add_argument("--no-cache", dest="cache", action="store_false")
+    p.add_argument("--no-watchdog", dest="watchdog", action="store_false",
+                   help="Don't kill run on Severe/Fatal eplusout.err lines.")
+    p.add_argument("--max-warnings", type=int, default=None,
+                   help="Kill run once eplusout.err has this many warnings.")
+    p.add_argument("--eplus-exe", default=EPLUS_EXE,
+                   help=f"energyplus of screening runs ({SCREEN_FNAME}).")
+    _add_result_args(p)
+
+    if args and args[0] not in subparsers.choices \
+            and args[0] not in {'-h', '--help'}:
+        args = ["swap"] + list(args)
+    return parser.parse_args(args or ['-h'])
+
+
+def run_cmd(args, echo=False):
+    """Run swap or sim cmd, writing json result if args.result.
+
+    The result is written on failure too, w/ ok=false and the error.
+    Legacy callers still get output fpaths as last stdout lines.
+    """
+    result = {"ok": False, "cmd": args.cmd}
+    out = open(os.devnull, 'w') if args.quiet else sys.stdout
+    try:
+        with contextlib.redirect_stdout(out):
+            if args.cmd == "sim":
+                out_fpaths = run_sim(
+                    assert_path(args.osw), args.ops_exe, cache=args.cache,
+                    stats=result, quiet=args.quiet, watchdog=args.watchdog,
+                    max_warnings=args.max_warnings, eplus_exe=args.eplus_exe)
+            else:
+                # Get paths from args, make swap fpaths
+                paths = [assert_path(p) for p in
+                         (args.osw, args.osm, args.ref_osm, args.epw)]
+                out_fpaths = run(
+                    *paths, echo=echo, cache=args.cache, stats=result,
+                    ddy_fpath=args.ddy and assert_path(args.ddy),
+                    ddy_select=args.ddy_select or DDY_SELECTORS,
+                    output_profile=args.outputs)
+        result["ok"] = True
+    except Exception as err:
+        result["error"] = f"{type(err).__name__}: {err}"
+        raise
+    finally:
+        if args.result:
+            _ = dump_result(result, args.result)
+        if args.quiet:
+            out.close()
+
+    if not args.quiet:
+        print(*out_fpaths, sep="\n")
+    return result
+
+
 if __name__ == "__main__":
 
-    # Version
     # Define inputs args
-    paths, echo = argv[1:], False
-    is_help = len(paths) < 3 or paths[0] in {'-h', '--help'}
-    if is_help:
-        print("Swap v3.0.0 usage: python swap.py [osw] [osm] [epw]")
-        exit(0)
-
-    # Get paths from args, make swap fpaths
-    paths = [assert_path(p) for p in paths]
-    _osw_fpath, _osm_fpath, _ref_osm_fpath, _epw_fpath = paths[:4]
+    args, echo = parse_args(argv[1:]), False
+    # Sims run in their own session, terminating us must kill them too
+    signal.signal(signal.SIGTERM, _exit_on_signal)
 
     try:
-        osmswap_fpath, oswswap_fpath = \
-            run(_osw_fpath, _osm_fpath, _ref_osm_fpath, _epw_fpath, echo=echo)
+        if args.cmd == "batch":
+            results = run_batch(
+                assert_path(args.manifest), assert_path(args.ref_osm),
+                epw_fpath=args.epw and assert_path(args.epw),
+                workers=args.workers, cache=args.cache,
+                results_fpath=args.results)
+            exit(int(any(r["status"] != "ok" for r in results)))
+        elif args.cmd == "serve":
+            import openstudio  # warm import before first request
+            with SwapWorker(args.port, args.max_refs, args.cache) as worker:
+                print(f"## Swap worker v{SWAP_VERSION} on port {args.port}")
+                worker.serve_forever()
+        elif args.cmd == "ddy":
+            index = load_ddy(assert_path(args.ddy))
+            for cond, dd in index["design_days"].items():
+                print(f"{cond}: {dd['month']}/{dd['day']} {dd['day_type']} "
+                      f"max_db={dd['max_db']}")
+        elif args.cmd == "errs":
+            err_fpath = assert_path(args.err)
+            summary = aggregate_errs(err_fpath, args.top) \
+                if path.isdir(err_fpath) else parse_err(err_fpath, args.top)
+            if args.out:
+                print(dump_result(summary, args.out))
+            else:
+                print(json.dumps(summary, indent=4))
+        elif args.cmd == "compile":
+            import openstudio as ops
+            ref_fpath = assert_path(args.ref_osm)
+            out_fpath = args.out or ref_fpath.replace(".osm", "_bundle.osm")
+            bundle = compile_ref(ops, load_osm(ops, ref_fpath))
+            print(dump_osm(ops, bundle, out_fpath))
+        else:
+            _ = run_cmd(args, echo)
     except Exception as err:
         for name in dir():
             if name.startswith("_"):
@@ -394,8 +1562,3 @@ if __name__ == "__main__":
             del globals()[name]
         # raise w/o arg means gets last exception and reraise it
         raise
-
-    print(osmswap_fpath, oswswap_fpath, sep="\n")
-
-
-
@@ -0,0 +1,190 @@
+from __future__ import annotations  # so we can use list, dict for typing
+import os
+import re
+import json
+import numpy as np
+from swap import epw as epw_
+path = os.path
+
+INDEX_FNAME = ".climate_index.json"
+# "Climate type "4B" (ASHRAE Standard 196-2006 Climate Zone)"
+STAT_ZONE_RE = re.compile(r'Climate type "(\w+)" \(ASHRAE')
+STAT_DD_RE = re.compile(
+    r"(\d+) annual \(wthr file\) (cooling|heating) degree-days "
+    r"\((\d+)")
+
+
+def degree_days(db: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """HDD18, CDD10 (deltaC-days) from daily mean of (n, hours) db."""
+    n, hours = db.shape
+    t_day = db[:, :hours // 24 * 24].reshape(n, -1, 24).mean(axis=2)
+    hdd18 = np.maximum(18.0 - t_day, 0).sum(axis=1)
+    cdd10 = np.maximum(t_day - 10.0, 0).sum(axis=1)
+    return hdd18, cdd10
+
+
+def thermal_zone(hdd18: np.ndarray, cdd10: np.ndarray) -> np.ndarray:
+    """ASHRAE 169-2013 thermal zone number 0-8 per station."""
+    return np.select(
+        [cdd10 >= 6000, cdd10 >= 5000, cdd10 >= 3500, hdd18 <= 2000,
+         hdd18 <= 3000, hdd18 <= 4000, hdd18 <= 5000, hdd18 <= 7000],
+        [0, 1, 2, 3, 4, 5, 6, 7], default=8)
+
+
+def moisture_regime(t_month: np.ndarray, p_month: np.ndarray,
+                    latitude: np.ndarray) -> np.ndarray:
+    """ASHRAE 169 moisture regime A, B or C per station.
+
+    t_month, p_month are (n, 12) mean temp (C) and precipitation (mm).
+    Marine (C) if coldest month is -3 to 18C, warmest < 22C, 4+ months
+    > 10C and summers are dry; else dry (B) if annual precipitation
+    (cm) < 2 x (annual mean temp + 7); else moist (A).
+    """
+    t_ann, p_cm = t_month.mean(axis=1), p_month.sum(axis=1) / 10
+    # Apr-Sep is summer north of the equator
+    summer = np.zeros((len(latitude), 12), dtype=bool)
+    summer[:, 3:9] = True
+    summer[latitude < 0] = ~summer[latitude < 0]
+    p_summer_min = np.where(summer, p_month, np.inf).min(axis=1)
+    p_winter_max = np.where(~summer, p_month, -np.inf).max(axis=1)
+    marine = ((t_month.min(axis=1) > -3) & (t_month.min(axis=1) < 18) &
+              (t_month.max(axis=1) < 22) & ((t_month > 10).sum(axis=1) >= 4) &
+              (p_winter_max >= 3 * p_summer_min))
+    dry = p_cm < 2 * (t_ann + 7)
+    return np.where(marine, "C", np.where(dry, "B", "A"))
+
+
+def classify(data: dict[str, np.ndarray], latitude: np.ndarray) -> list[dict]:
+    """ASHRAE 169 zone, HDD18, CDD10 of stacked epws.
+
+    data has (n, hours) month, dry_bulb, liquid_precip_depth arrays.
+    Zones 0-6 get a moisture letter, unless the epw has no
+    precipitation data (all 0 or missing), then it's left off.
+    """
+    db, month = data["dry_bulb"], data["month"]
+    precip = np.where(data["liquid_precip_depth"] >= 999, 0,
+                      data["liquid_precip_depth"])
+    hdd18, cdd10 = degree_days(db)
+    zones = thermal_zone(hdd18, cdd10)
+    t_month = np.stack([np.where(month == m, db, np.nan)
+                        for m in range(1, 13)], axis=1)
+    t_month = np.nanmean(t_month, axis=2)
+    p_month = np.stack([np.where(month == m, precip, 0).sum(axis=1)
+                        for m in range(1, 13)], axis=1)
+    regimes = moisture_regime(t_month, p_month, latitude)
+    has_precip = p_month.sum(axis=1) > 0
+
+    results = []
+    for i in range(len(zones)):
+        zone = str(zones[i])
+        if zones[i] < 7 and has_precip[i]:
+            # Marine only applies to zones 3 to 5
+            regime = regimes[i]
+            if regime == "C" and not 3 <= zones[i] <= 5:
+                regime = "A"
+            zone += regime
+        results.append({"zone": zone, "hdd18": round(float(hdd18[i])),
+                        "cdd10": round(float(cdd10[i])), "source": "epw"})
+    return results
+
+
+def parse_stat(stat_fpath: str) -> dict:
+    """ASHRAE zone, weather file HDD18, CDD10 from EnergyPlus .stat."""
+    result = {"zone": None, "hdd18": None, "cdd10": None, "source": "stat"}
+    with open(stat_fpath, "r", encoding="latin-1") as f:
+        for line in f:
+            mobj = STAT_DD_RE.search(line)
+            if mobj:
+                dd, kind, base = mobj.groups()
+                if (kind, base) == ("heating", "18"):
+                    result["hdd18"] = int(dd)
+                elif (kind, base) == ("cooling", "10"):
+                    result["cdd10"] = int(dd)
+                continue
+            mobj = STAT_ZONE_RE.search(line)
+            if mobj:
+                result["zone"] = mobj.group(1)
+    return result
+
+
+def _sig(fpath: str) -> list:
+    st = os.stat(fpath)
+    return [st.st_size, st.st_mtime]
+
+
+def find_stations(dpath: str) -> dict[str, dict]:
+    """Weather files under dpath, grouped by station (epw/stat stem).
+
+    ddy files in a station's dir (incl. custom ones) are listed with it.
+    """
+    stations = {}
+    for root, _, fnames in os.walk(dpath):
+        stems = {path.splitext(f)[0] for f in fnames
+                 if f.endswith((".epw", ".stat"))}
+        for stem in sorted(stems):
+            epw, stat = (path.join(root, stem + ext) for ext in
+                         (".epw", ".stat"))
+            stations[path.join(root, stem)] = {
+                "station": stem,
+                "epw": epw if path.exists(epw) else None,
+                "stat": stat if path.exists(stat) else None,
+                "ddy": sorted(path.join(root, f) for f in fnames
+                              if f.endswith(".ddy"))}
+    return stations
+
+
+def climate_index(dpath: str, rebuild: bool = False) -> dict[str, list]:
+    """Index of ASHRAE zone -> stations w/ epw, stat, ddy fpaths.
+
+    Zones are read from .stat files if there's one, else computed from
+    the epws, all in one vectorized batch. The index is cached in
+    dpath/.climate_index.json and only stations whose files changed
+    are reclassified.
+    """
+    cache_fpath = path.join(dpath, INDEX_FNAME)
+    cached = {}
+    if not rebuild and path.exists(cache_fpath):
+        with open(cache_fpath, "r") as f:
+            cached = {s["key"]: s for z in json.load(f).values() for s in z}
+
+    stations, todo = find_stations(dpath), []
+    for key, st in stations.items():
+        st["key"] = key
+        st["sig"] = [_sig(f) for f in (st["epw"], st["stat"]) if f]
+        if key in cached and cached[key]["sig"] == st["sig"]:
+            st.update({k: cached[key][k] for k in
+                       ("zone", "hdd18", "cdd10", "source")})
+        elif st["stat"]:
+            stat = parse_stat(st["stat"])
+            if stat["zone"]:
+                st.update(stat)
+            elif st["epw"]:
+                todo.append(st)
+        elif st["epw"]:
+            todo.append(st)
+
+    if todo:
+        epws = [epw_.load_epw(st["epw"]) for st in todo]
+        hours = min(len(e) for e in epws)
+        data = {c: np.stack([e[c][:hours] for e in epws]) for c in
+                ("month", "dry_bulb", "liquid_precip_depth")}
+        lat = np.array([e.location["latitude"] for e in epws])
+        for st, result in zip(todo, classify(data, lat)):
+            st.update(result)
+
+    index = {}
+    for st in stations.values():
+        if st.get("zone"):
+            index.setdefault(st["zone"].lower(), []).append(st)
+    with open(cache_fpath, "w") as f:
+        json.dump(dict(sorted(index.items())), f, indent=4)
+    return index
+
+
+def resolve_zone(cz: str, index: dict[str, list], ext: str = "epw"
+                 ) -> str | None:
+    """First epw (or stat) fpath of a station in zone cz, e.g. '4b'."""
+    for st in index.get(cz.lower(), []):
+        if st.get(ext):
+            return st[ext]
+    return None
@@ -0,0 +1,211 @@
+from __future__ import annotations  # so we can use list, dict for typing
+import os
+import numpy as np
+from swap import epw as epw_
+path = os.path
+
+HTG_PCTS = (99.6, 99.0)
+CLG_PCTS = (0.4, 1.0, 2.0)
+COINCIDENT_BIN = 1.0  # +/- deltaC around design db for coincident means
+DD_FIELDS = (
+    "Name", "Month", "Day of Month", "Day Type",
+    "Maximum Dry-Bulb Temperature {C}",
+    "Daily Dry-Bulb Temperature Range {deltaC}",
+    "Dry-Bulb Temperature Range Modifier Type",
+    "Dry-Bulb Temperature Range Modifier Day Schedule Name",
+    "Humidity Condition Type", "Wetbulb or DewPoint at Maximum Dry-Bulb {C}",
+    "Humidity Condition Day Schedule Name",
+    "Humidity Ratio at Maximum Dry-Bulb {kgWater/kgDryAir}",
+    "Enthalpy at Maximum Dry-Bulb {J/kg}",
+    "Daily Wet-Bulb Temperature Range {deltaC}",
+    "Barometric Pressure {Pa}", "Wind Speed {m/s}", "Wind Direction {deg}",
+    "Rain Indicator", "Snow Indicator", "Daylight Saving Time Indicator",
+    "Solar Model Indicator", "Beam Solar Day Schedule Name",
+    "Diffuse Solar Day Schedule Name",
+    "ASHRAE Clear Sky Optical Depth for Beam Irradiance (taub)",
+    "ASHRAE Clear Sky Optical Depth for Diffuse Irradiance (taud)",
+    "Sky Clearness", "Maximum Number Warmup Days",
+    "Begin Environment Reset Mode")
+LOC_FIELDS = ("Name", "Latitude {deg}", "Longitude {deg}", "Time Zone {hr}",
+              "Elevation {m}")
+
+
+def psat(t: np.ndarray) -> np.ndarray:
+    """Saturation vapor pressure (Pa) over water, Magnus formula."""
+    return 611.2 * np.exp(17.62 * t / (243.12 + t))
+
+
+def hum_ratio(p_w: np.ndarray, pres: np.ndarray) -> np.ndarray:
+    return 0.621945 * p_w / (pres - p_w)
+
+
+def wet_bulb(db: np.ndarray, dp: np.ndarray, pres: np.ndarray,
+             iters: int = 30) -> np.ndarray:
+    """Thermodynamic wet bulb (C) from dry bulb, dew point, pressure.
+
+    Bisection of the ASHRAE psychrometric eq. between dew point and
+    dry bulb, vectorized over arrays of any shape.
+    """
+    w = hum_ratio(psat(np.minimum(dp, db)), pres)
+    lo, hi = np.minimum(dp, db), db.astype(np.float64)
+    for _ in range(iters):
+        wb = (lo + hi) / 2
+        ws = hum_ratio(psat(wb), pres)
+        w_wb = ((2501 - 2.326 * wb) * ws - 1.006 * (db - wb)) / \
+            (2501 + 1.86 * db - 4.186 * wb)
+        # w_wb increases w/ wb, so move toward the actual w
+        hi = np.where(w_wb > w, wb, hi)
+        lo = np.where(w_wb > w, lo, wb)
+    return (lo + hi) / 2
+
+
+def pct_label(pct: float) -> str:
+    """ASHRAE percentile label, 0.4 -> '.4%', 99.6 -> '99.6%'."""
+    return f"{pct:g}".lstrip("0") + "%" if pct < 1 else f"{pct:g}%"
+
+
+def _coincident(x: np.ndarray, db: np.ndarray, design_db: np.ndarray
+                ) -> np.ndarray:
+    """Mean of x over hours near design_db, per row of (n, hours) arrays.
+
+    Falls back to the hour closest to design_db if none are in the bin.
+    """
+    mask = np.abs(db - design_db[:, None]) <= COINCIDENT_BIN
+    n = mask.sum(axis=1)
+    mean = (x * mask).sum(axis=1) / np.maximum(n, 1)
+    nearest = np.take_along_axis(
+        x, np.abs(db - design_db[:, None]).argmin(axis=1)[:, None], 1)[:, 0]
+    return np.where(n > 0, mean, nearest)
+
+
+def _design_month(month: np.ndarray, mask: np.ndarray) -> np.ndarray:
+    """Month w/ the most masked hours per row, e.g. hours past design db."""
+    counts = np.stack([(mask & (month == m)).sum(axis=1)
+                       for m in range(1, 13)], axis=1)
+    return counts.argmax(axis=1) + 1
+
+
+def _prevailing(wd: np.ndarray, db: np.ndarray, design_db: np.ndarray
+                ) -> np.ndarray:
+    """Most common 10 deg wind direction bin near design_db per row."""
+    mask = np.abs(db - design_db[:, None]) <= COINCIDENT_BIN
+    bins = (np.round(wd / 10).astype(int) % 36)
+    counts = np.stack([(mask & (bins == b)).sum(axis=1) for b in range(36)],
+                      axis=1)
+    return counts.argmax(axis=1) * 10.0
+
+
+def design_conditions(data: dict[str, np.ndarray],
+                      htg_pcts=HTG_PCTS, clg_pcts=CLG_PCTS) -> list[dict]:
+    """Heating, cooling design day conditions of stacked epws.
+
+    data has (n_epws, hours) arrays of month, dry_bulb, dew_point,
+    atm_pressure, wind_speed, wind_dir. Returns, per epw, {"htg": {pct:
+    cond}, "clg": {pct: cond}} w/ cond keys month, max_db, db_range, wb,
+    pres, ws, wd. Cooling wb is the mean coincident wet bulb (MCWB).
+    Heating month is the one w/ the most hours at or below design db,
+    so southern hemisphere winters fall in Jun-Aug.
+    """
+    db, dp, pres = data["dry_bulb"], data["dew_point"], data["atm_pressure"]
+    ws, wd, month = data["wind_speed"], data["wind_dir"], data["month"]
+    n, hours = db.shape
+    wb = wet_bulb(db, dp, pres)
+    mean_pres = pres.mean(axis=1)
+
+    # Hottest month, and its mean daily db range
+    month_db = np.stack([np.where(month == m, db, np.nan)
+                         for m in range(1, 13)], axis=1)
+    hot_month = np.nanmean(month_db, axis=2).argmax(axis=1) + 1
+    days_db = db[:, :hours // 24 * 24].reshape(n, -1, 24)
+    day_range = days_db.max(axis=2) - days_db.min(axis=2)
+    day_month = month[:, :hours // 24 * 24:24]
+    in_hot = day_month == hot_month[:, None]
+    hot_range = (day_range * in_hot).sum(axis=1) / in_hot.sum(axis=1)
+
+    # All percentiles of all epws in one call
+    pcts = [100 - p for p in htg_pcts] + [100 - p for p in clg_pcts]
+    design_dbs = np.percentile(db, pcts, axis=1)  # (pcts, n)
+
+    conds = [{"htg": {}, "clg": {}} for _ in range(n)]
+    for i, pct in enumerate([*htg_pcts, *clg_pcts]):
+        kind = "htg" if i < len(htg_pcts) else "clg"
+        ddb = design_dbs[i]
+        mcwb = _coincident(wb, db, ddb)
+        mcws = _coincident(ws, db, ddb)
+        pwd = _prevailing(wd, db, ddb)
+        cold_month = _design_month(month, db <= ddb[:, None]) \
+            if kind == "htg" else None
+        for j in range(n):
+            conds[j][kind][pct] = {
+                "month": int(cold_month[j] if kind == "htg"
+                             else hot_month[j]),
+                "max_db": float(ddb[j]),
+                "db_range": 0.0 if kind == "htg" else float(hot_range[j]),
+                # Heating day is saturated at max db, like ASHRAE ddys
+                "wb": float(ddb[j] if kind == "htg" else mcwb[j]),
+                "pres": float(mean_pres[j]), "ws": float(mcws[j]),
+                "wd": float(pwd[j])}
+    return conds
+
+
+def design_day_fields(loc_name: str, kind: str, pct: float, cond: dict
+                      ) -> list[str]:
+    """SizingPeriod:DesignDay fields, named like ASHRAE ddys."""
+    htg = kind == "htg"
+    name = f"{loc_name} Ann {'Htg' if htg else 'Clg'} {pct_label(pct)} " \
+        f"Condns {'DB' if htg else 'DB=>MWB'}"
+    return [name, str(cond["month"]), "21",
+            "WinterDesignDay" if htg else "SummerDesignDay",
+            f"{cond['max_db']:.1f}", f"{cond['db_range']:.1f}",
+            "DefaultMultipliers", "", "Wetbulb", f"{cond['wb']:.1f}",
+            "", "", "", "", f"{cond['pres']:.0f}", f"{cond['ws']:.1f}",
+            f"{cond['wd']:.0f}", "No", "No", "No", "ASHRAEClearSky", "", "",
+            "", "", "0.0" if htg else "1.0", "", "FullResetAtBeginEnvironment"]
+
+
+def _idf_obj(obj_type: str, fields: list[str], names: tuple) -> str:
+    lines = [f"{obj_type},"]
+    for i, (v, name) in enumerate(zip(fields, names)):
+        v += ";" if i == len(fields) - 1 else ","
+        lines.append(f"  {v:<38}!- {name}")
+    return "\n".join(lines) + "\n"
+
+
+def write_ddy(ddy_fpath: str, location: dict, conds: dict) -> str:
+    """Write Site:Location and design days of conds to ddy."""
+    loc_name = f"{location['city']}_{location['state']}_{location['country']}"
+    loc_fields = [loc_name, f"{location['latitude']:g}",
+                  f"{location['longitude']:g}", f"{location['timezone']:g}",
+                  f"{location['elevation']:g}"]
+    objs = [_idf_obj("Site:Location", loc_fields, LOC_FIELDS)]
+    for kind in ("clg", "htg"):
+        for pct, cond in conds[kind].items():
+            objs.append(_idf_obj("SizingPeriod:DesignDay",
+                                 design_day_fields(loc_name, kind, pct, cond),
+                                 DD_FIELDS))
+    with open(ddy_fpath, "w", encoding="latin-1") as f:
+        f.write("! Design days generated from epw by swap/ddy.py\n\n")
+        f.write("\n".join(objs))
+    return ddy_fpath
+
+
+def gen_ddys(epw_fpaths: list[str], htg_pcts=HTG_PCTS, clg_pcts=CLG_PCTS,
+             suffix: str = "_gen.ddy") -> list[str]:
+    """Write design day ddy next to each epw, return ddy fpaths.
+
+    Epws are loaded from their npy cache and stacked, so the stats of
+    all of them are computed in one vectorized pass.
+    """
+    epws = [epw_.load_epw(f) for f in epw_fpaths]
+    # Stack on common length, leap year epws are cut to 8760
+    hours = min(len(e) for e in epws)
+    cols = ("month", "dry_bulb", "dew_point", "atm_pressure", "wind_speed",
+            "wind_dir")
+    data = {c: np.stack([e[c][:hours] for e in epws]) for c in cols}
+    conds = design_conditions(data, htg_pcts, clg_pcts)
+
+    ddy_fpaths = []
+    for e, cond in zip(epws, conds):
+        ddy_fpath = path.splitext(e.fpath)[0] + suffix
+        ddy_fpaths.append(write_ddy(ddy_fpath, e.location, cond))
+    return ddy_fpaths
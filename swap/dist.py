@@ -0,0 +1,398 @@
+from __future__ import annotations  # so we can use list, dict for typing
+import os
+import re
+import hmac
+import json
+import time
+import glob
+import shutil
+import socket
+import threading
+import subprocess
+import socketserver
+path = os.path
+
+DIST_PORT = int(os.environ.get("THERMAL_DIST_PORT", 52782))
+# Shared secret of QueueServer, TcpQueue
+DIST_TOKEN = os.environ.get("THERMAL_DIST_TOKEN", "")
+QUEUE_DIRS = ("todo", "claimed", "done", "failed", "results")
+HEARTBEAT = 30.0  # secs between worker touches of its claim
+CHUNK_BYTES = 1 << 20  # artifact stream chunk
+JOB_ID_RE = re.compile(r"[\w-]+")
+FNAME_RE = re.compile(r"\w[\w.-]*")
+
+
+def check_id(job_id: str) -> str:
+    """job_id if it's a safe file name ([\\w-]+), else ValueError."""
+    if not isinstance(job_id, str) or not JOB_ID_RE.fullmatch(job_id):
+        raise ValueError(f"Invalid job id: {job_id!r}")
+    return job_id
+
+
+def _dump_json(obj: dict, fpath: str) -> None:
+    """Write json via tmp file + rename, so readers never see half a file."""
+    tmp_fpath = f"{fpath}.{os.getpid()}.tmp"
+    with open(tmp_fpath, "w") as f:
+        json.dump(obj, f, indent=4)
+    os.replace(tmp_fpath, fpath)
+
+
+def worker_id() -> str:
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+class DirQueue:
+    """Work queue in a shared directory (nfs, smb mount, or local).
+
+    Jobs are json files moved between state dirs:
+        todo/{id}.json -> claimed/{id}.json -> done|failed/{id}.json
+    Claims are a rename, which is atomic, so each job goes to one
+    worker. Workers touch their claim every HEARTBEAT secs while the job
+    runs, and only the claim's worker can finish it. Artifacts are
+    copied to results/{id}/.
+    """
+
+    def __init__(self, dpath: str):
+        self.dpath = path.abspath(dpath)
+        for d in QUEUE_DIRS:
+            os.makedirs(path.join(self.dpath, d), exist_ok=True)
+
+    def _fpath(self, state: str, job_id: str) -> str:
+        return path.join(self.dpath, state, check_id(job_id) + ".json")
+
+    def put(self, job: dict) -> None:
+        """Publish job, replacing any old result of the same id."""
+        for state in ("done", "failed"):
+            if path.exists(self._fpath(state, job["id"])):
+                os.remove(self._fpath(state, job["id"]))
+        _dump_json(job, self._fpath("todo", job["id"]))
+
+    def claim(self, worker: str | None = None) -> dict | None:
+        """Take the next job, None if the queue is empty."""
+        for todo_fpath in sorted(glob.glob(path.join(self.dpath, "todo",
+                                                     "*.json"))):
+            claim_fpath = self._fpath(
+                "claimed", path.basename(todo_fpath)[:-5])
+            try:
+                os.rename(todo_fpath, claim_fpath)
+            except OSError:  # another worker got it first
+                continue
+            with open(claim_fpath, "r") as f:
+                job = json.load(f)
+            job["worker"] = worker or worker_id()
+            _dump_json(job, claim_fpath)
+            return job
+        return None
+
+    def owns(self, job: dict) -> bool:
+        """True if job is claimed by job's worker, not requeued."""
+        try:
+            with open(self._fpath("claimed", job["id"]), "r") as f:
+                return json.load(f).get("worker") == job.get("worker")
+        except (OSError, ValueError):
+            return False
+
+    def heartbeat(self, job: dict) -> bool:
+        """Touch job's claim, False if the claim was lost."""
+        if not self.owns(job):
+            return False
+        try:
+            os.utime(self._fpath("claimed", job["id"]))
+        except OSError:
+            return False
+        return True
+
+    def finish(self, job: dict, result: dict, artifacts: dict[str, str]
+               ) -> dict:
+        """Store job result and copies of artifacts {name: fpath}.
+
+        If the claim was lost (requeued), nothing is stored and the
+        result is returned w/ "stale": true.
+        """
+        if not self.owns(job):
+            return dict(result, artifacts={}, stale=True)
+        result_dpath = path.join(self.dpath, "results", job["id"])
+        os.makedirs(result_dpath, exist_ok=True)
+        result = dict(result, artifacts={})
+        for name, fpath in artifacts.items():
+            dst_fpath = path.join(result_dpath, path.basename(fpath))
+            shutil.copyfile(fpath, dst_fpath)
+            result["artifacts"][name] = dst_fpath
+        self._write_result(job["id"], result)
+        return result
+
+    def _write_result(self, job_id: str, result: dict) -> None:
+        state = "done" if result["ok"] else "failed"
+        _dump_json(result, self._fpath(state, job_id))
+        claim_fpath = self._fpath("claimed", job_id)
+        if path.exists(claim_fpath):
+            os.remove(claim_fpath)
+
+    def requeue(self, max_age: float) -> list[str]:
+        """Move claims w/o a heartbeat in max_age secs back to todo.
+
+        Use a max_age of a few HEARTBEATs, live workers touch theirs.
+        """
+        job_ids = []
+        for claim_fpath in glob.glob(path.join(self.dpath, "claimed",
+                                               "*.json")):
+            if time.time() - path.getmtime(claim_fpath) < max_age:
+                continue
+            job_id = path.basename(claim_fpath)[:-5]
+            try:
+                os.rename(claim_fpath, self._fpath("todo", job_id))
+                job_ids.append(job_id)
+            except OSError:
+                pass
+        return job_ids
+
+    def status(self) -> dict[str, list[str]]:
+        """Job ids in each state."""
+        return {state: sorted(path.basename(f)[:-5] for f in glob.glob(
+                    path.join(self.dpath, state, "*.json")))
+                for state in QUEUE_DIRS[:-1]}
+
+    def results(self) -> dict[str, dict]:
+        """Results of done, failed jobs."""
+        results = {}
+        for state in ("done", "failed"):
+            for fpath in glob.glob(path.join(self.dpath, state, "*.json")):
+                with open(fpath, "r") as f:
+                    results[path.basename(fpath)[:-5]] = json.load(f)
+        return results
+
+
+class QueueServer(socketserver.ThreadingTCPServer):
+    """Serves a coordinator's DirQueue to workers w/o a shared directory.
+
+    Takes one JSON request per line and answers with one JSON line:
+        {"cmd": "claim", "worker": ..} -> {"ok": true, "job": {..} | null}
+        {"cmd": "heartbeat", "job": ..} -> {"ok": true, "alive": bool}
+        {"cmd": "finish", "job": .., "result": ..,
+         "files": {name: [fname, bytes]}} + raw file bytes, in order
+        -> {"ok": true, "result": {..}}
+    Every request has a "token" that must match the server's. Binds to
+    localhost unless host is given, e.g. "0.0.0.0" on a trusted network.
+    Artifact files follow the finish line, streamed in chunks to
+    results/{id}/, only for jobs that are claimed in the queue.
+    """
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self, queue: DirQueue, token: str = DIST_TOKEN,
+                 host="127.0.0.1", port=DIST_PORT):
+        if not token:
+            raise ValueError("QueueServer needs a token, set "
+                             "THERMAL_DIST_TOKEN")
+        super().__init__((host, port), QueueHandler)
+        self.queue, self.token = queue, token
+
+    def dispatch(self, req: dict, rfile=None) -> dict:
+        """Run request, return response dict.
+
+        rfile is the binary stream the finish request's files follow.
+        """
+        if not hmac.compare_digest(str(req.get("token", "")), self.token):
+            raise PermissionError("Bad token")
+        if req.get("cmd") == "ping":
+            return {"ok": True}
+        if req.get("cmd") == "claim":
+            return {"ok": True, "job": self.queue.claim(req.get("worker"))}
+        if req.get("cmd") == "heartbeat":
+            return {"ok": True, "alive": self.queue.heartbeat(req["job"])}
+        if req.get("cmd") != "finish":
+            raise ValueError(f"Unknown cmd: {req.get('cmd')}")
+
+        job, result = req["job"], dict(req["result"], artifacts={})
+        if not self.queue.owns(job):
+            raise ValueError(f"Job {check_id(job['id'])} isn't claimed by "
+                             f"{job.get('worker')}")
+        result_dpath = path.join(self.queue.dpath, "results", job["id"])
+        os.makedirs(result_dpath, exist_ok=True)
+        files = req.get("files", {})
+        for fname, _ in files.values():
+            if not FNAME_RE.fullmatch(fname):
+                raise ValueError(f"Invalid artifact name: {fname!r}")
+        for name, (fname, size) in files.items():
+            dst_fpath = path.join(result_dpath, fname)
+            _recv_file(rfile, int(size), dst_fpath)
+            result["artifacts"][name] = dst_fpath
+        self.queue._write_result(job["id"], result)
+        return {"ok": True, "result": result}
+
+
+def _recv_file(rfile, size: int, fpath: str) -> None:
+    """Write the next size bytes of rfile to fpath, in chunks."""
+    tmp_fpath = f"{fpath}.{os.getpid()}.tmp"
+    with open(tmp_fpath, "wb") as f:
+        while size > 0:
+            chunk = rfile.read(min(size, CHUNK_BYTES))
+            if not chunk:
+                raise ConnectionError(f"{fpath} upload cut short")
+            f.write(chunk)
+            size -= len(chunk)
+    os.replace(tmp_fpath, fpath)
+
+
+class QueueHandler(socketserver.StreamRequestHandler):
+    """Handle JSON-line requests for QueueServer."""
+
+    def handle(self):
+        for line in self.rfile:
+            try:
+                resp = self.server.dispatch(json.loads(line), self.rfile)
+            except Exception as err:
+                resp = {"ok": False, "error": f"{type(err).__name__}: {err}"}
+            self.wfile.write((json.dumps(resp) + "\n").encode("utf-8"))
+            self.wfile.flush()
+            if not resp["ok"]:
+                break  # unread file bytes may follow
+
+
+class TcpQueue:
+    """Worker side of QueueServer, w/ the same claim, finish as DirQueue."""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = DIST_PORT,
+                 token: str = DIST_TOKEN, timeout: float = 60.0):
+        self.host, self.port, self.timeout = host, port, timeout
+        self.token = token
+
+    def _request(self, req: dict, fpaths: list[str] = ()) -> dict:
+        """Send req line, then fpaths' bytes in chunks, return response."""
+        req = dict(req, token=self.token)
+        with socket.create_connection((self.host, self.port),
+                                      timeout=self.timeout) as sock, \
+                sock.makefile("rwb") as f:
+            f.write((json.dumps(req) + "\n").encode("utf-8"))
+            for fpath in fpaths:
+                with open(fpath, "rb") as src:
+                    shutil.copyfileobj(src, f, CHUNK_BYTES)
+            f.flush()
+            resp = json.loads(f.readline())
+        if not resp.get("ok"):
+            raise RuntimeError(resp.get("error"))
+        return resp
+
+    def claim(self, worker: str | None = None) -> dict | None:
+        return self._request({"cmd": "claim",
+                              "worker": worker or worker_id()})["job"]
+
+    def heartbeat(self, job: dict) -> bool:
+        return self._request({"cmd": "heartbeat", "job": job})["alive"]
+
+    def finish(self, job: dict, result: dict, artifacts: dict[str, str]
+               ) -> dict:
+        files = {name: (path.basename(fpath), path.getsize(fpath))
+                 for name, fpath in artifacts.items()}
+        return self._request({"cmd": "finish", "job": job, "result": result,
+                              "files": files}, list(artifacts.values())
+                             )["result"]
+
+
+def make_job(job_id: str, cmds: list[list[str]],
+             artifacts: dict[str, str] | None = None) -> dict:
+    """Job of cmds (argv lists) run in order, artifacts {name: fpath}."""
+    return {"id": check_id(job_id), "cmds": cmds, "artifacts": artifacts or {}}
+
+
+def run_job(job: dict, log_fpath: str | None = None) -> tuple[dict, dict]:
+    """Run job cmds, stopping at first failure.
+
+    Returns result dict and the artifacts {name: fpath} that exist.
+    """
+    t0, result = time.time(), {"id": job["id"], "ok": True,
+                               "worker": job.get("worker", worker_id())}
+    log_fp = open(log_fpath, "ab") if log_fpath else subprocess.DEVNULL
+    try:
+        for cmds in job["cmds"]:
+            try:
+                rc = subprocess.run(cmds, stdout=log_fp,
+                                    stderr=subprocess.STDOUT).returncode
+            except OSError as err:
+                rc, result["error"] = -1, f"{type(err).__name__}: {err}"
+            result["returncode"] = rc
+            if rc != 0:
+                result["ok"] = False
+                result.setdefault("error", f"{cmds[:2]} exited {rc}")
+                break
+    finally:
+        if log_fpath:
+            log_fp.close()
+    result["seconds"] = time.time() - t0
+    artifacts = {name: fpath for name, fpath in job["artifacts"].items()
+                 if path.exists(fpath)}
+    return result, artifacts
+
+
+def _heartbeat(queue: DirQueue | TcpQueue, job: dict,
+               stop: threading.Event, every: float) -> None:
+    """Touch job's claim every secs until stop is set."""
+    while not stop.wait(every):
+        try:
+            _ = queue.heartbeat(job)
+        except Exception:  # missed beats only age the claim
+            pass
+
+
+def work(queue: DirQueue | TcpQueue, worker: str | None = None,
+         poll: float = 5.0, wait: bool = False,
+         log_dpath: str | None = None, heartbeat: float = HEARTBEAT
+         ) -> list[dict]:
+    """Pull, run jobs from queue until it's empty (or forever if wait).
+
+    Claims are touched every heartbeat secs while a job runs. Returns
+    results of jobs run by this worker.
+    """
+    worker, results = worker or worker_id(), []
+    while True:
+        job = queue.claim(worker)
+        if job is None:
+            if not wait:
+                return results
+            time.sleep(poll)
+            continue
+        log_fpath = path.join(log_dpath, job["id"] + ".log") \
+            if log_dpath else None
+        stop = threading.Event()
+        beat = threading.Thread(target=_heartbeat, daemon=True,
+                                args=(queue, job, stop, heartbeat))
+        beat.start()
+        try:
+            result, artifacts = run_job(job, log_fpath)
+        finally:
+            stop.set()
+            beat.join()
+        try:
+            result = queue.finish(job, result, artifacts)
+        except RuntimeError as err:  # tcp coordinator refused it
+            result = dict(result, stale=True, error=str(err))
+        if result.get("stale"):
+            print(f" - {worker} {job['id']}: claim lost, result dropped",
+                  flush=True)
+            continue
+        results.append(result)
+        print(f" - {worker} {job['id']}: "
+              f"{'ok' if result['ok'] else result.get('error')} "
+              f"({result['seconds']:.1f}s)", flush=True)
+
+
+def wait_jobs(queue: DirQueue, job_ids: list[str], poll: float = 5.0,
+              timeout: float | None = None, requeue_age: float | None = None
+              ) -> dict[str, dict]:
+    """Block until job_ids are done or failed, return their results.
+
+    Claims w/o a heartbeat in requeue_age secs are put back, for dead
+    workers.
+    """
+    t0 = time.time()
+    while True:
+        results = queue.results()
+        if all(job_id in results for job_id in job_ids):
+            return {job_id: results[job_id] for job_id in job_ids}
+        if timeout is not None and time.time() - t0 > timeout:
+            raise TimeoutError(
+                f"{len(set(job_ids) - set(results))} jobs not done "
+                f"after {timeout}s")
+        if requeue_age:
+            _ = queue.requeue(requeue_age)
+        time.sleep(poll)
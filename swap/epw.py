@@ -0,0 +1,129 @@
+from __future__ import annotations  # so we can use list, dict for typing
+import os
+import time
+from dataclasses import dataclass
+import numpy as np
+path = os.path
+
+# Epw data columns, in file order. data_source (col 5) is a flag string
+# and isn't cached.
+EPW_COLS = (
+    "year", "month", "day", "hour", "minute", "data_source",
+    "dry_bulb", "dew_point", "rel_humidity", "atm_pressure",
+    "ext_hor_rad", "ext_dir_norm_rad", "hor_ir_sky", "glo_hor_rad",
+    "dir_norm_rad", "dif_hor_rad", "glo_hor_illum", "dir_norm_illum",
+    "dif_hor_illum", "zen_lum", "wind_dir", "wind_speed", "tot_sky_cover",
+    "opq_sky_cover", "visibility", "ceiling_height", "present_weather_obs",
+    "present_weather_codes", "precip_water", "aerosol_opt_depth",
+    "snow_depth", "days_since_snow", "albedo", "liquid_precip_depth",
+    "liquid_precip_rate")
+DATA_COLS = tuple(c for c in EPW_COLS if c != "data_source")
+EPW_HEADER_ROWS = 8
+COL_ALIASES = {"ghi": "glo_hor_rad", "dni": "dir_norm_rad",
+               "dhi": "dif_hor_rad", "db": "dry_bulb", "dp": "dew_point",
+               "rh": "rel_humidity", "ws": "wind_speed", "wd": "wind_dir"}
+
+
+@dataclass
+class Epw:
+    """Epw header and data columns.
+
+    data is a (columns, hours) float64 array, so each column is a
+    contiguous row. When loaded from cache it's a read-only memmap
+    shared (page cached) by every process reading the same epw.
+        epw = load_epw(fpath)
+        epw["dry_bulb"], epw["ghi"]  # 8760 arrays, no copy
+    """
+    fpath: str
+    header: list[str]
+    data: np.ndarray
+
+    def __getitem__(self, col: str) -> np.ndarray:
+        col = COL_ALIASES.get(col, col)
+        return self.data[DATA_COLS.index(col)]
+
+    def __len__(self) -> int:
+        return self.data.shape[1]
+
+    @property
+    def location(self) -> dict:
+        """City, wmo, lat, lon, tz, elevation from LOCATION header."""
+        v = self.header[0].split(",")
+        return {"city": v[1], "state": v[2], "country": v[3],
+                "wmo": v[5], "latitude": float(v[6]),
+                "longitude": float(v[7]), "timezone": float(v[8]),
+                "elevation": float(v[9])}
+
+
+def read_header(epw_fpath: str) -> list[str]:
+    """First EPW_HEADER_ROWS lines of epw."""
+    with open(epw_fpath, "r", encoding="latin-1") as f:
+        return [f.readline().rstrip("\r\n") for _ in range(EPW_HEADER_ROWS)]
+
+
+def parse_epw_rows(epw_fpath: str) -> np.ndarray:
+    """Row by row text parse of epw data, as (columns, hours) array.
+
+    Only kept as the benchmark baseline, use parse_epw.
+    """
+    rows = []
+    with open(epw_fpath, "r", encoding="latin-1") as f:
+        for i, line in enumerate(f):
+            if i < EPW_HEADER_ROWS:
+                continue
+            vals = line.rstrip("\r\n").split(",")
+            rows.append([float(v) for j, v in enumerate(vals) if j != 5])
+    return np.array(rows, dtype=np.float64).T.copy()
+
+
+def parse_epw(epw_fpath: str) -> np.ndarray:
+    """Vectorized parse of epw data, as (columns, hours) array."""
+    usecols = [i for i, c in enumerate(EPW_COLS) if c != "data_source"]
+    data = np.loadtxt(epw_fpath, delimiter=",", skiprows=EPW_HEADER_ROWS,
+                      usecols=usecols, dtype=np.float64, encoding="latin-1",
+                      ndmin=2)
+    return np.ascontiguousarray(data.T)
+
+
+def epw_cache_fpath(epw_fpath: str) -> str:
+    return epw_fpath + ".npy"
+
+
+def load_epw(epw_fpath: str, cache: bool = True) -> Epw:
+    """Load epw, parsing the text once into a .npy cache next to it.
+
+    The cache is rebuilt if it's older than the epw. Later loads
+    memory-map it (read-only), so columns aren't copied.
+    """
+    header = read_header(epw_fpath)
+    if not cache:
+        return Epw(epw_fpath, header, parse_epw(epw_fpath))
+
+    npy_fpath = epw_cache_fpath(epw_fpath)
+    if not path.exists(npy_fpath) or \
+            path.getmtime(npy_fpath) < path.getmtime(epw_fpath):
+        data = parse_epw(epw_fpath)
+        # Write tmp then rename, so parallel readers never see half a file
+        tmp_fpath = f"{npy_fpath}.{os.getpid()}.tmp.npy"
+        np.save(tmp_fpath, data)
+        os.replace(tmp_fpath, npy_fpath)
+    data = np.load(npy_fpath, mmap_mode="r")
+    return Epw(epw_fpath, header, data)
+
+
+def bench_epw(epw_fpath: str, n: int = 5) -> dict[str, float]:
+    """Best of n secs to get dry_bulb by row parse, loadtxt, cached mmap."""
+    def _best(fn):
+        secs = []
+        for _ in range(n):
+            t0 = time.perf_counter()
+            fn()
+            secs.append(time.perf_counter() - t0)
+        return min(secs)
+
+    _ = load_epw(epw_fpath)  # build cache
+    return {
+        "rows": _best(lambda: parse_epw_rows(epw_fpath)[
+            DATA_COLS.index("dry_bulb")]),
+        "loadtxt": _best(lambda: load_epw(epw_fpath, cache=False)["db"]),
+        "mmap": _best(lambda: load_epw(epw_fpath)["db"])}
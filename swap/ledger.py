@@ -0,0 +1,162 @@
+from __future__ import annotations  # so we can use list, dict for typing
+import os
+import json
+import time
+import hashlib
+import sqlite3
+path = os.path
+
+JOB_COLS = ("id", "name", "stage", "inputs_hash", "status", "started",
+            "seconds", "returncode", "artifacts", "error", "features")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL,
+    stage TEXT NOT NULL,
+    inputs_hash TEXT NOT NULL,
+    status TEXT NOT NULL,
+    started REAL NOT NULL,
+    seconds REAL,
+    returncode INTEGER,
+    artifacts TEXT,
+    error TEXT,
+    features TEXT
+);
+CREATE INDEX IF NOT EXISTS jobs_key ON jobs (name, stage, inputs_hash);
+"""
+
+
+def hash_inputs(fpaths: list[str]) -> str:
+    """Sha256 over content of fpaths, missing files hash as None."""
+    h = hashlib.sha256()
+    for fpath in sorted(fpaths):
+        h.update(fpath.encode())
+        if not path.exists(fpath):
+            h.update(b"\0None")
+            continue
+        with open(fpath, "rb") as f:
+            for b in iter(lambda: f.read(1 << 20), b""):
+                h.update(b)
+    return h.hexdigest()
+
+
+class Ledger:
+    """SQLite record of every swap/sim job run.
+
+    Each attempt is a row keyed on (name, stage, inputs_hash), so a job
+    is finished if it has a 'done' row w/ the current inputs hash. Rows
+    left 'running' by a crash count as unfinished.
+        with Ledger(db_fpath) as ledger:
+            if not ledger.is_done("4b", "chain", h):
+                job_id = ledger.start("4b", "chain", h)
+                ...
+                ledger.finish(job_id, "done", artifacts={...})
+    """
+
+    def __init__(self, db_fpath: str):
+        self.db_fpath = db_fpath
+        if path.dirname(db_fpath):
+            os.makedirs(path.dirname(db_fpath), exist_ok=True)
+        # Batch workers may write concurrently
+        self.conn = sqlite3.connect(db_fpath, timeout=30)
+        self.conn.row_factory = sqlite3.Row
+        _ = self.conn.execute("PRAGMA journal_mode=WAL")
+        _ = self.conn.executescript(_SCHEMA)
+        cols = {row["name"] for row in
+                self.conn.execute("PRAGMA table_info(jobs)")}
+        with self.conn:  # ledgers from before features were recorded
+            for col in JOB_COLS:
+                if col not in cols:
+                    _ = self.conn.execute(
+                        f"ALTER TABLE jobs ADD COLUMN {col} TEXT")
+
+    def __enter__(self) -> Ledger:
+        return self
+
+    def __exit__(self, *_) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def start(self, name: str, stage: str, inputs_hash: str,
+              features: dict | None = None) -> int:
+        """Add 'running' row for job, returns its id.
+
+        features are the model features used to predict run time.
+        """
+        with self.conn:
+            cur = self.conn.execute(
+                "INSERT INTO jobs (name, stage, inputs_hash, status, started, "
+                "features) VALUES (?, ?, ?, 'running', ?, ?)",
+                (name, stage, inputs_hash, time.time(),
+                 json.dumps(features) if features else None))
+        return cur.lastrowid
+
+    def finish(self, job_id: int, status: str, seconds: float | None = None,
+               returncode: int | None = None, artifacts: dict | None = None,
+               error: str | None = None) -> None:
+        """Set job status, duration and artifacts when it ends."""
+        if seconds is None:
+            started = self.conn.execute(
+                "SELECT started FROM jobs WHERE id = ?", (job_id,)
+            ).fetchone()["started"]
+            seconds = time.time() - started
+        with self.conn:
+            _ = self.conn.execute(
+                "UPDATE jobs SET status = ?, seconds = ?, returncode = ?, "
+                "artifacts = ?, error = ? WHERE id = ?",
+                (status, seconds, returncode, json.dumps(artifacts or {}),
+                 error, job_id))
+
+    def is_done(self, name: str, stage: str, inputs_hash: str) -> bool:
+        """True if job has finished w/ these inputs before."""
+        row = self.conn.execute(
+            "SELECT 1 FROM jobs WHERE name = ? AND stage = ? AND "
+            "inputs_hash = ? AND status = 'done' LIMIT 1",
+            (name, stage, inputs_hash)).fetchone()
+        return row is not None
+
+    def history(self, stage: str, limit: int = 500
+                ) -> list[tuple[dict, float]]:
+        """(features, seconds) of recent finished jobs of stage."""
+        rows = self.conn.execute(
+            "SELECT features, seconds FROM jobs WHERE stage = ? AND "
+            "status = 'done' AND features IS NOT NULL ORDER BY id DESC "
+            "LIMIT ?", (stage, limit)).fetchall()
+        return [(json.loads(row["features"]), row["seconds"]) for row in rows]
+
+    def _select(self, where: str = "", order: str = "id DESC",
+                limit: int = 20, params: tuple = ()) -> list[dict]:
+        sql = f"SELECT * FROM jobs {where} ORDER BY {order} LIMIT ?"
+        rows = self.conn.execute(sql, params + (limit,)).fetchall()
+        return [dict(row, artifacts=json.loads(row["artifacts"] or "{}"),
+                     features=json.loads(row["features"] or "null"))
+                for row in rows]
+
+    def jobs(self, stage: str | None = None, limit: int = 20) -> list[dict]:
+        """Most recent jobs, optionally of one stage."""
+        if stage is None:
+            return self._select(limit=limit)
+        return self._select("WHERE stage = ?", limit=limit, params=(stage,))
+
+    def failures(self, limit: int = 20) -> list[dict]:
+        """Most recent failed or interrupted jobs."""
+        return self._select("WHERE status != 'done'", limit=limit)
+
+    def slowest(self, limit: int = 20) -> list[dict]:
+        """Finished jobs w/ longest duration."""
+        return self._select("WHERE seconds IS NOT NULL",
+                            order="seconds DESC", limit=limit)
+
+
+def print_rows(rows: list[dict]) -> None:
+    """Print ledger rows as one line per job."""
+    for row in rows:
+        secs = f"{row['seconds']:.1f}s" if row["seconds"] is not None else "-"
+        started = time.strftime("%Y-%m-%d %H:%M",
+                                time.localtime(row["started"]))
+        print(f" - [{row['id']}] {row['name']} {row['stage']}: "
+              f"{row['status']} ({secs}, rc={row['returncode']}, {started})" +
+              (f" {row['error']}" if row["error"] else ""))
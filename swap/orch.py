@@ -0,0 +1,312 @@
+from __future__ import annotations  # so we can use list, dict for typing
+import os
+import sys
+import json
+import time
+import signal
+import asyncio
+from dataclasses import dataclass, field
+path = os.path
+
+SWAP_FPATH = path.join(path.dirname(path.abspath(__file__)), "../lbt/swap.py")
+JOB_STATES = ("queued", "running", "done", "failed", "cancelled")
+ADMIT_POLL = 1.0  # seconds between admission checks
+MEM_RESERVE_MB = 1024  # left free for the os, other users
+KILL_GRACE = 10.0  # secs for terminated jobs to stop their sims
+
+
+def signal_group(proc, sig: int) -> None:
+    """Send sig to proc's process group (its own, see SimQueue)."""
+    if os.name == "nt":
+        proc.terminate()  # no groups, TerminateProcess either way
+        return
+    try:
+        os.killpg(proc.pid, sig)
+    except ProcessLookupError:
+        pass
+
+
+def affinity_cpus() -> list[int]:
+    """Cpus this process may run on (affinity set, cgroup/taskset aware)."""
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return [*range(os.cpu_count() or 1)]
+
+
+def avail_mem_mb() -> float | None:
+    """Available memory in MB, None if unknown.
+
+    Uses psutil if installed, else /proc/meminfo on linux.
+    """
+    try:
+        import psutil
+        return psutil.virtual_memory().available / 2**20
+    except ImportError:
+        pass
+    if path.exists("/proc/meminfo"):
+        with open("/proc/meminfo", "r") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) / 1024
+    return None
+
+
+def load_avg() -> float:
+    """1 minute load average, 0 if unsupported (windows)."""
+    try:
+        return os.getloadavg()[0]
+    except (AttributeError, OSError):
+        return 0.0
+
+
+@dataclass
+class SimJob:
+    """Tracked simulation job.
+
+    cmds is the argv run as an async subprocess. If result_fpath is set
+    it's read as a swap.py --result json when the job ends. threads is
+    the number of cpus the job is pinned to and the EnergyPlus thread
+    limit, mem_mb the memory needed free before it's started.
+    est_seconds is the predicted run time, used for ordering and ETA.
+    """
+    name: str
+    cmds: list[str]
+    log_fpath: str | None = None
+    result_fpath: str | None = None
+    state: str = "queued"
+    returncode: int | None = None
+    seconds: float | None = None
+    attempts: int = 0
+    outputs: dict = field(default_factory=dict)
+    error: str | None = None
+    threads: int = 1
+    mem_mb: float = 512
+    cpus: list[int] = field(default_factory=list)
+    est_seconds: float | None = None
+    started: float | None = None
+
+
+def sim_job(osw_fpath: str, name: str | None = None,
+            swap_fpath: str = SWAP_FPATH, threads: int = 1) -> SimJob:
+    """SimJob for 'swap.py sim' of osw, w/ log, result in osw dir.
+
+    Not --quiet, so openstudio, energyplus output goes to sim.log.
+    """
+    osw_fpath = path.abspath(osw_fpath)
+    osw_dpath = path.dirname(osw_fpath)
+    result_fpath = path.join(osw_dpath, "sim_result.json")
+    cmds = [sys.executable, path.abspath(swap_fpath), "sim", osw_fpath,
+            "--result", result_fpath]
+    return SimJob(name or osw_dpath, cmds,
+                  log_fpath=path.join(osw_dpath, "sim.log"),
+                  result_fpath=result_fpath, threads=threads)
+
+
+class SimQueue:
+    """Asyncio queue that runs up to max_jobs subprocesses at once.
+
+    Jobs are scheduled against the cpu affinity set: each is pinned to
+    job.threads free cpus, and only admitted while there's job.mem_mb
+    memory free (after MEM_RESERVE_MB) and load stays under max_load
+    (default: cpus). So we don't oversubscribe a shared node. A job is
+    always admitted if none of ours are running, so the queue can't stall.
+    Failed jobs are rerun up to retries times. Jobs can be cancelled
+    while queued or running.
+    """
+
+    def __init__(self, max_jobs: int | None = None, retries: int = 0,
+                 cpus: list[int] | None = None,
+                 max_load: float | None = None, pin: bool = True,
+                 report: bool = False):
+        self.cpus = cpus or affinity_cpus()
+        self.max_jobs = max_jobs or len(self.cpus)
+        self.max_load = max_load or float(len(self.cpus))
+        self.retries = retries
+        self.pin = pin and hasattr(os, "sched_setaffinity")
+        self.report = report
+        self.jobs: dict[str, SimJob] = {}
+        self._procs: dict[str, asyncio.subprocess.Process] = {}
+        self._free_cpus = set(self.cpus)
+        self._running: set[str] = set()
+
+    def add(self, job: SimJob) -> SimJob:
+        assert job.name not in self.jobs, f"Duplicate job {job.name}"
+        self.jobs[job.name] = job
+        return job
+
+    def cancel(self, name: str) -> SimJob:
+        """Cancel queued job, or terminate running job's process group.
+
+        'swap.py sim' kills its openstudio, energyplus on SIGTERM.
+        """
+        job = self.jobs[name]
+        if job.state in {"queued", "running"}:
+            job.state = "cancelled"
+        if name in self._procs:
+            signal_group(self._procs[name], signal.SIGTERM)
+        return job
+
+    async def _stop(self, proc, grace: float = KILL_GRACE) -> None:
+        """Terminate proc's group, kill it if not stopped after grace."""
+        signal_group(proc, signal.SIGTERM)
+        try:
+            _ = await asyncio.wait_for(proc.wait(), grace)
+        except asyncio.TimeoutError:
+            signal_group(proc, getattr(signal, "SIGKILL", signal.SIGTERM))
+
+    def _can_admit(self, job: SimJob) -> bool:
+        """True if cpus, memory, load allow starting job now."""
+        if not self._running:
+            return True
+        n = min(job.threads, len(self.cpus))
+        if len(self._free_cpus) < n:
+            return False
+        mem = avail_mem_mb()
+        if mem is not None and mem - MEM_RESERVE_MB < job.mem_mb:
+            return False
+        # Load avg lags, so count our own running threads too
+        busy = len(self.cpus) - len(self._free_cpus)
+        return max(load_avg(), busy) + n <= self.max_load
+
+    async def _admit(self, job: SimJob) -> None:
+        """Wait until job can start, then reserve its cpus."""
+        while not self._can_admit(job):
+            await asyncio.sleep(ADMIT_POLL)
+        n = min(job.threads, len(self.cpus))
+        job.cpus = sorted(self._free_cpus)[:n]
+        self._free_cpus -= set(job.cpus)
+        self._running.add(job.name)
+
+    def _release(self, job: SimJob) -> None:
+        self._free_cpus |= set(job.cpus) & set(self.cpus)
+        self._running.discard(job.name)
+
+    def _proc_kwargs(self, job: SimJob) -> dict:
+        """Env, affinity of job subprocess.
+
+        Limits EnergyPlus (OpenMP) threads to job.threads and pins the
+        process tree to job.cpus. Jobs get their own session, so their
+        process group can be signalled w/o ours.
+        """
+        n = str(len(job.cpus) or job.threads)
+        env = dict(os.environ, OMP_NUM_THREADS=n, EP_OMP_NUM_THREADS=n)
+        kwargs = {"env": env, "start_new_session": os.name != "nt"}
+        if self.pin and job.cpus:
+            cpus = set(job.cpus)
+            kwargs["preexec_fn"] = lambda: os.sched_setaffinity(0, cpus)
+        return kwargs
+
+    async def _run_once(self, job: SimJob) -> None:
+        """Run job subprocess once, update its state."""
+        job.state, job.attempts, t0 = "running", job.attempts + 1, time.time()
+        job.error, job.started = None, t0
+        if job.result_fpath and path.exists(job.result_fpath):
+            os.remove(job.result_fpath)
+        log_fp = open(job.log_fpath, "ab") if job.log_fpath else None
+        out = log_fp or asyncio.subprocess.DEVNULL
+        try:
+            proc = await asyncio.create_subprocess_exec(
+                *job.cmds, stdout=out, stderr=asyncio.subprocess.STDOUT,
+                **self._proc_kwargs(job))
+            self._procs[job.name] = proc
+            job.returncode = await proc.wait()
+        except OSError as err:
+            job.returncode, job.error = -1, f"{type(err).__name__}: {err}"
+        finally:
+            self._procs.pop(job.name, None)
+            if log_fp:
+                log_fp.close()
+
+        job.seconds = time.time() - t0
+        if job.result_fpath and path.exists(job.result_fpath):
+            with open(job.result_fpath, "r") as f:
+                result = json.load(f)
+            job.outputs = result.get("outputs", {})
+            job.error = result.get("error") or job.error
+        if job.state == "cancelled":
+            return
+        job.state = "done" if job.returncode == 0 else "failed"
+
+    def eta(self) -> float:
+        """Predicted seconds until all jobs finish.
+
+        Remaining est_seconds of queued, running jobs spread over
+        max_jobs, but no less than the longest running job's remainder.
+        """
+        now, running, queued = time.time(), [], []
+        for job in self.jobs.values():
+            est = job.est_seconds or 0.0
+            if job.state == "running" and job.started:
+                running.append(max(est - (now - job.started), 0.0))
+            elif job.state == "queued":
+                queued.append(est)
+        total = sum(running) + sum(queued)
+        return max(total / self.max_jobs, max(running, default=0.0))
+
+    def _report(self, job: SimJob) -> None:
+        """Print finished job and batch ETA."""
+        n_done = sum(j.state not in {"queued", "running"}
+                     for j in self.jobs.values())
+        est = f", est {job.est_seconds:.0f}s" if job.est_seconds else ""
+        print(f" - {job.name} {job.state} in {job.seconds:.1f}s{est}. "
+              f"{n_done}/{len(self.jobs)} done, ETA {self.eta():.0f}s",
+              flush=True)
+
+    async def _worker(self, queue: asyncio.Queue) -> None:
+        while True:
+            job = await queue.get()
+            try:
+                while job.state == "queued" or (
+                        job.state == "failed"
+                        and job.attempts <= self.retries):
+                    await self._admit(job)
+                    try:
+                        if job.state != "cancelled":
+                            await self._run_once(job)
+                    finally:
+                        self._release(job)
+                if self.report and job.seconds is not None:
+                    self._report(job)
+            finally:
+                queue.task_done()
+
+    async def run(self) -> list[SimJob]:
+        """Run all queued jobs, return jobs."""
+        queue = asyncio.Queue()
+        for job in self.jobs.values():
+            if job.state == "queued":
+                queue.put_nowait(job)
+        workers = [asyncio.ensure_future(self._worker(queue))
+                   for _ in range(min(self.max_jobs, max(queue.qsize(), 1)))]
+        try:
+            await queue.join()
+        finally:
+            # Don't leave simulations running if we're interrupted
+            _ = await asyncio.gather(
+                *(self._stop(proc) for proc in list(self._procs.values())))
+            for w in workers:
+                w.cancel()
+        return list(self.jobs.values())
+
+
+def run_jobs(jobs: list[SimJob], max_jobs: int | None = None,
+             retries: int = 0, max_load: float | None = None,
+             report: bool = False) -> list[SimJob]:
+    """Run jobs on a SimQueue, blocking until all finish.
+
+    Jobs are queued in list order, see predict.order_jobs.
+    """
+    sim_queue = SimQueue(max_jobs, retries, max_load=max_load, report=report)
+    for job in jobs:
+        sim_queue.add(job)
+    return asyncio.run(sim_queue.run())
+
+
+def print_jobs(jobs: list[SimJob]) -> None:
+    """Print job state, returncode, duration summary."""
+    print("## Sim jobs")
+    for job in jobs:
+        secs = f"{job.seconds:.1f}s" if job.seconds is not None else "-"
+        print(f" - {job.name}: {job.state} (rc={job.returncode}, {secs}, "
+              f"attempts={job.attempts})" +
+              (f" {job.error}" if job.error else ""))
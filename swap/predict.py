@@ -0,0 +1,100 @@
+from __future__ import annotations  # so we can use list, dict for typing
+import os
+import datetime
+from lbt.swap import iter_idf_objects
+path = os.path
+
+# Fallback secs per unit of work (see osm_work) if there's no history.
+# ~5 min for an annual, 6 timestep, 200 surface model.
+SECS_PER_WORK = 3e-5
+ORDERS = ("lpt", "sjf", "fifo")
+
+
+def _period_days(fields: list[str]) -> int:
+    """Days in OS:RunPeriod (handle, name, begin m/d, end m/d, ...)."""
+    try:
+        bm, bd, em, ed = (int(v) for v in fields[2:6])
+    except ValueError:
+        return 365
+    # Non-leap year, like the tmy epws we run
+    begin, end = datetime.date(2009, bm, bd), datetime.date(2009, em, ed)
+    if end < begin:
+        end = end.replace(year=2010)
+    return (end - begin).days + 1
+
+
+def osm_features(osm_fpath: str, cz: str | None = None) -> dict:
+    """Features of osm that drive EnergyPlus run time.
+
+    zones, surfaces, timestep (per hour), days simulated (run periods if
+    weather file periods run, plus design days) and climate zone.
+    """
+    feats = {"zones": 0, "surfaces": 0, "timestep": 1, "days": 0, "cz": cz}
+    period_days, design_days, run_periods = 0, 0, True
+    for obj_type, fields in iter_idf_objects(osm_fpath):
+        if obj_type == "OS:ThermalZone":
+            feats["zones"] += 1
+        elif obj_type in {"OS:Surface", "OS:SubSurface"}:
+            feats["surfaces"] += 1
+        elif obj_type == "OS:Timestep" and len(fields) > 1 and fields[1]:
+            feats["timestep"] = int(fields[1])
+        elif obj_type == "OS:RunPeriod":
+            period_days += _period_days(fields)
+        elif obj_type == "OS:SizingPeriod:DesignDay":
+            design_days += 1
+        elif obj_type == "OS:SimulationControl" and len(fields) > 5:
+            run_periods = fields[5].lower() != "no"
+    if run_periods:
+        feats["days"] += period_days or 365
+    feats["days"] += design_days
+    return feats
+
+
+def osm_work(feats: dict) -> float:
+    """Heat balance work units: timesteps simulated x (surfaces + zones)."""
+    return (feats["timestep"] * 24 * feats["days"] *
+            (feats["surfaces"] + feats["zones"]))
+
+
+class DurationModel:
+    """Predicts run seconds as a + b * osm_work(features).
+
+    Least squares fit to observed (features, seconds) of past runs. With
+    one run, b is its secs per work; with none, SECS_PER_WORK.
+    """
+
+    def __init__(self, a: float = 0.0, b: float = SECS_PER_WORK):
+        self.a, self.b = a, b
+
+    @classmethod
+    def fit(cls, history: list[tuple[dict, float]]) -> DurationModel:
+        xs = [osm_work(feats) for feats, _ in history]
+        ys = [secs for _, secs in history]
+        n = len(xs)
+        if n == 0 or not any(xs):
+            return cls()
+        mx, my = sum(xs) / n, sum(ys) / n
+        sxx = sum((x - mx) ** 2 for x in xs)
+        if sxx == 0:
+            return cls(0.0, my / mx)
+        b = sum((x - mx) * (y - my) for x, y in zip(xs, ys)) / sxx
+        if b <= 0:  # noisy history, fall back to mean rate
+            return cls(0.0, my / mx)
+        return cls(my - b * mx, b)
+
+    def predict(self, feats: dict) -> float:
+        return max(self.a + self.b * osm_work(feats), 0.0)
+
+
+def order_jobs(jobs: list, order: str = "lpt", est=None) -> list:
+    """Sort jobs by est(job) secs (default job.est_seconds) for the queue.
+
+    lpt (longest first) minimizes makespan on parallel workers, sjf
+    (shortest first) gets the most results back early.
+    """
+    assert order in ORDERS, f"order must be one of {ORDERS}, got {order}"
+    if order == "fifo":
+        return list(jobs)
+    est = est or (lambda job: job.est_seconds)
+    return sorted(jobs, key=lambda job: est(job) or 0.0,
+                  reverse=order == "lpt")
@@ -0,0 +1,471 @@
+from __future__ import annotations  # so we can use list, dict for typing
+import os
+import re
+import json
+import time
+import gzip
+import shutil
+import sqlite3
+import contextlib
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+path = os.path
+
+MANIFEST_FNAME = "manifest.json"
+# Time.IntervalType of ReportDataDictionary.ReportingFrequency
+INTERVAL_TYPES = {"HVAC System Timestep": -1, "Zone Timestep": 0,
+                  "Hourly": 1, "Daily": 2, "Monthly": 3, "Run Period": 4,
+                  "Annual": 5}
+# Rows of {freq}_time.npy
+TIME_COLS = ("month", "day", "hour", "minute", "env")
+# Compacted run, see compact_run
+COMPACT_FNAME = "results.npz"
+COMPACT_MANIFEST = "results.json"
+COMPACT_FREQS = ("Hourly", "Daily", "Monthly", "Run Period", "Annual")
+RETENTIONS = ("keep", "archive", "drop")
+# Raw text outputs that duplicate the sql, deleted unless retention=keep.
+# eplustbl.htm is the sql's tabular reports, kept in the npz
+RAW_FNAMES = ("eplusout.eso", "eplusout.mtr", "eplusout.audit",
+              "eplusout.bnd", "eplusout.shd", "eplusout.rdd",
+              "eplusout.mdd", "eplusmtr.csv", "eplusout.csv",
+              "eplustbl.htm")
+TABULAR_COLS = ("ReportName", "ReportForString", "TableName", "RowName",
+                "ColumnName", "Units")
+
+
+def connect_sql(sql_fpath: str) -> contextlib.closing:
+    """Read-only connection to eplusout.sql, closed after the with-block."""
+    return contextlib.closing(
+        sqlite3.connect(f"file:{sql_fpath}?mode=ro", uri=True))
+
+
+def freq_slug(freq: str) -> str:
+    """File name of frequency, 'Run Period' -> 'run_period'."""
+    return re.sub(r"\W+", "_", freq.strip()).lower()
+
+
+def _to_float(v: str) -> float:
+    try:
+        return float(v)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def sql_index(sql_fpath: str) -> dict:
+    """Variables, time steps per frequency and tabular values of a run.
+
+    Returns {"vars": {freq: [(key, name, units, is_meter)]}, "times":
+    {freq: n}, "tabular": {(report, for, table, row, col, units): v}}.
+    Non-numeric tabular values are dropped.
+    """
+    index = {"vars": {}, "times": {}, "tabular": {}}
+    with connect_sql(sql_fpath) as conn:
+        for key, name, units, freq, is_meter in conn.execute(
+                "SELECT KeyValue, Name, Units, ReportingFrequency, IsMeter "
+                "FROM ReportDataDictionary "
+                "ORDER BY ReportDataDictionaryIndex"):
+            index["vars"].setdefault(freq, []).append(
+                (key or "", name, units, is_meter))
+        for itype, n in conn.execute(
+                "SELECT IntervalType, COUNT(*) FROM Time "
+                "WHERE WarmupFlag IS NOT 1 GROUP BY IntervalType"):
+            for freq, t in INTERVAL_TYPES.items():
+                if t == itype:
+                    index["times"][freq] = n
+        for row in conn.execute(
+                f"SELECT {', '.join(TABULAR_COLS)}, Value "
+                "FROM TabularDataWithStrings"):
+            v = _to_float(row[-1])
+            if not np.isnan(v):
+                index["tabular"][tuple(c or "" for c in row[:-1])] = v
+    return index
+
+
+def read_series(sql_fpath: str, freq: str, var_rows: dict[tuple, int],
+                values: np.ndarray, times: np.ndarray) -> None:
+    """Fill (vars, times) values and (TIME_COLS, times) of freq from sql.
+
+    One query each for time steps and report data, streamed into numpy
+    w/o a python row per value. var_rows maps (key, name, units,
+    is_meter) to rows of values, vars not in it are skipped.
+    """
+    with connect_sql(sql_fpath) as conn:
+        time_arr = np.array(conn.execute(
+            "SELECT TimeIndex, COALESCE(Month, -1), COALESCE(Day, -1), "
+            "COALESCE(Hour, -1), COALESCE(Minute, -1), "
+            "COALESCE(EnvironmentPeriodIndex, -1) FROM Time "
+            "WHERE IntervalType = ? AND "
+            "WarmupFlag IS NOT 1 ORDER BY TimeIndex",
+            (INTERVAL_TYPES[freq],)).fetchall(), dtype=np.int64)
+        if not len(time_arr):
+            return
+        time_idx = time_arr[:, 0]
+        times[:, :len(time_idx)] = time_arr[:, 1:].T
+
+        # Sql dictionary index -> row in values
+        dict_rows = {}
+        for idx, key, name, units, is_meter in conn.execute(
+                "SELECT ReportDataDictionaryIndex, KeyValue, Name, Units, "
+                "IsMeter FROM ReportDataDictionary "
+                "WHERE ReportingFrequency = ?", (freq,)):
+            row = var_rows.get((key or "", name, units, is_meter))
+            if row is not None:
+                dict_rows[idx] = row
+        if not dict_rows:
+            return
+        lookup = np.full(max(dict_rows) + 1, -1, dtype=np.int64)
+        lookup[list(dict_rows)] = list(dict_rows.values())
+
+        cur = conn.execute(
+            "SELECT r.ReportDataDictionaryIndex, r.TimeIndex, r.Value "
+            "FROM ReportData r JOIN ReportDataDictionary d "
+            "USING (ReportDataDictionaryIndex) "
+            "WHERE d.ReportingFrequency = ?", (freq,))
+        data = np.fromiter(cur, dtype=[("var", np.int64), ("time", np.int64),
+                                       ("value", np.float64)])
+    cols = np.searchsorted(time_idx, data["time"])
+    rows = np.where(data["var"] < len(lookup),
+                    lookup[np.minimum(data["var"], len(lookup) - 1)], -1)
+    ok = (cols < len(time_idx)) & (rows >= 0) & \
+        (time_idx[np.minimum(cols, len(time_idx) - 1)] == data["time"])
+    values[rows[ok], cols[ok]] = data["value"][ok]
+
+
+def _fill_run(store_dpath: str, i: int, sql_fpath: str) -> int:
+    """Write run i of sql into the store's memmaps, return run index."""
+    with open(path.join(store_dpath, MANIFEST_FNAME), "r") as f:
+        manifest = json.load(f)
+    for freq, meta in manifest["freqs"].items():
+        slug = freq_slug(freq)
+        values = np.load(path.join(store_dpath, slug + ".npy"),
+                         mmap_mode="r+")
+        times = np.load(path.join(store_dpath, slug + "_time.npy"),
+                        mmap_mode="r+")
+        var_rows = {tuple(v): j for j, v in enumerate(meta["vars"])}
+        read_series(sql_fpath, freq, var_rows, values[i], times[i])
+        values.flush()
+        times.flush()
+    return i
+
+
+def _map(fn, *iters, workers: int = 1) -> list:
+    """map fn in workers processes, or in this one if workers <= 1."""
+    if workers <= 1:
+        return list(map(fn, *iters))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(fn, *iters))
+
+
+def build_store(sql_fpaths: dict[str, str], store_dpath: str,
+                freqs: list[str] | None = None, workers: int = 1) -> str:
+    """Extract runs {name: eplusout.sql} to a columnar store, return dir.
+
+    The store is a dir of .npy arrays that ResultStore memory-maps:
+        {freq}.npy       (runs, vars, times) float64, nan if missing
+        {freq}_time.npy  (runs, TIME_COLS, times) int32, -1 if missing
+        tabular.npy      (runs, rows) float64
+    and a manifest.json of runs, vars per frequency and tabular rows.
+    Runs are read in parallel by workers processes, each writing its
+    own slice of the arrays. Default freqs are all but HVAC timestep.
+    """
+    names = list(sql_fpaths)
+    os.makedirs(store_dpath, exist_ok=True)
+    indexes = _map(sql_index, list(sql_fpaths.values()), workers=workers)
+
+    # Union of vars, time steps and tabular rows of all runs
+    freqs = freqs or [f for f in INTERVAL_TYPES if f != "HVAC System Timestep"]
+    manifest = {"runs": [], "freqs": {}, "tabular": []}
+    for name in names:
+        st = os.stat(sql_fpaths[name])
+        manifest["runs"].append({"name": name, "sql": sql_fpaths[name],
+                                 "size": st.st_size, "mtime": st.st_mtime})
+    for freq in freqs:
+        var_set = {v: None for index in indexes
+                   for v in index["vars"].get(freq, [])}
+        n_times = max(index["times"].get(freq, 0) for index in indexes)
+        if var_set and n_times:
+            manifest["freqs"][freq] = {"vars": [list(v) for v in var_set],
+                                       "times": n_times}
+    rows = list({k: None for index in indexes for k in index["tabular"]})
+    manifest["tabular"] = [list(k) for k in rows]
+
+    # Allocate arrays, then fill each run's slice
+    for freq, meta in manifest["freqs"].items():
+        shape = (len(names), len(meta["vars"]), meta["times"])
+        values = np.lib.format.open_memmap(
+            path.join(store_dpath, freq_slug(freq) + ".npy"), mode="w+",
+            dtype=np.float64, shape=shape)
+        values[:] = np.nan
+        times = np.lib.format.open_memmap(
+            path.join(store_dpath, freq_slug(freq) + "_time.npy"),
+            mode="w+", dtype=np.int32,
+            shape=(len(names), len(TIME_COLS), meta["times"]))
+        times[:] = -1
+        del values, times
+    tabular = np.full((len(names), len(rows)), np.nan)
+    row_idx = {k: j for j, k in enumerate(rows)}
+    for i, index in enumerate(indexes):
+        for k, v in index["tabular"].items():
+            tabular[i, row_idx[k]] = v
+    np.save(path.join(store_dpath, "tabular.npy"), tabular)
+    with open(path.join(store_dpath, MANIFEST_FNAME), "w") as f:
+        json.dump(manifest, f, indent=4)
+
+    _ = _map(_fill_run, [store_dpath] * len(names), range(len(names)),
+             list(sql_fpaths.values()), workers=workers)
+    return store_dpath
+
+
+def _var_row(var_list: list[list], name: str, key: str | None) -> int:
+    """Index of [key, name, units, is_meter] var, key is case-insensitive.
+
+    Raises KeyError if no var, or several keys match and none given.
+    """
+    rows = [j for j, v in enumerate(var_list) if v[1] == name
+            and (key is None or v[0].lower() == key.lower())]
+    if len(rows) != 1:
+        keys = [var_list[j][0] for j in rows]
+        raise KeyError(f"{len(rows)} '{name}' vars w/ key {key}: {keys}")
+    return rows[0]
+
+
+def _tabular_col(keys: list[list], table: str, row: str, col: str,
+                 report: str | None) -> int:
+    """Index of first tabular key of table, row, col (and report)."""
+    for j, k in enumerate(keys):
+        if (k[2], k[3], k[4]) == (table, row, col) and report in (None, k[0]):
+            return j
+    raise KeyError(f"No tabular value {report}/{table}/{row}/{col}")
+
+
+class ResultStore:
+    """Memory-mapped columnar results of many runs, see build_store.
+
+        store = ResultStore(store_dpath)
+        elec = store.series("Electricity:Facility", freq="Hourly")
+        eui = store.tabular("Site and Source Energy", "Total Site Energy",
+                            "Energy Per Total Building Area")
+    Arrays are (runs, ...) in store.runs order.
+    """
+
+    def __init__(self, dpath: str):
+        self.dpath = dpath
+        with open(path.join(dpath, MANIFEST_FNAME), "r") as f:
+            self.manifest = json.load(f)
+        self.runs = [r["name"] for r in self.manifest["runs"]]
+        self._arrs = {}
+
+    def _load(self, fname: str) -> np.ndarray:
+        if fname not in self._arrs:
+            self._arrs[fname] = np.load(path.join(self.dpath, fname),
+                                        mmap_mode="r")
+        return self._arrs[fname]
+
+    def values(self, freq: str = "Hourly") -> np.ndarray:
+        """(runs, vars, times) values of freq."""
+        return self._load(freq_slug(freq) + ".npy")
+
+    def times(self, freq: str = "Hourly") -> dict[str, np.ndarray]:
+        """TIME_COLS (runs, times) arrays of freq."""
+        arr = self._load(freq_slug(freq) + "_time.npy")
+        return {c: arr[:, j] for j, c in enumerate(TIME_COLS)}
+
+    def vars(self, freq: str = "Hourly") -> list[list]:
+        """[key, name, units, is_meter] of each row of values(freq)."""
+        return self.manifest["freqs"][freq]["vars"]
+
+    def series(self, name: str, key: str | None = None,
+               freq: str = "Hourly") -> np.ndarray:
+        """(runs, times) of variable or meter name, w/ key if given."""
+        return self.values(freq)[:, _var_row(self.vars(freq), name, key)]
+
+    def tabular(self, table: str, row: str, col: str,
+                report: str | None = None) -> np.ndarray:
+        """(runs,) tabular value, first match of report if not given."""
+        j = _tabular_col(self.manifest["tabular"], table, row, col, report)
+        return self._load("tabular.npy")[:, j]
+
+
+def bench_extract(sql_fpath: str, freq: str = "Hourly") -> dict[str, float]:
+    """Secs to get all freq series of sql row by row vs set-based."""
+    t0 = time.perf_counter()
+    with connect_sql(sql_fpath) as conn:
+        series = {}
+        for idx, in conn.execute(
+                "SELECT ReportDataDictionaryIndex FROM ReportDataDictionary "
+                "WHERE ReportingFrequency = ?", (freq,)).fetchall():
+            series[idx] = [v for v, in conn.execute(
+                "SELECT Value FROM ReportData WHERE "
+                "ReportDataDictionaryIndex = ? ORDER BY TimeIndex", (idx,))]
+    t1 = time.perf_counter()
+    index = sql_index(sql_fpath)
+    var_rows = {v: j for j, v in enumerate(index["vars"].get(freq, []))}
+    n_times = index["times"].get(freq, 0)
+    values = np.full((len(var_rows), n_times), np.nan)
+    read_series(sql_fpath, freq, var_rows, values,
+                np.full((len(TIME_COLS), n_times), -1))
+    return {"rows": t1 - t0, "columnar": time.perf_counter() - t1}
+
+
+def compact_run(sql_fpath: str, names: list[str] | None = None,
+                freqs: tuple[str, ...] = COMPACT_FREQS,
+                retention: str = "keep", cache_dpath: str | None = None
+                ) -> dict:
+    """Compact run's eplusout.sql to results.npz, return its manifest.
+
+    Series of freqs (only vars in names, if given) and numeric tabular
+    values are saved compressed, w/ a results.json manifest next to the
+    sql. Then the raw outputs follow retention:
+        keep     leave the sql and idf
+        archive  gzip sql, idf to {fname}.gz
+        drop     delete sql, idf
+    RAW_FNAMES (eso, mtr, htm, ...) are deleted unless kept. W/
+    cache_dpath, the run's sim cache entry (swap.py run_sim), the npz,
+    manifest are added to the entry and retention applies there too.
+    """
+    if retention not in RETENTIONS:
+        raise ValueError(f"retention must be one of {RETENTIONS}")
+    run_dpath = path.dirname(path.abspath(sql_fpath))
+    index = sql_index(sql_fpath)
+    st = os.stat(sql_fpath)
+    manifest = {"sql": path.basename(sql_fpath), "sql_size": st.st_size,
+                "sql_mtime": st.st_mtime, "freqs": {},
+                "tabular": [list(k) for k in index["tabular"]],
+                "retention": retention, "raw": {}}
+    names = {n.lower() for n in names} if names else None
+    arrays = {"tabular": np.array(list(index["tabular"].values()),
+                                  dtype=np.float64)}
+    for freq in freqs:
+        var_list = [v for v in index["vars"].get(freq, [])
+                    if names is None or v[1].lower() in names]
+        n_times = index["times"].get(freq, 0)
+        if not (var_list and n_times):
+            continue
+        values = np.full((len(var_list), n_times), np.nan)
+        times = np.full((len(TIME_COLS), n_times), -1, dtype=np.int32)
+        read_series(sql_fpath, freq, {v: j for j, v in enumerate(var_list)},
+                    values, times)
+        arrays[freq_slug(freq)], arrays[freq_slug(freq) + "_time"] = \
+            values, times
+        manifest["freqs"][freq] = {"vars": [list(v) for v in var_list],
+                                   "times": n_times}
+
+    # Tmp then rename, so a crash never leaves half a compaction
+    npz_fpath = path.join(run_dpath, COMPACT_FNAME)
+    tmp_fpath = f"{npz_fpath}.{os.getpid()}.tmp.npz"
+    np.savez_compressed(tmp_fpath, **arrays)
+    os.replace(tmp_fpath, npz_fpath)
+    manifest["bytes"] = os.stat(npz_fpath).st_size
+    with open(path.join(run_dpath, COMPACT_MANIFEST), "w") as f:
+        json.dump(manifest, f, indent=4)
+
+    manifest["raw"] = apply_retention(run_dpath, retention,
+                                      path.basename(sql_fpath))
+    if cache_dpath and path.isdir(cache_dpath):
+        manifest["cache"] = apply_retention(cache_dpath, retention,
+                                            path.basename(sql_fpath))
+    with open(path.join(run_dpath, COMPACT_MANIFEST), "w") as f:
+        json.dump(manifest, f, indent=4)
+    if cache_dpath and path.isdir(cache_dpath):
+        for fname in (COMPACT_FNAME, COMPACT_MANIFEST):
+            tmp_fpath = path.join(cache_dpath, f"{fname}.{os.getpid()}.tmp")
+            shutil.copyfile(path.join(run_dpath, fname), tmp_fpath)
+            os.replace(tmp_fpath, path.join(cache_dpath, fname))
+    return manifest
+
+
+def apply_retention(run_dpath: str, retention: str,
+                    sql_fname: str = "eplusout.sql") -> dict[str, str]:
+    """Keep, gzip or delete raw outputs of run, return {fname: action}."""
+    actions = {}
+    if retention == "keep":
+        return actions
+    for fname in RAW_FNAMES:
+        fpath = path.join(run_dpath, fname)
+        if path.exists(fpath):
+            os.remove(fpath)
+            actions[fname] = "dropped"
+    for fname in (sql_fname, "in.idf"):
+        fpath = path.join(run_dpath, fname)
+        if not path.exists(fpath):
+            continue
+        if retention == "archive":
+            with open(fpath, "rb") as src, \
+                    gzip.open(fpath + ".gz.tmp", "wb") as dst:
+                shutil.copyfileobj(src, dst, 1 << 20)
+            os.replace(fpath + ".gz.tmp", fpath + ".gz")
+        os.remove(fpath)
+        actions[fname] = "archived" if retention == "archive" else "dropped"
+    return actions
+
+
+class CompactRun:
+    """Results of one run compacted by compact_run.
+
+        run = CompactRun(run_dpath)
+        elec = run.series("Electricity:Facility")  # (times,) array
+    Arrays are decompressed when first used.
+    """
+
+    def __init__(self, run_dpath: str):
+        self.dpath = run_dpath
+        with open(path.join(run_dpath, COMPACT_MANIFEST), "r") as f:
+            self.manifest = json.load(f)
+        self._npz = np.load(path.join(run_dpath, COMPACT_FNAME))
+        self._arrs = {}
+
+    def _load(self, name: str) -> np.ndarray:
+        if name not in self._arrs:
+            self._arrs[name] = self._npz[name]
+        return self._arrs[name]
+
+    def values(self, freq: str = "Hourly") -> np.ndarray:
+        """(vars, times) values of freq."""
+        return self._load(freq_slug(freq))
+
+    def times(self, freq: str = "Hourly") -> dict[str, np.ndarray]:
+        """TIME_COLS (times,) arrays of freq."""
+        arr = self._load(freq_slug(freq) + "_time")
+        return {c: arr[j] for j, c in enumerate(TIME_COLS)}
+
+    def vars(self, freq: str = "Hourly") -> list[list]:
+        """[key, name, units, is_meter] of each row of values(freq)."""
+        return self.manifest["freqs"][freq]["vars"]
+
+    def series(self, name: str, key: str | None = None,
+               freq: str = "Hourly") -> np.ndarray:
+        """(times,) of variable or meter name, w/ key if given."""
+        return self.values(freq)[_var_row(self.vars(freq), name, key)]
+
+    def tabular(self, table: str, row: str, col: str,
+                report: str | None = None) -> float:
+        """Tabular value, first match of report if not given."""
+        j = _tabular_col(self.manifest["tabular"], table, row, col, report)
+        return float(self._load("tabular")[j])
+
+
+def bench_load(sql_fpath: str, name: str, key: str | None = None,
+               freq: str = "Hourly", n: int = 5) -> dict[str, float]:
+    """Best of n secs to read one series from sql vs compacted run."""
+    def _best(fn):
+        secs = []
+        for _ in range(n):
+            t0 = time.perf_counter()
+            fn()
+            secs.append(time.perf_counter() - t0)
+        return min(secs)
+
+    def _from_sql():
+        with connect_sql(sql_fpath) as conn:
+            return np.array([v for v, in conn.execute(
+                "SELECT r.Value FROM ReportData r JOIN ReportDataDictionary d "
+                "USING (ReportDataDictionaryIndex) JOIN Time t "
+                "USING (TimeIndex) WHERE d.Name = ? AND "
+                "d.ReportingFrequency = ? AND COALESCE(d.KeyValue, '') = ? "
+                "COLLATE NOCASE AND t.WarmupFlag IS NOT 1 "
+                "ORDER BY r.TimeIndex", (name, freq, key or ""))])
+
+    run_dpath = path.dirname(path.abspath(sql_fpath))
+    return {"sql": _best(_from_sql),
+            "compact": _best(lambda: CompactRun(run_dpath).series(
+                name, key, freq))}
@@ -0,0 +1,222 @@
+from __future__ import annotations  # so we can use list, dict for typing
+import os
+import json
+import numpy as np
+from swap import epw as epw_
+from swap.results import connect_sql
+from lbt.swap import iter_idf_objects
+path = os.path
+
+SCREEN_DNAME = "screen"
+SCREEN_FNAME = "screen.json"  # read by 'swap.py sim' next to the osw
+PERIOD_DAYS = {"week": 7, "day": 1}
+# EnergyPlus warmup days of each environment (RunPeriod, design day),
+# its default minimum. Runs that converge slower warm up longer.
+WARMUP_DAYS = 6
+# Annual end use columns of the RunPeriod meters swap.py adds
+METER_FUELS = {"Electricity:Facility": "Electricity",
+               "NaturalGas:Facility": "Natural Gas"}
+
+
+def daily_stats(data: dict[str, np.ndarray]) -> np.ndarray:
+    """(days, 5) mean, max, min db, ghi sum (kWh/m2), mean dp per day."""
+    days = len(data["dry_bulb"]) // 24
+    db, dp, ghi = (data[c][:days * 24].reshape(days, 24) for c in
+                   ("dry_bulb", "dew_point", "glo_hor_rad"))
+    return np.stack([db.mean(1), db.max(1), db.min(1), ghi.sum(1) / 1000,
+                     dp.mean(1)], axis=1)
+
+
+def period_features(data: dict[str, np.ndarray], kind: str = "week"
+                    ) -> np.ndarray:
+    """(periods, features) daily stats of each week or day, standardized.
+
+    The year is cut to whole periods, so weeks drop Dec 31.
+    """
+    stats = daily_stats(data)
+    stats = (stats - stats.mean(0)) / np.maximum(stats.std(0), 1e-9)
+    n = len(stats) // PERIOD_DAYS[kind]
+    return stats[:n * PERIOD_DAYS[kind]].reshape(n, -1)
+
+
+def kmeans(x: np.ndarray, k: int, iters: int = 100
+           ) -> tuple[np.ndarray, np.ndarray]:
+    """Labels, centers of k clusters of the rows of x (Lloyd's).
+
+    Seeded by farthest points from the row nearest the mean, so results
+    are deterministic and the extreme periods get their own clusters.
+    """
+    d = ((x - x.mean(0)) ** 2).sum(1)
+    centers = [x[d.argmin()]]
+    d = ((x - centers[0]) ** 2).sum(1)
+    for _ in range(1, k):
+        centers.append(x[d.argmax()])
+        d = np.minimum(d, ((x - centers[-1]) ** 2).sum(1))
+    centers = np.array(centers)
+    for _ in range(iters):
+        labels = ((x[:, None] - centers[None]) ** 2).sum(2).argmin(1)
+        new = np.array([x[labels == j].mean(0) if (labels == j).any()
+                        else centers[j] for j in range(k)])
+        if np.allclose(new, centers):
+            break
+        centers = new
+    return labels, centers
+
+
+def select_periods(epw: epw_.Epw, n: int = 5, kind: str = "week"
+                   ) -> list[dict]:
+    """Representative weeks or days of epw, w/ weights to scale to annual.
+
+    Periods are clustered on daily weather stats, and each cluster is
+    stood for by its medoid. weight is the number of periods (days
+    for kind 'day') in the cluster, scaled so weights x period days sum
+    to 365, so annual ~= sum(weight * period total).
+    """
+    x = period_features(epw, kind)
+    labels, centers = kmeans(x, min(n, len(x)))
+    days, scale = PERIOD_DAYS[kind], 365 / (len(x) * PERIOD_DAYS[kind])
+    periods = []
+    for j in range(len(centers)):
+        members = np.flatnonzero(labels == j)
+        if not len(members):
+            continue
+        medoid = members[((x[members] - centers[j]) ** 2).sum(1).argmin()]
+        h0, h1 = medoid * days * 24, (medoid + 1) * days * 24 - 1
+        periods.append({
+            "name": f"Screen {kind.title()} {medoid + 1}",
+            "begin_month": int(epw["month"][h0]),
+            "begin_day": int(epw["day"][h0]),
+            "end_month": int(epw["month"][h1]),
+            "end_day": int(epw["day"][h1]), "days": days,
+            "index": int(medoid), "weight": float(len(members) * scale)})
+    return sorted(periods, key=lambda p: p["index"])
+
+
+def weather_error(epw: epw_.Epw, periods: list[dict], kind: str = "week"
+                  ) -> dict[str, float]:
+    """Pct error of HDD18, CDD10, GHI rebuilt from weighted periods."""
+    stats, days = daily_stats(epw), PERIOD_DAYS[kind]
+    daily = {"hdd18": np.maximum(18 - stats[:, 0], 0),
+             "cdd10": np.maximum(stats[:, 0] - 10, 0), "ghi": stats[:, 3]}
+    errs = {}
+    for k, v in daily.items():
+        est = sum(p["weight"] * v[p["index"] * days:(p["index"] + 1) * days]
+                  .sum() for p in periods)
+        errs[k] = round(float(100 * (est - v.sum()) / v.sum()), 2)
+    return errs
+
+
+def sim_days(period_days: list[int], design_days: int = 0) -> int:
+    """Days EnergyPlus simulates for periods, incl. warmup and sizing.
+
+    Each RunPeriod is its own environment w/ its own warmup, as is
+    each sizing design day.
+    """
+    return sum(d + WARMUP_DAYS for d in period_days) + \
+        design_days * (1 + WARMUP_DAYS)
+
+
+def write_screen(osw_fpath: str, epw_fpath: str, n: int = 5,
+                 kind: str = "week") -> str:
+    """Write screening workflow of osw to {osw dir}/screen, return osw.
+
+    The osw is copied w/ seed, weather and measure paths made absolute,
+    next to a screen.json of the representative periods. 'swap.py sim'
+    of that osw runs only those periods. speedup_days is the estimate
+    of annual / screening sim days, w/ warmup and sizing of both.
+    """
+    osw_dpath = path.dirname(path.abspath(osw_fpath))
+    screen_dpath = path.join(osw_dpath, SCREEN_DNAME)
+    os.makedirs(screen_dpath, exist_ok=True)
+    with open(osw_fpath, "r") as f:
+        osw_dict = json.load(f)
+    for k in ("seed_file", "weather_file"):
+        osw_dict[k] = path.join(osw_dpath, osw_dict[k])
+    osw_dict["measure_paths"] = [path.join(osw_dpath, p) for p in
+                                 osw_dict.get("measure_paths", [])]
+
+    epw = epw_.load_epw(epw_fpath)
+    periods = select_periods(epw, n, kind)
+    days = sum(p["days"] for p in periods)
+    seed_fpath = osw_dict["seed_file"]
+    design_days = sum(obj_type == "OS:SizingPeriod:DesignDay"
+                      for obj_type, _ in iter_idf_objects(seed_fpath)) \
+        if path.exists(seed_fpath) else 0
+    screen_days = sim_days([p["days"] for p in periods], design_days)
+    screen = {"epw": epw_fpath, "kind": kind, "periods": periods,
+              "days": days, "design_days": design_days,
+              "sim_days": screen_days,
+              "speedup_days": round(sim_days([365], design_days) /
+                                    screen_days, 1),
+              "weather_error_pct": weather_error(epw, periods, kind)}
+    with open(path.join(screen_dpath, SCREEN_FNAME), "w") as f:
+        json.dump(screen, f, indent=4)
+    screen_osw_fpath = path.join(screen_dpath, path.basename(osw_fpath))
+    with open(screen_osw_fpath, "w") as f:
+        json.dump(osw_dict, f, indent=4)
+    return screen_osw_fpath
+
+
+def period_meters(sql_fpath: str) -> dict[str, dict[str, float]]:
+    """{environment name: {meter: J}} of RunPeriod meters in eplusout.sql."""
+    with connect_sql(sql_fpath) as conn:
+        rows = conn.execute(
+            "SELECT e.EnvironmentName, d.Name, SUM(r.Value) FROM ReportData r "
+            "JOIN ReportDataDictionary d USING (ReportDataDictionaryIndex) "
+            "JOIN Time t USING (TimeIndex) "
+            "JOIN EnvironmentPeriods e USING (EnvironmentPeriodIndex) "
+            "WHERE d.IsMeter = 1 AND d.ReportingFrequency = 'Run Period' "
+            "GROUP BY e.EnvironmentName, d.Name").fetchall()
+    meters = {}
+    for env, name, value in rows:
+        meters.setdefault(env.upper(), {})[name] = value
+    return meters
+
+
+def annual_end_uses(sql_fpath: str) -> dict[str, float]:
+    """{fuel: GJ} total end uses of annual run's tabular report."""
+    with connect_sql(sql_fpath) as conn:
+        rows = conn.execute(
+            "SELECT ColumnName, Value FROM TabularDataWithStrings WHERE "
+            "ReportName = 'AnnualBuildingUtilityPerformanceSummary' AND "
+            "TableName = 'End Uses' AND RowName = 'Total End Uses' AND "
+            "Units = 'GJ'").fetchall()
+    return {col: float(v) for col, v in rows if col in METER_FUELS.values()}
+
+
+def scale_annual(sql_fpath: str, periods: list[dict]) -> dict[str, float]:
+    """{fuel: GJ} annual estimate from weighted screening period meters."""
+    meters = period_meters(sql_fpath)
+    annual = {fuel: 0.0 for fuel in METER_FUELS.values()}
+    for p in periods:
+        env = meters.get(p["name"].upper())
+        if env is None:
+            raise KeyError(f"No RunPeriod meters of '{p['name']}' in "
+                           f"{sql_fpath}, found {list(meters)}")
+        for meter, fuel in METER_FUELS.items():
+            annual[fuel] += p["weight"] * env.get(meter, 0.0) / 1e9
+    return annual
+
+
+def screen_report(sql_fpath: str, screen_fpath: str,
+                  ref_sql_fpath: str | None = None) -> dict:
+    """Annual estimate of screening run, and error vs a full annual run.
+
+    error_pct is per fuel and of the total, if ref_sql_fpath is given.
+    """
+    with open(screen_fpath, "r") as f:
+        screen = json.load(f)
+    annual = scale_annual(sql_fpath, screen["periods"])
+    report = {"periods": len(screen["periods"]), "days": screen["days"],
+              "sim_days": screen["sim_days"],
+              "speedup_days": screen["speedup_days"],
+              "weather_error_pct": screen["weather_error_pct"],
+              "annual_gj": annual}
+    if ref_sql_fpath:
+        ref = annual_end_uses(ref_sql_fpath)
+        ref["Total"], annual["Total"] = sum(ref.values()), sum(annual.values())
+        report["ref_gj"] = ref
+        report["error_pct"] = {
+            fuel: round(100 * (annual[fuel] - v) / v, 2)
+            for fuel, v in ref.items() if v}
+    return report
@@ -2,6 +2,11 @@ from __future__ import print_function
 import sys
 import os
 import json
+import time
+import signal
+import socket
+import threading
+from collections import deque, namedtuple
 from pprint import pprint
 from subprocess import Popen, PIPE, STDOUT
 from honeybee.config import folders as hb_config
@@ -15,83 +20,222 @@ path = os.path
 SWAP_URL = "https://raw.githubusercontent.com/saeranv/thermal/main/lbt/swap.py"
 SWAP_NAME = "swap.py"
 IS_TTY = sys.stdin.isatty() or len(sys.argv) > 1
+SWAP_PORT = int(os.environ.get("THERMAL_SWAP_PORT", 52781))
+SIM_TIMEOUT = None  # secs, or set w/ timeout_ input
+SIM_MEM_LIMIT = None  # bytes, or set w/ mem_limit_ input
+LOG_TAIL = 200  # lines of sim/swap output kept in memory
+READER_JOIN = 5.0  # secs to wait for output after the process exits
 
 
-def run_subproc(cmds):
-    """Run subprocess for list of commands (cmds)."""
+ProcResult = namedtuple(
+    "ProcResult", ["stdout", "stderr", "returncode", "seconds",
+                   "timed_out", "mem_killed", "log_fpath"])
 
-    print("Running command:\n{}\n".format(" ".join(cmds)))
-    p = Popen(cmds, shell=False, stdout=PIPE, stderr=PIPE)
-    _stdout, _stderr = p.communicate()
-    #_stdout, _stderr = p.stdout, p.stderr
-    
-    assert p.returncode == 0, \
-        "returncode: {}\nstdout:\n{}\nstderr:\n{}".format(
-            p.returncode, _stdout, _stderr)
-    return _stdout, _stderr
-
-
-def update_swap(_swap_fpath):
-    """Update swap.py from github and confirm in lbt scripts path."""
 
-    _ = download_file(SWAP_URL, _swap_fpath)
-    print("## Downloaded {} from {}.".format(SWAP_NAME, SWAP_URL))
+def _proc_rss(pid):
+    """Resident memory (bytes) of process pid, None if unknown.
 
-    assert path.exists(_swap_fpath), \
-        "Path {} not exist.\n".format(_swap_fpath)
+    Uses psutil if installed, else /proc on linux, else .NET under
+    IronPython.
+    """
+    try:
+        import psutil
+        return psutil.Process(pid).memory_info().rss
+    except ImportError:
+        pass
+    status_fpath = "/proc/{}/status".format(pid)
+    if path.exists(status_fpath):
+        with open(status_fpath, "r") as fp:
+            for line in fp:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+        return None
+    try:
+        from System.Diagnostics import Process
+        return Process.GetProcessById(pid).WorkingSet64
+    except Exception:
+        return None
 
 
-def update_pip(_lbt_pytexe, _ops_version):
-    """Update openstudio SDK via pip."""
-
-    # Check if pip opesntudio is updated
-    cmds = [_lbt_pytexe, "-m", "pip", "list"]
-    _stdout = run_subproc(cmds)[0]
-    pkgs = _stdout.decode("utf-8").strip().split("\n")
-    is_pip_match = False
-    for pkg in pkgs:
-        if "openstudio" in pkg:
-            _ops_version_ = pkg.split("openstudio")[1].strip()
-            print("## Found openstudio {} in pip.".format(_ops_version_))
-            is_pip_match = _ops_version_ == _ops_version
-            break
-
-    if not is_pip_match:
-        # Pip install openstudio if not in pip or version wrong
-        _ops_pkg = "openstudio=={}".format(_ops_version)
-        cmds = [_lbt_pytexe, "-m", "pip", "install", _ops_pkg]
-
-        _stdout, _stderr = run_subproc(cmds)from __future__ import print_function
-import sys
-import os
-import json
-from pprint import pprint
-from subprocess import Popen, PIPE, STDOUT
-from honeybee.config import folders as hb_config
-from honeybee_energy.config import folders as hbe_config
-from honeybee_energy.measure import Measure
-from ladybug_rhino.download import download_file
+def _proc_tree(pid):
+    """Pids of process pid and its descendants, pid only if unknown.
 
+    Uses psutil if installed, else /proc on linux. Walks by parent pid,
+    since energyplus runs in its own session (see swap.py run_watched).
+    """
+    try:
+        import psutil
+        try:
+            proc = psutil.Process(pid)
+            return [pid] + [c.pid for c in proc.children(recursive=True)]
+        except psutil.Error:
+            return [pid]
+    except ImportError:
+        pass
+    if not path.isdir("/proc"):
+        return [pid]
+    children = {}
+    for name in os.listdir("/proc"):
+        if not name.isdigit():
+            continue
+        try:
+            with open("/proc/{}/stat".format(name), "r") as fp:
+                # comm may have spaces, ppid is after its closing paren
+                ppid = int(fp.read().rsplit(")", 1)[1].split()[1])
+        except (IOError, OSError, IndexError, ValueError):
+            continue
+        children.setdefault(ppid, []).append(int(name))
+    pids, i = [pid], 0
+    while i < len(pids):
+        pids.extend(children.get(pids[i], []))
+        i += 1
+    return pids
+
+
+def _tree_rss(pid):
+    """Summed resident memory (bytes) of process pid and descendants."""
+    return sum(_proc_rss(p) or 0 for p in _proc_tree(pid))
+
+
+def _kill_tree(p):
+    """Kill Popen p, its process group and descendants."""
+    if os.name == "nt":
+        # /T kills the tree by parent pid
+        Popen(["taskkill", "/F", "/T", "/PID", str(p.pid)],
+              stdout=PIPE, stderr=PIPE).communicate()
+    else:
+        # Snapshot before killing, orphans lose their parent pid
+        pids = _proc_tree(p.pid)
+        try:
+            os.killpg(p.pid, signal.SIGKILL)
+        except OSError:
+            pass
+        for pid in pids[1:]:
+            try:
+                os.kill(pid, signal.SIGKILL)
+            except OSError:
+                pass
+    try:
+        p.kill()
+    except OSError:
+        pass
+    p.wait()
 
-# Global
-path = os.path
-SWAP_URL = "https://raw.githubusercontent.com/saeranv/thermal/main/lbt/swap.py"
-SWAP_NAME = "swap.py"
-IS_TTY = sys.stdin.isatty() or len(sys.argv) > 1
 
+def _pipe_lines(pipe, tail, log, callback):
+    """Read pipe by line into tail deque, log file and callback.
 
-def run_subproc(cmds):
-    """Run subprocess for list of commands (cmds)."""
+    log is a dict of the shared log fp, lock and count of open readers.
+    The last reader to finish closes the log, so it's never written
+    after it's closed.
+    """
+    try:
+        for line in iter(pipe.readline, b""):
+            tail.append(line)
+            if log["fp"]:
+                with log["lock"]:
+                    log["fp"].write(line)
+            if callback:
+                callback(line.decode("utf-8", "replace").rstrip())
+    finally:
+        pipe.close()
+        with log["lock"]:
+            log["readers"] -= 1
+            if log["fp"] and not log["readers"]:
+                log["fp"].close()
+
+
+def run_subproc(cmds, log_fpath=None, callback=None, timeout=None,
+                mem_limit=None, tail=None, check=True):
+    """Run subprocess for list of commands (cmds), streaming output.
+
+    Output lines go to log_fpath and callback(line) as they arrive, and
+    only the last tail lines (all if None) are kept in memory. Process
+    and its descendants (openstudio, energyplus) are killed after timeout
+    seconds, or if their summed memory passes mem_limit bytes.
+    Returns ProcResult, asserts returncode is 0 if check. The log is
+    closed once both pipes do, which orphaned grandchildren holding them
+    open can delay past the return.
+    """
 
     print("Running command:\n{}\n".format(" ".join(cmds)))
-    p = Popen(cmds, shell=False, stdout=PIPE, stderr=PIPE)
-    _stdout, _stderr = p.communicate()
-    #_stdout, _stderr = p.stdout, p.stderr
-    
-    assert p.returncode == 0, \
-        "returncode: {}\nstdout:\n{}\nstderr:\n{}".format(
-            p.returncode, _stdout, _stderr)
-    return _stdout, _stderr
+    t0 = time.time()
+    # Own process group, so the whole sim can be killed
+    if os.name == "nt":
+        group = {"creationflags": 0x00000200}  # CREATE_NEW_PROCESS_GROUP
+    else:
+        group = {"preexec_fn": os.setsid}
+    p = Popen(cmds, shell=False, stdout=PIPE, stderr=PIPE, **group)
+    log = {"fp": open(log_fpath, "wb") if log_fpath else None,
+           "lock": threading.Lock(), "readers": 2}
+    tails = [deque(maxlen=tail), deque(maxlen=tail)]
+    readers = [threading.Thread(target=_pipe_lines,
+                                args=(pipe, t, log, callback))
+               for pipe, t in zip((p.stdout, p.stderr), tails)]
+    for r in readers:
+        r.daemon = True
+        r.start()
+
+    timed_out, mem_killed = False, False
+    while p.poll() is None:
+        time.sleep(0.1)
+        if timeout and (time.time() - t0) > timeout:
+            timed_out = True
+        elif mem_limit and _tree_rss(p.pid) > mem_limit:
+            mem_killed = True
+        if timed_out or mem_killed:
+            _kill_tree(p)
+            break
+    # Orphaned grandchildren may hold the pipes open, don't block
+    for r in readers:
+        r.join(READER_JOIN)
+
+    result = ProcResult(
+        b"".join(tails[0]), b"".join(tails[1]), p.returncode,
+        time.time() - t0, timed_out, mem_killed, log_fpath)
+    if check:
+        assert p.returncode == 0 and not (timed_out or mem_killed), \
+            "returncode: {}\ntimed_out: {}\nmem_killed: {}\nlog: {}\n" \
+            "stdout (tail):\n{}\nstderr (tail):\n{}".format(
+                p.returncode, timed_out, mem_killed, log_fpath,
+                result.stdout, result.stderr)
+    return result
+
+
+def request_worker(req, port=SWAP_PORT, timeout=600.0):
+    """Send JSON request to local swap worker (swap.py serve).
+
+    Returns response dict, or None if no worker is listening so caller
+    can fall back to a subprocess.
+    """
+    try:
+        sock = socket.create_connection(("127.0.0.1", port), timeout=0.5)
+    except socket.error:
+        return None
+
+    try:
+        sock.settimeout(timeout)
+        sock.sendall((json.dumps(req) + "\n").encode("utf-8"))
+        buf = b""
+        while not buf.endswith(b"\n"):
+            chunk = sock.recv(65536)
+            if not chunk:
+                break
+            buf += chunk
+    finally:
+        sock.close()
+
+    resp = json.loads(buf.decode("utf-8"))
+    assert resp["ok"], "Swap worker error:\n{}".format(resp.get("error"))
+    return resp
+
+
+def load_result(result_fpath):
+    """Load json result written by swap.py --result."""
+    with open(result_fpath, "r") as fp:
+        result = json.load(fp)
+    assert result["ok"], "swap.py error:\n{}".format(result.get("error"))
+    return result
 
 
 def update_swap(_swap_fpath):
@@ -124,128 +268,48 @@ def update_pip(_lbt_pytexe, _ops_version):
         _ops_pkg = "openstudio=={}".format(_ops_version)
         cmds = [_lbt_pytexe, "-m", "pip", "install", _ops_pkg]
 
-        _stdout, _stderr = run_subproc(cmds)
+        _stdout, _stderr = run_subproc(cmds)[:2]
         if _stdout: print(_stdout.decode("utf-8").strip())
         if _stderr: print(_stderr.decode("utf-8").strip())
 
 
-def dump_mea(measure, osw_fpath):
-    """Dump measure to osw file."""
-
-    osw_dict = measure.to_osw_dict()
-    osw_dict["measure_paths"] = [measure.folder]
-    with open(osw_fpath, "w") as fp:
-        json.dump(osw_dict, fp, indent=4)
-    return osw_fpath
-
-if IS_TTY:
-    # Label bool, fpath inputs
-    run_swap_, run_sim_, update_ = True, True, False
-    _osm, _ref_osm, _epw, _mea_dpath = sys.argv[-3:]
-    _mea = Measure(_mea_dpath)
-
-if run_swap_ or run_sim_ or update_:
-
-    # # Overwrite
-    # update_ = False
-    # run_swap_ = False
-    # run_sim_ = False
-
-    lbt_pytexe = hb_config.python_exe_path
-    lbt_opsexe = hbe_config.openstudio_exe
-    opsv_ = hbe_config.openstudio_version
-    ops_version = "{}.{}.{}".format(opsv_[0], opsv_[1], opsv_[2])
-    swap_fpath = path.join(hb_config.python_scripts_path, SWAP_NAME)
-    # # TODO: only for debugging
-    # swap_fpath = path.abspath(path.join(_epw, "../../../swap", "swap2.py"))
-    
-    # Update/confirm swap_fpath exists
-    if update_ or (not path.exists(swap_fpath)):
-        _ = update_swap(swap_fpath)
-        _ = update_pip(lbt_pytexe, ops_version)
-        update_cmds = [lbt_pytexe, swap_fpath, "--help"]
-        stdout = run_subproc(update_cmds)[0]
-        print(stdout.decode("utf-8").strip())
-
-    assert isinstance(_osm, str) and path.exists(_osm), \
-        "Error, OSM file does not exist."
-    assert isinstance(_epw, str) and path.exists(_epw), \
-        "Error, EPW file does not exist."
-    assert _mea is not None, \
-        "Error, Measure obj does not exist."
+def import_swap(_swap_fpath):
+    """Import swap.py in-process if this interpreter has openstudio.
 
+    Returns None under IronPython (or w/o openstudio), in which case
+    the swap runs on the worker or in a lbt python subprocess.
+    """
     try:
-        _osw_swap, _osm_swap = None, None
-        runsim_dpath = path.dirname(_osm) # sim dpath is child
-        _osw = path.join(runsim_dpath, "workflow.osw")
-
-
-        if run_swap_:
-            # Run swap
-            print("\n## Running swap.py on lbtpyt.exe")
-            # Update measure, and run swap_win.py
-            _osw = dump_mea(_mea[0], _osw)
-            swap_cmds = [lbt_pytexe, swap_fpath, _osw, _osm, _ref_osm, _epw]
-            stdout, stderr = run_subproc(swap_cmds)
-            
-            if stdout: 
-                print(stdout.decode('utf-8'))
-                _osm_swap, _osw_swap = \
-                    stdout.decode('utf-8').strip().split("\n")[-2:]
-            if stderr: print(stderr.decode('utf-8'))
-
-        if run_sim_:
-            # Run workflow.osw
-            print("\n## Running workflow.osw on openstudio.exe")
+        import openstudio
+        import importlib.util as imp_util
+    except ImportError:
+        return None
+    spec = imp_util.spec_from_file_location("swap", _swap_fpath)
+    swap = imp_util.module_from_spec(spec)
+    spec.loader.exec_module(swap)
+    return swap
 
-            if not _osw_swap:
-                _osw_swap = path.join(runsim_dpath, "workflow_swap.osw")
-
-            assert path.exists(_osw_swap), \
-                "OSW not found at {}".format(_osw_swap)
-
-            sim_cmds = [lbt_opsexe, "run", "-w", _osw_swap]
-            stdout, stderr = run_subproc(sim_cmds)
-            if stdout: print(stdout)
-            if stderr: print(stderr)
-
-            # Get outputs
-            # print(runsim_dpath, ":\n", os.listdir(runsim_dpath))
 
-            ransim_dpath = path.join(runsim_dpath, "run")
-            _sql = path.join(ransim_dpath, "eplusout.sql")
-            if path.exists(_sql):
-                osm = path.join(ransim_dpath, "in.osm")
-                _osm_swap = _osm_swap
-                idf = path.join(ransim_dpath, "in.idf")
-                zsz = path.join(ransim_dpath, "epluszsz.csv")
-                rdd = path.join(ransim_dpath, "eplus.rdd")
-                html = path.join(ransim_dpath, "eplustbl.htm")
-                err = path.join(ransim_dpath, "eplusout.err")
-                sql = _sql
-                print(osm, idf, zsz, rdd, html, err, sql, sep="\n")
-    except:
-        # clear globals in case error in OSM object.
-        for name in dir():
-            if name.startswith("_"):
-                continue
-            del globals()[name]
-        # raise w/o arg means gets last exception and reraise it
-        raise
+def mea_osw_dict(measure):
+    """Seed osw dict for measure."""
 
-        if _stdout: print(_stdout.decode("utf-8").strip())
-        if _stderr: print(_stderr.decode("utf-8").strip())
+    osw_dict = measure.to_osw_dict()
+    osw_dict["measure_paths"] = [measure.folder]
+    return osw_dict
 
 
 def dump_mea(measure, osw_fpath):
     """Dump measure to osw file."""
 
-    osw_dict = measure.to_osw_dict()
-    osw_dict["measure_paths"] = [measure.folder]
+    osw_dict = mea_osw_dict(measure)
     with open(osw_fpath, "w") as fp:
         json.dump(osw_dict, fp, indent=4)
     return osw_fpath
 
+# GH inputs, unset outside the component (e.g. when imported in tests)
+run_swap_, run_sim_, update_ = [
+    globals().get(k) for k in ("run_swap_", "run_sim_", "update_")]
+
 if IS_TTY:
     # Label bool, fpath inputs
     run_swap_, run_sim_, update_ = True, True, False
@@ -284,23 +348,51 @@ if run_swap_ or run_sim_ or update_:
 
     try:
         _osw_swap, _osm_swap = None, None
+        sim_timeout = globals().get("timeout_") or SIM_TIMEOUT
+        sim_mem_limit = globals().get("mem_limit_") or SIM_MEM_LIMIT
         runsim_dpath = path.dirname(_osm) # sim dpath is child
         _osw = path.join(runsim_dpath, "workflow.osw")
 
 
         if run_swap_:
             # Run swap
-            print("\n## Running swap.py on lbtpyt.exe")
-            # Update measure, and run swap_win.py
-            _osw = dump_mea(_mea[0], _osw)
-            swap_cmds = [lbt_pytexe, swap_fpath, _osw, _osm, _ref_osm, _epw]
-            stdout, stderr = run_subproc(swap_cmds)
-            
-            if stdout: 
-                print(stdout.decode('utf-8'))
-                _osm_swap, _osw_swap = \
-                    stdout.decode('utf-8').strip().split("\n")[-2:]
-            if stderr: print(stderr.decode('utf-8'))
+            swap = import_swap(swap_fpath)
+            swap_resp = None
+            if swap:
+                # CPython w/ openstudio: no subprocess or osw round trip
+                print("\n## Running swap.py in-process")
+                swap_stats = {}
+                _osm_swap, _osw_swap = swap.run(
+                    _osw, _osm, _ref_osm, _epw, echo=False,
+                    osw_dict=mea_osw_dict(_mea[0]), stats=swap_stats)
+                pprint(swap_stats)
+            else:
+                # Update measure, try warm worker (swap.py serve)
+                _osw = dump_mea(_mea[0], _osw)
+                swap_req = {"cmd": "swap", "osw": _osw, "osm": _osm,
+                            "ref_osm": _ref_osm, "epw": _epw}
+                swap_resp = request_worker(swap_req)
+
+            if swap_resp:
+                print("\n## Swapped by worker in {}s.".format(
+                    swap_resp["seconds"]))
+                _osm_swap = swap_resp["osm_swap"]
+                _osw_swap = swap_resp["osw_swap"]
+            elif not swap:
+                print("\n## Running swap.py on lbtpyt.exe")
+                swap_result = path.join(runsim_dpath, "swap_result.json")
+                swap_cmds = [
+                    lbt_pytexe, swap_fpath, "swap", _osw, _osm, _ref_osm,
+                    _epw, "--result", swap_result]
+                proc = run_subproc(
+                    swap_cmds, log_fpath=path.join(runsim_dpath, "swap.log"),
+                    timeout=sim_timeout, tail=LOG_TAIL)
+                if proc.stderr: print(proc.stderr.decode('utf-8'))
+
+                swap_resp = load_result(swap_result)
+                _osm_swap = swap_resp["osm_swap"]
+                _osw_swap = swap_resp["osw_swap"]
+                pprint(swap_resp)
 
         if run_sim_:
             # Run workflow.osw
@@ -312,10 +404,26 @@ if run_swap_ or run_sim_ or update_:
             assert path.exists(_osw_swap), \
                 "OSW not found at {}".format(_osw_swap)
 
-            sim_cmds = [lbt_opsexe, "run", "-w", _osw_swap]
-            stdout, stderr = run_subproc(sim_cmds)
-            if stdout: print(stdout)
-            if stderr: print(stderr)
+            # swap.py sim restores cached results if inputs unchanged.
+            # Not --quiet, its output is streamed to sim.log.
+            sim_result = path.join(runsim_dpath, "sim_result.json")
+            sim_cmds = [lbt_pytexe, swap_fpath, "sim", _osw_swap,
+                        "--ops-exe", lbt_opsexe, "--result", sim_result]
+            proc = run_subproc(
+                sim_cmds, log_fpath=path.join(runsim_dpath, "sim.log"),
+                callback=print if IS_TTY else None, timeout=sim_timeout,
+                mem_limit=sim_mem_limit, tail=LOG_TAIL)
+            if proc.stderr: print(proc.stderr.decode('utf-8'))
+            sim_resp = load_result(sim_result)
+            print("## Sim done in {:.1f}s, cached={}.".format(
+                sim_resp["seconds"], sim_resp["cached"]))
+            err_json = sim_resp["outputs"].get("eplusout.err.json")
+            if err_json:
+                with open(err_json, "r") as fp:
+                    err_summary = json.load(fp)
+                print("## eplusout.err: {}".format(err_summary["counts"]))
+                for group in err_summary["groups"][:10]:
+                    print(" - {severity} x{count}: {template}".format(**group))
 
             # Get outputs
             # print(runsim_dpath, ":\n", os.listdir(runsim_dpath))
@@ -1,8 +1,19 @@
 from __future__ import annotations  # so we can use Path type
 import os
-from invoke import task
+import sys
+import time
+import json
+import importlib
+import hashlib
+from invoke import task, Context
+from collections.abc import Sequence
 from dataclasses import dataclass
+from concurrent.futures import ProcessPoolExecutor, as_completed
 import functools as ft
+# invoke loads tasks.py w/o the swap package, put the repo root on path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(
+    __file__))))
+from swap import orch, ledger, predict, dist
 # from io import StringIO
 # from shlex import quote, split
 path = os.path
@@ -11,10 +22,19 @@ LBT_DPATH = "/mnt/c/Users/admin/ladybug_tools"
 THERM_DPATH = "/mnt/c/Users/admin/masterwin/thermal"
 SIM_GH_DPATH = path.join(THERM_DPATH, "_sim/gh/rep_doe")
 SIM_CLI_DPATH = path.join(THERM_DPATH, "_sim/cli/rep_doe")
+SIM_REF_DPATH = path.join(THERM_DPATH, "_sim/gh/ref_doe")
+LEDGER_FPATH = path.join(SIM_CLI_DPATH, ".ledger.sqlite")
+DIST_DPATH = path.join(THERM_DPATH, "_sim/dist")
+RESULTS_DPATH = path.join(SIM_CLI_DPATH, ".results")
 lbt_python = path.join(LBT_DPATH, "python/python.exe")
 epw_dpath = path.join(THERM_DPATH, "epw")
 
 
+def _lazy(name: str):
+    """Swap module name, imported by the tasks that need numpy."""
+    return importlib.import_module(f"swap.{name}")
+
+
 @dataclass(frozen=True)
 class Path:
     """Path class for method chaining.
@@ -57,6 +77,51 @@ class Path:
         return self
 
 
+def hash_fpath(fpath: str, chunk: int = 1 << 20) -> str | None:
+    """Sha256 of file contents, None if file doesn't exist."""
+    if not path.exists(fpath):
+        return None
+    h = hashlib.sha256()
+    with open(fpath, "rb") as f:
+        for b in iter(lambda: f.read(chunk), b""):
+            h.update(b)
+    return h.hexdigest()
+
+
+def make_stamp(ins: Sequence[Path], outs: Sequence[Path]) -> dict:
+    """Content hashes of stage input, output fpaths."""
+    return {"ins": {p.path: hash_fpath(p.path) for p in ins},
+            "outs": {p.path: hash_fpath(p.path) for p in outs}}
+
+
+def is_stale(stamp_fpath: Path, ins: Sequence[Path], outs: Sequence[Path]
+             ) -> bool:
+    """True if stage ins, outs changed since stamp of last run.
+
+    Missing stamp, or missing/modified outputs also count as stale.
+    """
+    if not stamp_fpath.exists():
+        return True
+    with open(stamp_fpath.path, "r") as f:
+        stamp = json.load(f)
+    return stamp != make_stamp(ins, outs)
+
+
+def save_stamp(stamp_fpath: Path, ins: Sequence[Path], outs: Sequence[Path]
+               ) -> Path:
+    """Record stage ins, outs hashes after successful run."""
+    os.makedirs(stamp_fpath.parent().path, exist_ok=True)
+    with open(stamp_fpath.path, "w") as f:
+        json.dump(make_stamp(ins, outs), f, indent=4)
+    return stamp_fpath
+
+
+def stamp_path(cz: str, stage: str) -> Path:
+    """Stamp fpath for stage in sim_cli dir."""
+    model_name = "rep_doe_" + cz.lower()
+    return Path.init_join(SIM_CLI_DPATH, model_name, ".stamp", stage + ".json")
+
+
 @task
 def echo_test(ctx, dry=False, echo=False):
     """Echo test"""
@@ -73,17 +138,26 @@ def list(ctx):
 
 
 @task
-def cp_sim(ctx, cz="1a"):
+def cp_sim(ctx, cz="1a", force=False):
     """Copies simulation dir for in_swap.osm.
 
     Copies hb osm model from 'sim_/gh/' dir to 'sim_/cli/' dir:
         '/thermal/sim_/gh/rep_doe/rep_doe_{cz}/'
         '/thermal/sim_/cli/rep_doe/rep_doe_{cz}/'
+    Skipped if in.osm, workflow.osw unchanged since last copy.
     """
     model_name = "rep_doe_" + cz.lower()
     sim_gh = Path.init_join(SIM_GH_DPATH, model_name).chk()
     sim_cli = Path.init_join(SIM_CLI_DPATH, model_name)
 
+    run_fnames = ["in.osm", "workflow.osw"]
+    ins = [sim_gh.join("openstudio/run", f).chk() for f in run_fnames]
+    outs = [sim_cli.join("openstudio/run", f) for f in run_fnames]
+    stamp = stamp_path(cz, "cp_sim")
+    if not (force or is_stale(stamp, ins, outs)):
+        print(f"## Skip cp_sim {cz}, inputs unchanged.")
+        return
+
     # If intermediate dir doesn't exist, make it
     if not sim_cli.parent().exists():
         cmd = f"mkdir -p {sim_cli.parent().relpath()}"
@@ -107,41 +181,582 @@ def cp_sim(ctx, cz="1a"):
         except FileNotFoundError:
             pass
 
+    _ = save_stamp(stamp, ins, outs)
+
 
 @task
-def run_swap(ctx, cz='1a'):
+def run_swap(ctx, cz='1a', force=False, ddy="", outputs=""):
     """Creates in_swap.osm, workflow_swap.osw in sim_cli dir.
 
-    $ lbt_python swap.py run/workflow.osw run/in.osm epw/1a.epw
+    $ lbt_python swap.py run/workflow.osw run/in.osm ref/in.osm epw/1a.epw
+    W/ ddy, design days come from the ddy (e.g. 4b_custom.ddy) instead
+    of the ref osm. W/ outputs (eui-only, comfort-hourly, full-debug),
+    output requests are replaced by that reporting profile. Skipped if
+    inputs (incl. lbt/swap.py) unchanged since last swap w/ same outputs.
     """
     model_name = "rep_doe_" + cz.lower()
     sim_cli = Path.init_join(SIM_CLI_DPATH, model_name, "openstudio/run").chk()
+    sim_ref = Path.init_join(
+        SIM_REF_DPATH, "ref_doe_" + cz.lower(), "openstudio/run")
 
     with ctx.cd(os.path.curdir):
         # Get path strings rel to curdir
         lbtpyt = Path(lbt_python).relpath()
-        swap = Path.init_join(THERM_DPATH, "swap/swap.py").chk().relpath()
-        osm = sim_cli.join("in.osm").chk().path
-        osw = sim_cli.join("workflow.osw").chk().path
-        epw = Path.init_join(epw_dpath, cz.lower() + ".epw").chk().path
+        swap = Path.init_join(THERM_DPATH, "lbt/swap.py").chk()
+        osm = sim_cli.join("in.osm").chk()
+        osw = sim_cli.join("workflow.osw").chk()
+        ref = sim_ref.join("in.osm").chk()
+        epw = cz_epw(cz)
+
+        ins = [swap, osm, osw, ref, epw]
+        if ddy:
+            ins.append(Path(ddy).chk())
+        outs = [sim_cli.join("in_swap.osm"), sim_cli.join("workflow_swap.osw")]
+        stamp = stamp_path(cz, "run_swap" + (f"_{outputs}" if outputs else ""))
+        if not (force or is_stale(stamp, ins, outs)):
+            print(f"## Skip run_swap {cz}, inputs unchanged.")
+            return
+
         # Run command
-        cmd = f"{lbtpyt} {swap} {osw} {osm} {epw}"
+        cmd = (f"{lbtpyt} {swap.relpath()} "
+               f"{osw.path} {osm.path} {ref.path} {epw.path}")
+        if ddy:
+            cmd += f" --ddy {ins[-1].path}"
+        if outputs:
+            cmd += f" --outputs {outputs}"
         r = ctx.run(cmd, hide=False)
         # print(r.stdout)
+        _ = save_stamp(stamp, ins, outs)
 
 
-@task
-def run_sim(ctx, cz='1a'):
-    """openstudio run -w workflow_swap.osw"""
+def _sim_job_ins(cz: str) -> tuple[orch.SimJob, list[Path], list[Path]]:
+    """SimJob, stamp ins, outs of workflow_swap.osw for cz."""
     model_name = "rep_doe_" + cz.lower()
     sim_cli = Path.init_join(SIM_CLI_DPATH, model_name, "openstudio/run").chk()
+    osw = sim_cli.join("workflow_swap.osw").chk()
+    osm = sim_cli.join("in_swap.osm").chk()
+    epw = cz_epw(cz)
+    swap = Path.init_join(THERM_DPATH, "lbt/swap.py").chk()
+    job = orch.sim_job(osw.path, name=cz.lower(), swap_fpath=swap.path)
+    return job, [osw, osm, epw], _sim_outs(sim_cli.join("run"))
 
-    with ctx.cd(os.path.curdir):
-        osw = sim_cli.join("workflow_swap.osw").chk().relpath()
-        print(osw)
-        cmd = f"openstudio run -w {osw} &"
-        _ = ctx.run(cmd, hide=False)
-        # print(r.stdout)
+
+def _sim_outs(run_dpath: Path) -> list[Path]:
+    """Stamp outs of sim: eplusout.sql, or its compaction manifest.
+
+    The manifest (results.COMPACT_MANIFEST) stands in for the sql once
+    it's archived or dropped, so compacted sims aren't stale.
+    """
+    sql, compact = run_dpath.join("eplusout.sql"), \
+        run_dpath.join("results.json")
+    return [compact] if compact.exists() and not sql.exists() else [sql]
+
+
+@task
+def run_sim(ctx, cz='1a', force=False):
+    """python swap.py sim workflow_swap.osw
+
+    Skipped if swap outputs, epw unchanged since the last run. Output is
+    logged to run/sim.log.
+    """
+    _ = run_sims(ctx, czs=cz, jobs=1, force=force)
+
+
+@task
+def run_sims(ctx, czs="all", jobs=0, retries=0, threads=1, max_load=0.0,
+             order="lpt", compact="", force=False):
+    """Simulates workflow_swap.osw of many zones on an async job queue.
+
+    Runs at most jobs sims at once (default: cpus in affinity set), each
+    pinned to threads cpus, retrying failures. New sims wait while free
+    memory is low or load is over max_load (default: cpus).
+        invoke run-sims --czs 1a,4b --jobs 2 --retries 1
+        taskset -c 0-31 invoke run-sims --threads 2
+    Sims are queued by run time predicted from past runs in the ledger,
+    longest first (order=lpt), shortest first (sjf) or as given (fifo).
+    Zones w/ unchanged inputs since last run are skipped. W/ compact
+    (keep, archive or drop), outputs are compacted after each sim, see
+    compact-runs.
+    """
+    cz_arr = find_czs() if czs == "all" else \
+        [cz.strip().lower() for cz in czs.split(",") if cz.strip()]
+
+    sim_jobs, stamps = [], {}
+    for cz in cz_arr:
+        job, ins, outs = _sim_job_ins(cz)
+        job.threads = threads
+        stamp = stamp_path(cz, "run_sim")
+        if not (force or is_stale(stamp, ins, outs)):
+            print(f"## Skip run_sim {cz}, inputs unchanged.")
+            continue
+        sim_jobs.append(job)
+        stamps[job.name] = (stamp, ins, outs)
+
+    with ledger.Ledger(LEDGER_FPATH) as led:
+        model = predict.DurationModel.fit(led.history("sim"))
+        job_ids = {}
+        for job in sim_jobs:
+            ins = [p.path for p in stamps[job.name][1]]
+            feats = predict.osm_features(ins[1], cz=job.name)
+            job.est_seconds = model.predict(feats)
+            job_ids[job.name] = led.start(
+                job.name, "sim", ledger.hash_inputs(ins), features=feats)
+        sim_jobs = predict.order_jobs(sim_jobs, order)
+        print(f"## Queued {len(sim_jobs)} sims ({order}), est "
+              f"{sum(job.est_seconds for job in sim_jobs):.0f} cpu secs")
+        sim_jobs = orch.run_jobs(sim_jobs, max_jobs=jobs or None,
+                                 retries=retries, max_load=max_load or None,
+                                 report=True)
+        for job in sim_jobs:
+            led.finish(job_ids[job.name], job.state, job.seconds,
+                       job.returncode, job.outputs, job.error)
+    orch.print_jobs(sim_jobs)
+    for job in sim_jobs:
+        if job.state != "done":
+            continue
+        stamp, ins, outs = stamps[job.name]
+        run_dpath = outs[0].parent()
+        if compact:
+            _ = _compact_run(run_dpath, compact)
+        _ = save_stamp(stamp, ins, _sim_outs(run_dpath))
+
+    fails = [job.name for job in sim_jobs if job.state != "done"]
+    if fails:
+        raise SystemExit(f"{len(fails)}/{len(sim_jobs)} sims failed: {fails}")
+    return sim_jobs
+
+
+@task
+def run_screen(ctx, cz='1a', periods=5, kind="week", bench=False):
+    """Simulates representative weeks of cz, scaled to annual.
+
+    Weeks (or days, kind=day) are clustered from the epw, and a copy of
+    workflow_swap.osw that only runs them is written to run/screen/.
+    Reports the annual estimate, and its error vs the full annual run
+    if there's one, to screen/screen_report.json. speedup_days is
+    estimated from sim days; --bench reruns both the annual and the
+    screening sim uncached, one at a time, to measure speedup_secs.
+        invoke run-screen --cz 4b --periods 6 --bench
+    """
+    screen = _lazy("screen")
+    job, (osw, osm, epw), _ = _sim_job_ins(cz)
+    sql = osw.parent().join("run/eplusout.sql")
+    screen_osw = screen.write_screen(osw.path, epw.path, periods, kind)
+    screen_dpath = path.dirname(screen_osw)
+    swap = Path.init_join(THERM_DPATH, "lbt/swap.py").chk()
+    job = orch.sim_job(screen_osw, name=cz.lower() + "_screen",
+                       swap_fpath=swap.path)
+    jobs = [job]
+    if bench:
+        jobs.append(orch.sim_job(osw.path, name=cz.lower() + "_annual",
+                                 swap_fpath=swap.path))
+        for j in jobs:
+            j.cmds.append("--no-cache")
+    jobs = orch.run_jobs(jobs, max_jobs=1, report=True)
+    orch.print_jobs(jobs)
+    job = jobs[0]
+    if any(j.state != "done" for j in jobs):
+        raise SystemExit(f"Screening sim of {cz} failed: "
+                         f"{[j.error for j in jobs if j.error]}")
+
+    report = screen.screen_report(
+        path.join(screen_dpath, "run/eplusout.sql"),
+        path.join(screen_dpath, screen.SCREEN_FNAME),
+        sql.path if sql.exists() else None)
+    # Measured speedup, if the annual sim wasn't a cache hit either
+    result_fpaths = [path.join(path.dirname(f), "sim_result.json")
+                     for f in (osw.path, screen_osw)]
+    if all(path.exists(f) for f in result_fpaths):
+        results = []
+        for f in result_fpaths:
+            with open(f, "r") as fp:
+                results.append(json.load(fp))
+        if not any(r.get("cached") for r in results):
+            report["speedup_secs"] = round(
+                results[0]["seconds"] / results[1]["seconds"], 1)
+    with open(path.join(screen_dpath, "screen_report.json"), "w") as f:
+        json.dump(report, f, indent=4)
+    print(f"## Screened {cz}: {report['periods']} {kind}s, "
+          f"{report['days']} days, {report['sim_days']} sim days w/ "
+          f"warmup, sizing ({report['speedup_days']}x fewer)")
+    print(json.dumps(report, indent=4))
+
+
+def find_czs(sim_dpath=None) -> list[str]:
+    """Climate zones of 'rep_doe_{cz}' dirs in sim_dpath."""
+    prefix, sim_dpath = "rep_doe_", sim_dpath or SIM_GH_DPATH
+    sim_dirs = sorted(os.listdir(Path(sim_dpath).chk().path))
+    return [d[len(prefix):] for d in sim_dirs
+            if d.startswith(prefix) and path.isdir(path.join(sim_dpath, d))]
+
+
+@ft.cache
+def _climate_index(dpath: str) -> dict[str, list]:
+    """Climate index of dpath, built or loaded once per process."""
+    return _lazy("climate").climate_index(dpath)
+
+
+def cz_epw(cz: str, chk: bool = True) -> Path:
+    """Epw of climate zone cz.
+
+    epw_dpath/{cz}.epw if it exists, else the first station of zone cz
+    in the climate index of epw_dpath (see invoke climate-zones).
+    """
+    epw = Path.init_join(epw_dpath, cz.lower() + ".epw")
+    if epw.exists() or not path.isdir(epw_dpath):
+        return epw.chk() if chk else epw
+    climate = _lazy("climate")
+    epw_fpath = climate.resolve_zone(cz, _climate_index(epw_dpath))
+    if epw_fpath is None:
+        return epw.chk() if chk else epw
+    return Path(epw_fpath)
+
+
+def chain_ins(cz: str) -> list[str]:
+    """Source fpaths that determine the cp_sim -> run_sim outputs of cz."""
+    run_dpath = path.join("rep_doe_" + cz.lower(), "openstudio/run")
+    return [path.join(SIM_GH_DPATH, run_dpath, "in.osm"),
+            path.join(SIM_GH_DPATH, run_dpath, "workflow.osw"),
+            path.join(SIM_REF_DPATH, "ref_doe_" + cz.lower(),
+                      "openstudio/run/in.osm"),
+            path.join(THERM_DPATH, "lbt/swap.py"),
+            cz_epw(cz, chk=False).path]
+
+
+def chain_artifacts(cz: str) -> dict[str, str]:
+    """Existing swap, sim outputs of cz."""
+    run_dpath = path.join(SIM_CLI_DPATH, "rep_doe_" + cz.lower(),
+                          "openstudio/run")
+    fpaths = {"osm_swap": path.join(run_dpath, "in_swap.osm"),
+              "osw_swap": path.join(run_dpath, "workflow_swap.osw"),
+              "sql": path.join(run_dpath, "run/eplusout.sql")}
+    return {k: v for k, v in fpaths.items() if path.exists(v)}
+
+
+def run_chain(cz: str, force: bool = False) -> tuple[str, str, float]:
+    """Runs cp_sim -> run_swap -> run_sim for cz, returns summary.
+
+    Module level fn w/ own Context so it can be pickled to a worker
+    process. Errors are caught so one zone can't sink the batch.
+    """
+    ctx, t0 = Context(), time.perf_counter()
+    try:
+        cp_sim(ctx, cz=cz, force=force)
+        run_swap(ctx, cz=cz, force=force)
+        run_sim(ctx, cz=cz, force=force)
+        status = "ok"
+    except (Exception, SystemExit) as err:  # run_sim exits on fail
+        status = f"fail: {type(err).__name__}: {err}"
+    return cz, status, time.perf_counter() - t0
+
+
+@task
+def run_batch(ctx, czs="all", workers=0, order="lpt", force=False):
+    """Runs cp_sim -> run_swap -> run_sim for many climate zones.
+
+    Zones run concurrently on a process pool bounded by workers
+    (default: min(zones, cpus)).
+        invoke run-batch --czs 1a,2b,4b --workers 4
+        invoke run-batch  # all 'rep_doe_{cz}' dirs in SIM_GH_DPATH
+    Zones are submitted by predicted run time (order=lpt|sjf|fifo), and
+    an ETA is printed as they finish.
+    """
+    if czs == "all":
+        cz_arr = find_czs()
+    else:
+        cz_arr = [cz.strip().lower() for cz in czs.split(",") if cz.strip()]
+    # Resume: skip zones finished w/ same inputs in ledger
+    led = ledger.Ledger(LEDGER_FPATH)
+    hashes = {cz: ledger.hash_inputs(chain_ins(cz)) for cz in cz_arr}
+    summary, todo = {}, []
+    for cz in cz_arr:
+        if not force and led.is_done(cz, "chain", hashes[cz]):
+            summary[cz] = ("ok (done)", 0.0)
+        else:
+            todo.append(cz)
+
+    # Predict run time from gh osm, to order queue and report ETA
+    model = predict.DurationModel.fit(led.history("chain"))
+    feats, est = {}, {}
+    for cz in todo:
+        osm_fpath = chain_ins(cz)[0]
+        feats[cz] = predict.osm_features(osm_fpath, cz=cz) \
+            if path.exists(osm_fpath) else None
+        est[cz] = model.predict(feats[cz]) if feats[cz] else 0.0
+    todo = predict.order_jobs(todo, order, est=est.get)
+    workers = workers or min(len(todo), os.cpu_count() or 1)
+    print(f"## Running {len(todo)} zones on {workers} workers: {todo}")
+    if len(todo) < len(cz_arr):
+        done = [cz for cz in cz_arr if cz not in todo]
+        print(f"## Resuming, skip zones done w/ same inputs: {done}")
+
+    with led, ProcessPoolExecutor(max_workers=max(workers, 1)) as pool:
+        job_ids = {cz: led.start(cz, "chain", hashes[cz], features=feats[cz])
+                   for cz in todo}
+        futs = [pool.submit(run_chain, cz, force) for cz in todo]
+        left = sum(est.values())
+        for fut in as_completed(futs):
+            cz, status, dt = fut.result()
+            summary[cz] = (status, dt)
+            led.finish(job_ids[cz], "done" if status == "ok" else "failed",
+                       dt, artifacts=chain_artifacts(cz),
+                       error=None if status == "ok" else status)
+            left -= est[cz]
+            print(f" - {cz} done: {status} ({dt:.1f}s, est {est[cz]:.0f}s). "
+                  f"ETA {left / max(workers, 1):.0f}s", flush=True)
+
+    print("## Batch summary")
+    for cz in cz_arr:
+        status, dt = summary[cz]
+        print(f" - {cz}: {status} ({dt:.1f}s)")
+    fails = [cz for cz, (status, _) in summary.items()
+             if status.startswith("fail")]
+    if fails:
+        raise SystemExit(f"{len(fails)}/{len(cz_arr)} zones failed: {fails}")
+
+
+def dist_job(cz: str) -> dict:
+    """Queue job running cp_sim -> run_swap -> run_sim tasks for cz.
+
+    Uses the invoke on the worker's PATH, so hosts only need THERM_DPATH
+    (shared or checked out at the same path).
+    """
+    tasks_dpath = path.join(THERM_DPATH, "swap")
+    cmds = [["invoke", "-r", tasks_dpath, stage, "--cz", cz]
+            for stage in ("cp-sim", "run-swap", "run-sim")]
+    run_dpath = path.join(SIM_CLI_DPATH, "rep_doe_" + cz, "openstudio/run")
+    artifacts = {"osm_swap": path.join(run_dpath, "in_swap.osm"),
+                 "osw_swap": path.join(run_dpath, "workflow_swap.osw"),
+                 "sim_result": path.join(run_dpath, "sim_result.json"),
+                 "sql": path.join(run_dpath, "run/eplusout.sql")}
+    return dist.make_job(cz, cmds, artifacts)
+
+
+@task
+def dist_publish(ctx, czs="all", queue=DIST_DPATH, wait=False, timeout=0):
+    """Publishes zone jobs to a shared work queue dir for dist-work.
+
+        invoke dist-publish --czs 1a,4b --queue /mnt/share/dist --wait
+    With wait, blocks until all are done, requeuing claims of dead
+    workers w/o a heartbeat for timeout secs (0: never, > 60).
+    """
+    cz_arr = find_czs() if czs == "all" else \
+        [cz.strip().lower() for cz in czs.split(",") if cz.strip()]
+    dir_queue = dist.DirQueue(queue)
+    for cz in cz_arr:
+        dir_queue.put(dist_job(cz))
+    print(f"## Published {len(cz_arr)} jobs to {dir_queue.dpath}: {cz_arr}")
+    if not wait:
+        return
+    results = dist.wait_jobs(dir_queue, cz_arr, requeue_age=timeout or None)
+    fails = [cz for cz, r in results.items() if not r["ok"]]
+    for cz, r in results.items():
+        print(f" - {cz}: {'ok' if r['ok'] else r.get('error')} "
+              f"({r['seconds']:.1f}s on {r['worker']})")
+    if fails:
+        raise SystemExit(f"{len(fails)}/{len(cz_arr)} jobs failed: {fails}")
+
+
+@task
+def dist_work(ctx, queue=DIST_DPATH, host="", port=dist.DIST_PORT,
+              wait=False):
+    """Runs jobs from a work queue dir, or a dist-serve coordinator.
+
+        invoke dist-work --queue /mnt/share/dist  # shared dir
+        invoke dist-work --host node01 --wait     # tcp, poll for jobs
+    Tcp workers need the coordinator's THERMAL_DIST_TOKEN.
+    Start any number of these, on any number of hosts.
+    """
+    work_queue = dist.TcpQueue(host, port) if host else dist.DirQueue(queue)
+    results = dist.work(work_queue, wait=wait)
+    print(f"## {dist.worker_id()} ran {len(results)} jobs")
+
+
+@task
+def dist_serve(ctx, queue=DIST_DPATH, host="127.0.0.1", port=dist.DIST_PORT):
+    """Serves the work queue dir over tcp, for workers w/o the share.
+
+        THERMAL_DIST_TOKEN=.. invoke dist-serve --host 0.0.0.0
+    Workers need the same THERMAL_DIST_TOKEN.
+    """
+    with dist.QueueServer(dist.DirQueue(queue), host=host,
+                          port=port) as server:
+        print(f"## Serving {queue} on {host}:{port}")
+        server.serve_forever()
+
+
+@task
+def dist_status(ctx, queue=DIST_DPATH):
+    """Lists job ids in each work queue state."""
+    for state, job_ids in dist.DirQueue(queue).status().items():
+        print(f" - {state}: {len(job_ids)} {job_ids}")
+
+
+@task
+def bench_epw(ctx, epw="", n=5):
+    """Benchmarks epw row parse vs loadtxt vs memory-mapped npy cache.
+
+        invoke bench-epw --epw epw/1a.epw
+    Defaults to every epw in epw_dpath.
+    """
+    epw_ = _lazy("epw")
+    epw_fpaths = [epw] if epw else sorted(
+        path.join(root, f) for root, _, fs in os.walk(epw_dpath)
+        for f in fs if f.endswith(".epw"))
+    for epw_fpath in epw_fpaths:
+        secs = epw_.bench_epw(epw_fpath, n)
+        print(f"## {path.basename(epw_fpath)}: " + ", ".join(
+            f"{k} {v * 1000:.2f}ms" for k, v in secs.items()) +
+            f" ({secs['rows'] / secs['mmap']:.0f}x)")
+
+
+@task
+def gen_ddy(ctx, epws="", htg="99.6,99", clg="0.4,1,2"):
+    """Writes {epw}_gen.ddy design days computed from each epw.
+
+        invoke gen-ddy --clg 0.4 --htg 99.6
+        invoke run-swap --cz 4b --ddy epw/.../{epw}_gen.ddy
+    Defaults to every epw in epw_dpath, all in one vectorized batch.
+    """
+    ddy_ = _lazy("ddy")
+    epw_fpaths = epws.split(",") if epws else sorted(
+        path.join(root, f) for root, _, fs in os.walk(epw_dpath)
+        for f in fs if f.endswith(".epw"))
+    t0 = time.perf_counter()
+    ddy_fpaths = ddy_.gen_ddys(
+        epw_fpaths, [float(p) for p in htg.split(",") if p],
+        [float(p) for p in clg.split(",") if p])
+    print(f"## Wrote {len(ddy_fpaths)} ddys in "
+          f"{time.perf_counter() - t0:.2f}s")
+    for f in ddy_fpaths:
+        print(f" - {f}")
+
+
+@task
+def extract_results(ctx, czs="all", store=RESULTS_DPATH, workers=0,
+                    bench=False):
+    """Extracts eplusout.sql of sims to a memory-mapped columnar store.
+
+        invoke extract-results --czs 1a,4b --workers 4
+        invoke extract-results --bench   # row by row vs columnar
+    Read w/ results.ResultStore(store). Zones w/o a sql are skipped.
+    """
+    results = _lazy("results")
+    cz_arr = find_czs() if czs == "all" else \
+        [cz.strip().lower() for cz in czs.split(",") if cz.strip()]
+    sql_fpaths = {}
+    for cz in cz_arr:
+        sql_fpath = path.join(SIM_CLI_DPATH, "rep_doe_" + cz,
+                              "openstudio/run/run/eplusout.sql")
+        if path.exists(sql_fpath):
+            sql_fpaths[cz] = sql_fpath
+        else:
+            print(f"## Skip {cz}, no {sql_fpath} (compacted runs load w/ "
+                  f"results.CompactRun)")
+    if bench:
+        for cz, sql_fpath in sql_fpaths.items():
+            secs = results.bench_extract(sql_fpath)
+            print(f"## {cz}: rows {secs['rows']:.2f}s, columnar "
+                  f"{secs['columnar']:.2f}s "
+                  f"({secs['rows'] / secs['columnar']:.0f}x)")
+        return
+
+    t0 = time.perf_counter()
+    _ = results.build_store(sql_fpaths, store,
+                            workers=workers or os.cpu_count())
+    print(f"## Extracted {len(sql_fpaths)} runs to {store} in "
+          f"{time.perf_counter() - t0:.1f}s")
+
+
+def _compact_run(run_dpath: Path, retention: str, names: str = "") -> dict:
+    """Compact eplusout.sql in run_dpath and its sim cache, return manifest.
+
+    The sim cache entry is read from the sim_result.json of 'swap.py sim'.
+    """
+    results = _lazy("results")
+    sim_result = run_dpath.parent().join("sim_result.json")
+    cache_dpath = None
+    if sim_result.exists():
+        with open(sim_result.path, "r") as f:
+            cache_dpath = json.load(f).get("cache_entry")
+    return results.compact_run(
+        run_dpath.join("eplusout.sql").path,
+        names=[n.strip() for n in names.split(",") if n.strip()] or None,
+        retention=retention, cache_dpath=cache_dpath)
+
+
+@task
+def compact_runs(ctx, czs="all", retention="archive", names=""):
+    """Compacts sim outputs of zones to run/results.npz.
+
+        invoke compact-runs --retention drop
+        invoke compact-runs --names Electricity:Facility,NaturalGas:Facility
+    Series (all, or only names) and tabular values are saved compressed
+    w/ a results.json manifest. Then the sql and idf are kept, gzipped
+    (archive) or deleted (drop). Load w/ results.CompactRun(run_dpath).
+    Zones w/o a sql (not run, or already compacted) are skipped.
+    """
+    cz_arr = find_czs() if czs == "all" else \
+        [cz.strip().lower() for cz in czs.split(",") if cz.strip()]
+    for cz in cz_arr:
+        run_dpath = Path.init_join(
+            SIM_CLI_DPATH, "rep_doe_" + cz, "openstudio/run/run")
+        if not run_dpath.join("eplusout.sql").exists():
+            print(f"## Skip {cz}, no eplusout.sql")
+            continue
+        # Sims up to date before compacting stay up to date after
+        stamp = stamp_path(cz, "run_sim")
+        try:
+            _, ins, outs = _sim_job_ins(cz)
+            fresh = not is_stale(stamp, ins, outs)
+        except FileNotFoundError:
+            fresh = False
+        manifest = _compact_run(run_dpath, retention, names)
+        if fresh:
+            _ = save_stamp(stamp, ins, _sim_outs(run_dpath))
+        print(f"## {cz}: {manifest['sql_size'] / 1e6:.1f}MB sql -> "
+              f"{manifest['bytes'] / 1e6:.1f}MB npz, "
+              f"{manifest['raw'] or 'raw kept'}")
+
+
+@task
+def climate_zones(ctx, dpath=epw_dpath, rebuild=False):
+    """Lists ASHRAE 169 climate zone of each epw, stat in dpath.
+
+        invoke climate-zones --rebuild
+    Zones are read from .stat files, or computed from epws w/o one, and
+    cached in {dpath}/.climate_index.json. Zones w/o a {cz}.epw are
+    resolved from this index by run-swap, run-sim, run-batch.
+    """
+    climate = _lazy("climate")
+    t0 = time.perf_counter()
+    index = climate.climate_index(dpath, rebuild=rebuild)
+    n = sum(len(sts) for sts in index.values())
+    print(f"## {n} stations in {len(index)} zones "
+          f"({time.perf_counter() - t0:.2f}s)")
+    for cz, sts in index.items():
+        print(f" - {cz}: " + ", ".join(
+            f"{st['station']} ({st['source']}, hdd18={st['hdd18']}, "
+            f"cdd10={st['cdd10']})" for st in sts))
+
+
+@task
+def query_jobs(ctx, failed=False, slowest=False, stage=None, limit=20):
+    """Lists jobs in the batch ledger.
+
+        invoke query-jobs                # most recent
+        invoke query-jobs --failed       # failed, interrupted
+        invoke query-jobs --slowest --limit 5
+    """
+    with ledger.Ledger(LEDGER_FPATH) as led:
+        if failed:
+            rows = led.failures(limit)
+        elif slowest:
+            rows = led.slowest(limit)
+        else:
+            rows = led.jobs(stage, limit)
+    print(f"## {len(rows)} jobs in {LEDGER_FPATH}")
+    ledger.print_rows(rows)
 
 
 def _null():
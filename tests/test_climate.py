@@ -0,0 +1,55 @@
+"""Unit tests for ASHRAE climate zone classifier."""
+
+import os
+import shutil
+import numpy as np
+import swap.climate as climate
+
+STATION = "USA_AZ_Tucson-Davis-Monthan.AFB.722745_TMY3"
+EPW_FPATH = os.path.join(
+    os.path.dirname(__file__), "../resources/weather", STATION + ".epw")
+STAT_FPATH = os.path.join(
+    os.path.dirname(__file__), "../epw", STATION, STATION + ".stat")
+
+
+def test_thermal_zone():
+    hdd18 = np.array([0, 100, 500, 1500, 2500, 3500, 4500, 6000, 8000])
+    cdd10 = np.array([6500, 5500, 4000, 3000, 2000, 1500, 1000, 500, 100])
+    zones = climate.thermal_zone(hdd18, cdd10)
+    assert zones.tolist() == [0, 1, 2, 3, 4, 5, 6, 7, 8]
+
+
+def test_classify_epw_matches_stat():
+    stat = climate.parse_stat(STAT_FPATH)
+    assert stat == {"zone": "2B", "hdd18": 642, "cdd10": 4295,
+                    "source": "stat"}
+
+    epw = climate.epw_.load_epw(EPW_FPATH, cache=False)
+    data = {c: epw[c][None] for c in
+            ("month", "dry_bulb", "liquid_precip_depth")}
+    result = climate.classify(data, np.array([epw.location["latitude"]]))[0]
+    assert result["zone"][0] == "2"
+    assert abs(result["hdd18"] - stat["hdd18"]) <= 1
+    assert abs(result["cdd10"] - stat["cdd10"]) <= 1
+
+
+def test_climate_index(tmp_path, monkeypatch):
+    # epw only station, classified from epw
+    epw_dpath = tmp_path / "tucson_epw"
+    epw_dpath.mkdir()
+    epw_fpath = str(epw_dpath / (STATION + ".epw"))
+    shutil.copyfile(EPW_FPATH, epw_fpath)
+    # stat, ddy station
+    shutil.copytree(os.path.dirname(STAT_FPATH), tmp_path / STATION)
+
+    index = climate.climate_index(str(tmp_path))
+    assert sorted(st["source"] for st in index["2b"]) == ["epw", "stat"]
+    assert climate.resolve_zone("2B", index) == epw_fpath
+    assert climate.resolve_zone("2b", index, ext="stat").endswith(".stat")
+    assert climate.resolve_zone("7", index) is None
+    assert os.path.exists(tmp_path / climate.INDEX_FNAME)
+
+    # Unchanged stations come from the cache, w/o parsing files
+    monkeypatch.setattr(climate, "parse_stat", None)
+    monkeypatch.setattr(climate.epw_, "load_epw", None)
+    assert climate.climate_index(str(tmp_path)) == index
@@ -0,0 +1,64 @@
+"""Unit tests for design day generator."""
+
+import os
+import shutil
+import numpy as np
+import lbt.swap as swap
+import swap.ddy as ddy
+
+EPW_FPATH = os.path.join(
+    os.path.dirname(__file__), "../resources/weather",
+    "USA_AZ_Tucson-Davis-Monthan.AFB.722745_TMY3.epw")
+
+
+def test_wet_bulb():
+    db, dp = np.array([30.0, 20.0]), np.array([20.0, 20.0])
+    wb = ddy.wet_bulb(db, dp, np.full(2, 101325.0))
+    assert abs(wb[0] - 22.9) < 0.1  # psychrometric chart
+    assert abs(wb[1] - 20.0) < 1e-6  # saturated
+
+
+def test_design_conditions():
+    # Two fake epws, db ramps 0 -> 40 and 10 -> 50 over the year
+    hours = 8760
+    month = np.repeat(np.arange(1, 13), hours // 12)[None].repeat(2, 0)
+    db = np.stack([np.linspace(0, 40, hours), np.linspace(10, 50, hours)])
+    data = {"month": month, "dry_bulb": db, "dew_point": db - 10,
+            "atm_pressure": np.full((2, hours), 101325.0),
+            "wind_speed": np.full((2, hours), 3.0),
+            "wind_dir": np.full((2, hours), 181.0)}
+    conds = ddy.design_conditions(data, htg_pcts=(99.6,), clg_pcts=(0.4,))
+    htg, clg = conds[1]["htg"][99.6], conds[1]["clg"][0.4]
+    assert abs(htg["max_db"] - np.percentile(db[1], 0.4)) < 1e-9
+    assert abs(clg["max_db"] - np.percentile(db[1], 99.6)) < 1e-9
+    assert conds[0]["clg"][0.4]["max_db"] == clg["max_db"] - 10
+    assert clg["month"] == 12 and htg["month"] == 1
+    assert clg["ws"] == 3.0 and clg["wd"] == 180.0
+    assert htg["db_range"] == 0.0 and clg["db_range"] > 0
+    assert htg["max_db"] < clg["wb"] < clg["max_db"]
+
+    # Southern hemisphere: hottest mid Jan, coldest mid Jul
+    season = np.cos(2 * np.pi * (np.arange(hours) - 360) / hours)
+    data["dry_bulb"] = np.stack([20 + 10 * season] * 2)
+    conds = ddy.design_conditions(data, htg_pcts=(99.6,), clg_pcts=(0.4,))
+    assert conds[1]["htg"][99.6]["month"] == 7
+    assert conds[1]["clg"][0.4]["month"] == 1
+
+
+def test_gen_ddys(tmp_path):
+    epw_fpaths = []
+    for name in ("a", "b"):
+        epw_fpaths.append(str(tmp_path / f"{name}.epw"))
+        shutil.copyfile(EPW_FPATH, epw_fpaths[-1])
+    ddy_fpaths = ddy.gen_ddys(epw_fpaths)
+    assert ddy_fpaths[0] == str(tmp_path / "a_gen.ddy")
+
+    # Readable by swap.py, default selectors find htg, clg days
+    index = swap.load_ddy(ddy_fpaths[1])
+    assert index["location"]["latitude"] == 32.17
+    assert len(index["design_days"]) == 5
+    clg, htg = swap.select_design_days(index)  # file order
+    assert htg["name"].endswith("Ann Htg 99.6% Condns DB")
+    assert clg["day_type"] == "SummerDesignDay"
+    assert 38 < clg["max_db"] < 43  # ASHRAE 2009: 40.8C
+    assert len(clg["fields"]) == len(ddy.DD_FIELDS)
@@ -0,0 +1,165 @@
+"""Unit tests for multi-host work queue."""
+
+import os
+import sys
+import time
+import threading
+import multiprocessing
+import pytest
+import swap.dist as dist
+
+
+def _jobs(tmp_path, n=6):
+    # Each job writes its id to an artifact, last one fails
+    jobs = []
+    for i in range(n):
+        out_fpath = str(tmp_path / f"out_{i}.txt")
+        code = f"open({out_fpath!r}, 'w').write('{i}')"
+        if i == n - 1:
+            code += "; raise SystemExit(2)"
+        jobs.append(dist.make_job(f"job{i}", [[sys.executable, "-c", code]],
+                                  {"out": out_fpath}))
+    return jobs
+
+
+def _dir_worker(dpath, worker):
+    dist.work(dist.DirQueue(dpath), worker=worker)
+
+
+def test_dir_queue(tmp_path):
+    queue = dist.DirQueue(str(tmp_path / "queue"))
+    for job in _jobs(tmp_path):
+        queue.put(job)
+    assert len(queue.status()["todo"]) == 6
+
+    # Several worker processes, each job is run once
+    procs = [multiprocessing.Process(target=_dir_worker,
+                                     args=(queue.dpath, f"w{i}"))
+             for i in range(3)]
+    for p in procs:
+        p.start()
+    results = dist.wait_jobs(queue, [f"job{i}" for i in range(6)],
+                             poll=0.1, timeout=60)
+    for p in procs:
+        p.join()
+
+    assert [results[f"job{i}"]["ok"] for i in range(6)] == [True] * 5 + [False]
+    assert results["job5"]["returncode"] == 2
+    with open(results["job3"]["artifacts"]["out"]) as f:
+        assert f.read() == "3"
+    status = queue.status()
+    assert status["todo"] == status["claimed"] == []
+    assert len(status["done"]) == 5 and status["failed"] == ["job5"]
+
+
+def test_requeue(tmp_path):
+    queue = dist.DirQueue(str(tmp_path / "queue"))
+    queue.put(_jobs(tmp_path, 1)[0])
+    job = queue.claim("dead")
+    assert job["worker"] == "dead" and queue.claim() is None
+    assert queue.requeue(max_age=3600) == []
+    assert queue.requeue(max_age=0) == ["job0"]
+    assert queue.claim()["id"] == "job0"
+
+
+def test_heartbeat(tmp_path):
+    queue = dist.DirQueue(str(tmp_path / "queue"))
+    job = _jobs(tmp_path, 1)[0]
+    # Job outlives max_age, but its worker's heartbeat keeps the claim
+    job["cmds"] = [[sys.executable, "-c", "import time; time.sleep(1)"]]
+    queue.put(job)
+    worker = threading.Thread(target=dist.work, args=(queue,),
+                              kwargs={"worker": "w0", "heartbeat": 0.05})
+    worker.start()
+    time.sleep(0.3)
+    assert queue.requeue(max_age=0.2) == []
+    worker.join(60)
+    assert queue.results()["job0"]["worker"] == "w0"
+
+    # Requeued claim's old worker can't finish it
+    queue.put(job)
+    slow = queue.claim("slow")
+    os.utime(queue._fpath("claimed", "job0"), (0, 0))
+    assert queue.requeue(max_age=60) == ["job0"]
+    assert queue.claim("fast")["worker"] == "fast"
+    assert not queue.heartbeat(slow)
+    assert queue.finish(slow, {"ok": False}, {})["stale"]
+    assert queue.status()["claimed"] == ["job0"]
+
+
+def test_tcp_queue(tmp_path):
+    queue = dist.DirQueue(str(tmp_path / "coord"))
+    for job in _jobs(tmp_path, 4):
+        queue.put(job)
+    server = dist.QueueServer(queue, token="secret", port=0)
+    port = server.server_address[1]
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        workers = [threading.Thread(
+            target=dist.work,
+            args=(dist.TcpQueue(port=port, token="secret"),),
+            kwargs={"worker": f"w{i}"}) for i in range(2)]
+        for w in workers:
+            w.start()
+        for w in workers:
+            w.join(60)
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    results = queue.results()
+    assert sorted(results) == [f"job{i}" for i in range(4)]
+    assert not results["job3"]["ok"]
+    # Artifacts were sent back to coordinator's results dir
+    out_fpath = results["job1"]["artifacts"]["out"]
+    assert out_fpath.startswith(queue.dpath)
+    with open(out_fpath) as f:
+        assert f.read() == "1"
+
+
+def test_tcp_finish_stream(tmp_path):
+    # Artifact larger than a chunk is streamed, not held in a json line
+    queue = dist.DirQueue(str(tmp_path / "coord"))
+    sql_fpath = tmp_path / "eplusout.sql"
+    data = os.urandom(dist.CHUNK_BYTES * 2 + 123)
+    sql_fpath.write_bytes(data)
+    queue.put(dist.make_job("job0", [], {"sql": str(sql_fpath)}))
+    server = dist.QueueServer(queue, token="secret", port=0)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        tcp_queue = dist.TcpQueue(port=server.server_address[1],
+                                  token="secret")
+        job = tcp_queue.claim("w0")
+        result = tcp_queue.finish(job, {"ok": True},
+                                  {"sql": str(sql_fpath)})
+    finally:
+        server.shutdown()
+        server.server_close()
+    with open(result["artifacts"]["sql"], "rb") as f:
+        assert f.read() == data
+
+
+def test_queue_server_checks(tmp_path):
+    queue = dist.DirQueue(str(tmp_path / "coord"))
+    queue.put(_jobs(tmp_path, 1)[0])
+    server = dist.QueueServer(queue, token="secret", port=0)
+    try:
+        assert server.server_address[0] == "127.0.0.1"
+        with pytest.raises(PermissionError):
+            _ = server.dispatch({"cmd": "ping", "token": "guess"})
+        # Only claimed jobs, w/ safe ids and file names
+        finish = {"cmd": "finish", "token": "secret", "result": {"ok": True}}
+        for job_id in ("../../evil", "job1"):
+            with pytest.raises(ValueError):
+                _ = server.dispatch(dict(finish, job={"id": job_id}))
+        job = queue.claim()
+        with pytest.raises(ValueError):
+            _ = server.dispatch(dict(finish, job=job,
+                                     files={"a": ["..", 0]}))
+    finally:
+        server.server_close()
+    assert not (tmp_path / "evil").exists()
+    with pytest.raises(ValueError):
+        _ = dist.QueueServer(queue, token="", port=0)
@@ -0,0 +1,49 @@
+"""Unit tests for epw loader."""
+
+import os
+import shutil
+import numpy as np
+import swap.epw as epw
+
+EPW_FPATH = os.path.join(
+    os.path.dirname(__file__), "../resources/weather",
+    "USA_AZ_Tucson-Davis-Monthan.AFB.722745_TMY3.epw")
+
+
+def _epw(tmp_path):
+    fpath = str(tmp_path / "tucson.epw")
+    shutil.copyfile(EPW_FPATH, fpath)
+    return fpath
+
+
+def test_parse_epw(tmp_path):
+    fpath = _epw(tmp_path)
+    data = epw.parse_epw(fpath)
+    assert data.shape == (len(epw.DATA_COLS), 8760)
+    assert np.array_equal(data, epw.parse_epw_rows(fpath))
+
+    e = epw.Epw(fpath, epw.read_header(fpath), data)
+    assert e["dry_bulb"][:3].tolist() == [5.6, 4.6, 3.7]
+    assert e["ghi"] is not None and e["ghi"].max() > 1000
+    assert e["hour"][0] == 1 and e["month"][-1] == 12
+    assert e.location["wmo"] == "722745"
+    assert e.location["elevation"] == 809.0
+
+
+def test_load_epw_cache(tmp_path):
+    fpath = _epw(tmp_path)
+    e = epw.load_epw(fpath)
+    npy_fpath = epw.epw_cache_fpath(fpath)
+    assert os.path.exists(npy_fpath)
+    assert isinstance(e.data, np.memmap) and not e.data.flags.writeable
+    assert e["db"].flags.c_contiguous  # column is one contiguous block
+    assert np.array_equal(e.data, epw.load_epw(fpath, cache=False).data)
+
+    # Newer epw rebuilds cache
+    with open(fpath, "r", encoding="latin-1") as f:
+        lines = f.readlines()
+    lines[8] = lines[8].replace(",5.6,", ",9.9,", 1)
+    with open(fpath, "w", encoding="latin-1") as f:
+        f.writelines(lines)
+    os.utime(npy_fpath, (0, 0))
+    assert epw.load_epw(fpath)["db"][0] == 9.9
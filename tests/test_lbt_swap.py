@@ -0,0 +1,539 @@
+"""Tests for lbt/swap.py"""
+
+import os
+import sys
+import time
+import pytest
+import lbt.swap as swap
+
+# Run with
+# python -m pytest -rPx ../tests
+
+
+def _mk_sim(tmp_path):
+    """Make fake swap input files in tmp_path."""
+    fpaths = []
+    for fname, txt in [("workflow.osw", "{}"), ("in.osm", "act"),
+                       ("ref.osm", "ref"), ("1a.epw", "epw")]:
+        fpath = tmp_path / fname
+        fpath.write_text(txt)
+        fpaths.append(str(fpath))
+    return fpaths
+
+
+def test_hash_fpaths(tmp_path):
+
+    osw, osm, ref, epw = _mk_sim(tmp_path)
+    osw_dict = swap.load_osw(osw)
+    key = swap.swap_cache_key(osw_dict, osm, ref, epw)
+    assert key == swap.swap_cache_key(osw_dict, osm, ref, epw)
+    assert len(key) == 64
+
+    # Any changed input changes key
+    (tmp_path / "ref.osm").write_text("ref2")
+    assert key != swap.swap_cache_key(osw_dict, osm, ref, epw)
+    assert key != swap.swap_cache_key({"steps": []}, osm, ref, epw)
+
+
+def test_swap_cache_hit(tmp_path, monkeypatch):
+
+    monkeypatch.setattr(swap, "CACHE_DPATH", str(tmp_path / "cache"))
+    osw, osm, ref, epw = _mk_sim(tmp_path)
+
+    # Miss
+    osm_swap, osw_swap = str(tmp_path / "in_swap.osm"), \
+        str(tmp_path / "workflow_swap.osw")
+    key = swap.swap_cache_key(swap.load_osw(osw), osm, ref, epw)
+    assert not swap.cache_load(key, [osm_swap, osw_swap])
+
+    # Fill cache from another sim dir
+    src = tmp_path / "src"
+    src.mkdir()
+    (src / "in_swap.osm").write_text("swapped")
+    swap.dump_osw({"seed_file": "/old/in_swap.osm"},
+                  str(src / "workflow_swap.osw"))
+    swap.cache_dump(key, [str(src / "in_swap.osm"),
+                          str(src / "workflow_swap.osw")],
+                    names=swap.SWAP_CACHE_NAMES)
+
+    # Hit returns w/o openstudio, repointed to this sim dir
+    stats = {}
+    _osm_swap, _osw_swap = swap.run(osw, osm, ref, epw, echo=False,
+                                    stats=stats)
+    assert (_osm_swap, _osw_swap) == (osm_swap, osw_swap)
+    assert stats["cached"] and stats["osw_swap"] == osw_swap
+    assert open(osm_swap).read() == "swapped"
+    osw_dict = swap.load_osw(osw_swap)
+    assert osw_dict["seed_file"] == osm_swap
+    assert osw_dict["weather_file"] == epw
+    assert not [d for d in os.listdir(tmp_path / "cache" / "swap")
+                if ".tmp" in d]
+
+    # Same content under other names hits, w/ its own swap fpaths
+    (tmp_path / "b.osm").write_text("act")
+    b_osm_swap, _ = swap.run(osw, str(tmp_path / "b.osm"), ref, epw,
+                             echo=False)
+    assert open(b_osm_swap).read() == "swapped"
+    assert b_osm_swap == str(tmp_path / "b_swap.osm")
+
+    # Entry missing a file is a miss
+    os.remove(tmp_path / "cache" / "swap" / key / "osm_swap.osm")
+    assert not swap.cache_load(key, [osm_swap, osw_swap],
+                               names=swap.SWAP_CACHE_NAMES)
+
+
+def test_sim_cache_hit(tmp_path, monkeypatch):
+
+    monkeypatch.setattr(swap, "CACHE_DPATH", str(tmp_path / "cache"))
+    (tmp_path / "in_swap.osm").write_text("swapped")
+    (tmp_path / "1a.epw").write_text("epw")
+    osw = swap.dump_osw(
+        {"seed_file": "in_swap.osm", "weather_file": str(tmp_path / "1a.epw"),
+         "steps": [{"measure_dir_name": "m", "arguments": {"a": 1}}]},
+        str(tmp_path / "workflow_swap.osw"))
+    key = swap.sim_cache_key(osw)
+
+    # Step args are part of key
+    osw_dict = swap.load_osw(osw)
+    osw_dict["steps"][0]["arguments"]["a"] = 2
+    osw2 = swap.dump_osw(osw_dict, str(tmp_path / "workflow2.osw"))
+    assert key != swap.sim_cache_key(osw2)
+
+    # Cached results are restored to run dir w/o openstudio
+    src = tmp_path / "src"
+    src.mkdir()
+    (src / "eplusout.sql").write_text("sql")
+    (src / "eplusout.err").write_text("err")
+    swap.cache_dump(key, [str(src / "eplusout.sql"),
+                          str(src / "eplusout.err")], kind="sim")
+    out_fpaths = swap.run_sim(osw, ops_exe="/no/openstudio")
+    assert open(out_fpaths[0]).read() == "sql"
+    assert os.path.basename(out_fpaths[0]) == "eplusout.sql"
+    assert not os.path.exists(str(tmp_path / "run" / "epluszsz.csv"))
+
+    # Outputs of an earlier run are cleared before restoring
+    (tmp_path / "run" / "epluszsz.csv").write_text("old")
+    (tmp_path / "run" / "eplusout.eso").write_text("old")
+    _ = swap.run_sim(osw, ops_exe="/no/openstudio")
+    assert sorted(os.listdir(tmp_path / "run")) == [
+        "eplusout.err", "eplusout.err.json", "eplusout.sql"]
+
+    # Compacted entry w/o the sql restores the compacted results
+    key_dpath = tmp_path / "cache" / "sim" / key
+    os.remove(key_dpath / "eplusout.sql")
+    (key_dpath / "results.json").write_text("{}")
+    stats = {}
+    _ = swap.run_sim(osw, ops_exe="/no/openstudio", stats=stats)
+    assert stats["cached"] and stats["cache_entry"] == str(key_dpath)
+    assert sorted(os.listdir(tmp_path / "run")) == [
+        "eplusout.err", "eplusout.err.json", "results.json"]
+
+
+def test_cache_prune(tmp_path, monkeypatch):
+
+    monkeypatch.setattr(swap, "CACHE_DPATH", str(tmp_path / "cache"))
+    src = tmp_path / "eplusout.sql"
+    src.write_bytes(b"x" * 400_000)
+    for i, key in enumerate("abc"):
+        key_dpath = swap.cache_dump(key, [str(src)], kind="sim")
+        os.utime(key_dpath, (i, i))
+    # a was used last, b is least recent
+    assert swap.cache_load("a", [str(tmp_path / "a.sql")], kind="sim",
+                           names=["eplusout.sql"])
+    assert swap.cache_prune("sim", max_mb=1) == ["b"]
+    assert sorted(os.listdir(tmp_path / "cache" / "sim")) == ["a", "c"]
+    assert swap.cache_prune("sim", max_mb=0) == ["c"]
+
+
+def test_parse_args():
+
+    # Legacy positional args default to swap cmd
+    args = swap.parse_args(["a.osw", "a.osm", "r.osm", "a.epw"])
+    assert args.cmd == "swap" and args.cache
+    assert args.ref_osm == "r.osm"
+
+    args = swap.parse_args(["sim", "a.osw", "--no-cache"])
+    assert args.cmd == "sim" and not args.cache
+
+
+def test_parse_args_compile():
+
+    args = swap.parse_args(["compile", "ref.osm"])
+    assert args.cmd == "compile" and args.out is None
+
+
+def test_load_manifest(tmp_path):
+
+    # CSV w/ optional epw column
+    man = tmp_path / "man.csv"
+    man.write_text("osw,osm,epw\na/workflow.osw,a/in.osm,\n"
+                   "b/workflow.osw,b/in.osm,b.epw\n")
+    rows = swap.load_manifest(str(man))
+    assert len(rows) == 2
+    assert rows[0]["osm"] == str(tmp_path / "a" / "in.osm")
+    assert not rows[0]["epw"]
+    assert rows[1]["epw"] == str(tmp_path / "b.epw")
+
+    # JSON
+    man = tmp_path / "man.json"
+    man.write_text('[{"osw": "a/workflow.osw", "osm": "/abs/in.osm"}]')
+    rows = swap.load_manifest(str(man))
+    assert rows[0]["osm"] == "/abs/in.osm"
+    assert rows[0]["osw"] == str(tmp_path / "a" / "workflow.osw")
+
+
+def test_run_batch_row_malformed(monkeypatch):
+
+    # Missing manifest column fails the row, not the batch
+    monkeypatch.setattr(swap, "_BATCH_REF",
+                        {"fpath": "ref.osm", "osm": None, "cache": False})
+    result = swap._run_batch_row({"osw": "a.osw", "epw": "a.epw"})
+    assert result["status"] == "fail" and result["osm"] is None
+    assert result["error"] == "KeyError: 'osm'"
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_run_batch_ref_fails(tmp_path, monkeypatch, workers):
+
+    # Ref that can't load (no openstudio here) fails rows, not the pool
+    monkeypatch.setattr(swap, "CACHE_DPATH", str(tmp_path / "cache"))
+    monkeypatch.setitem(sys.modules, "openstudio", None)
+    osw, osm, ref, epw = _mk_sim(tmp_path)
+    manifest = swap.dump_osw([{"osw": osw, "osm": osm, "epw": epw},
+                              {"osw": osw, "osm": osm}],
+                             str(tmp_path / "manifest.json"))
+    results = swap.run_batch(manifest, ref, workers=workers)
+    assert [r["status"] for r in results] == ["fail", "fail"]
+    assert "openstudio" in results[0]["error"]
+    assert results[1]["error"] == "ValueError: No epw in manifest row or args"
+
+
+def test_swap_worker():
+
+    import json
+    import socket
+    import threading
+
+    with swap.SwapWorker(port=0) as worker:
+        thread = threading.Thread(target=worker.serve_forever, daemon=True)
+        thread.start()
+        port = worker.server_address[1]
+        sock = socket.create_connection(("127.0.0.1", port))
+        with sock, sock.makefile("rw") as f:
+            # Ping, then a bad request gets an error, not a dead worker
+            for req in [{"cmd": "ping"}, {"cmd": "swap", "osm": "x"},
+                        {"cmd": "ping"}]:
+                f.write(json.dumps(req) + "\n")
+                f.flush()
+                resp = json.loads(f.readline())
+                if req["cmd"] == "ping":
+                    assert resp == {"ok": True, "version": swap.SWAP_VERSION}
+                else:
+                    assert resp["ok"] is False
+                    assert "KeyError" in resp["error"]
+        worker.shutdown()
+
+
+def test_swap_worker_cache_hit(tmp_path, monkeypatch):
+
+    # Cached swap is served w/o loading the ref
+    monkeypatch.setattr(swap, "CACHE_DPATH", str(tmp_path / "cache"))
+    osw, osm, ref, epw = _mk_sim(tmp_path)
+    key = swap.swap_cache_key(swap.load_osw(osw), osm, ref, epw)
+    osw_swap = swap.dump_osw({}, str(tmp_path / "workflow_swap.osw"))
+    swap.cache_dump(key, [osm, osw_swap], names=swap.SWAP_CACHE_NAMES)
+    with swap.SwapWorker(port=0) as worker:
+        monkeypatch.setattr(worker, "get_ref", None)
+        resp = worker.dispatch({"cmd": "swap", "osw": osw, "osm": osm,
+                                "ref_osm": ref, "epw": epw})
+    assert resp["ok"] and resp["cached"]
+
+
+def test_swap_cache_osw_dict(tmp_path, monkeypatch):
+
+    # In-process osw_dict hits cache filled from osw file
+    monkeypatch.setattr(swap, "CACHE_DPATH", str(tmp_path / "cache"))
+    osw, osm, ref, epw = _mk_sim(tmp_path)
+    swap.dump_osw({"steps": [], "measure_paths": ["m"]}, osw)
+    key = swap.swap_cache_key(swap.load_osw(osw), osm, ref, epw)
+    osm_swap = str(tmp_path / "in_swap.osm")
+    osw_swap = swap.dump_osw({}, str(tmp_path / "workflow_swap.osw"))
+    swap.cache_dump(key, [swap.shutil.copy(osm, osm_swap), osw_swap],
+                    names=swap.SWAP_CACHE_NAMES)
+    os.remove(osw)
+
+    stats = {}
+    swap.run(osw, osm, ref, epw, echo=False, stats=stats,
+             osw_dict={"measure_paths": ["m"], "steps": []})
+    assert stats["cached"]
+
+
+def test_run_cmd_result(tmp_path, monkeypatch, capsys):
+
+    monkeypatch.setattr(swap, "CACHE_DPATH", str(tmp_path / "cache"))
+    osw, osm, ref, epw = _mk_sim(tmp_path)
+    key = swap.swap_cache_key(swap.load_osw(osw), osm, ref, epw)
+    osm_swap = swap.shutil.copy(osm, str(tmp_path / "in_swap.osm"))
+    osw_swap = swap.dump_osw({}, str(tmp_path / "workflow_swap.osw"))
+    swap.cache_dump(key, [osm_swap, osw_swap], names=swap.SWAP_CACHE_NAMES)
+
+    # Quiet swap writes json result, nothing on stdout
+    result_fpath = str(tmp_path / "result.json")
+    args = swap.parse_args(
+        [osw, osm, ref, epw, "--result", result_fpath, "-q"])
+    swap.run_cmd(args)
+    assert capsys.readouterr().out == ""
+    result = swap.load_osw(result_fpath)
+    assert result["ok"] and result["cached"]
+    assert result["osm_swap"] == osm_swap
+
+    # Failed sim still writes result, w/ the missing openstudio error
+    sim_osw = swap.dump_osw({"seed_file": "in.osm", "weather_file": "1a.epw"},
+                            str(tmp_path / "sim.osw"))
+    args = swap.parse_args(
+        ["sim", sim_osw, "--result", result_fpath, "-q",
+         "--ops-exe", "/no/ops"])
+    with pytest.raises(FileNotFoundError):
+        swap.run_cmd(args)
+    result = swap.load_osw(result_fpath)
+    assert result["ok"] is False
+    assert result["error"].startswith("FileNotFoundError")
+    assert "/no/ops" in result["error"]
+
+
+def test_err_watch(tmp_path):
+    err = tmp_path / "eplusout.err"
+    watch = swap.ErrWatch(str(err), max_warnings=3)
+    assert watch.poll() is None  # no err yet
+
+    with open(err, "w") as f:
+        f.write("Program Version,EnergyPlus\n"
+                "   ** Warning ** GetSurfaceData: odd vertices\n"
+                "   **   ~~~   ** continued\n   ** Warn")
+    assert watch.poll() is None
+    assert watch.counts["Warning"] == 1
+    with open(err, "a") as f:  # partial line finished on next poll
+        f.write("ing ** Two\n   ** Severe  ** Node not found\n")
+    assert watch.poll() == "Severe: Node not found"
+    assert watch.summary() == {
+        "counts": {"Warning": 2, "Severe": 1, "Fatal": 0},
+        "messages": ["Severe: Node not found"],
+        "aborted": "Severe: Node not found"}
+
+    watch = swap.ErrWatch(str(err), abort_on=(), max_warnings=2)
+    assert watch.poll() == "2 warnings"
+
+
+def test_run_sim_watchdog(tmp_path):
+    # Fake openstudio: spawns a child, writes a Severe, then hangs
+    pid_fpath = tmp_path / "child.pid"
+    ops_exe = tmp_path / "openstudio"
+    ops_exe.write_text(
+        f"#!{sys.executable}\n"
+        "import os, sys, time, subprocess\n"
+        "run_dpath = os.path.join(os.path.dirname(sys.argv[3]), 'run')\n"
+        "os.makedirs(run_dpath, exist_ok=True)\n"
+        f"p = subprocess.Popen([{sys.executable!r}, '-c', "
+        "'import time; time.sleep(60)'])\n"
+        f"open({str(pid_fpath)!r}, 'w').write(str(p.pid))\n"
+        "with open(os.path.join(run_dpath, 'eplusout.err'), 'w') as f:\n"
+        "    f.write('   **  Fatal  ** Out of range\\n')\n"
+        "time.sleep(60)\n")
+    ops_exe.chmod(0o755)
+    osw = swap.dump_osw({"seed_file": "in.osm"},
+                        str(tmp_path / "workflow.osw"))
+
+    stats, t0 = {}, time.time()
+    with pytest.raises(swap.SimAbortError):
+        swap.run_sim(osw, ops_exe=str(ops_exe), cache=False, stats=stats,
+                     quiet=True)
+    assert time.time() - t0 < 30
+    assert stats["errors"]["aborted"] == "Fatal: Out of range"
+    assert stats["errors"]["counts"]["Fatal"] == 1
+    # energyplus (child) was killed too, SIGKILL lands async
+    status_fpath = f"/proc/{pid_fpath.read_text()}/status"
+    if os.path.exists("/proc"):
+        for _ in range(50):
+            alive = os.path.exists(status_fpath) and \
+                "zombie" not in open(status_fpath).read()
+            if not alive:
+                break
+            time.sleep(0.1)
+        assert not alive
+
+
+
+def test_run_sim_screen_fail(tmp_path):
+    # Fake openstudio that fails in the measures_only screening step
+    ops_exe = tmp_path / "openstudio"
+    ops_exe.write_text("#!/bin/sh\nexit 3\n")
+    ops_exe.chmod(0o755)
+    osw = swap.dump_osw({"seed_file": "in.osm"},
+                        str(tmp_path / "workflow.osw"))
+    (tmp_path / swap.SCREEN_FNAME).write_text('{"periods": []}')
+
+    stats = {}
+    with pytest.raises(swap.subprocess.CalledProcessError) as e:
+        swap.run_sim(osw, ops_exe=str(ops_exe), cache=False, stats=stats,
+                     quiet=True)
+    assert "--measures_only" in e.value.cmd and e.value.returncode == 3
+    assert stats["screen"] is True
+    assert stats["errors"]["counts"]["Fatal"] == 0
+
+ERR_TXT = """Program Version,EnergyPlus, Version 22.1.0
+   ** Warning ** GetSurfaceData: Surface="FACE 1" has 5 vertices
+   **   ~~~   ** Vertex 3 is collinear
+   ** Warning ** GetSurfaceData: Surface="FACE 22" has 7 vertices
+   ** Warning ** CheckUsedConstructions: There are 2 nominally unused
+   ** Severe  ** Node="AIR LOOP 1 SUPPLY" not found
+   ************* EnergyPlus Completed Successfully-- 3 Warning; 1 Severe Errors;
+"""
+
+
+def test_parse_err(tmp_path):
+    err = tmp_path / "eplusout.err"
+    err.write_text(ERR_TXT, encoding="latin-1")
+    summary = swap.parse_err(str(err))
+    assert summary["completed"] is True
+    assert summary["counts"] == {"Fatal": 0, "Severe": 1, "Warning": 3}
+    groups = summary["groups"]
+    assert [(g["severity"], g["count"]) for g in groups] == \
+        [("Severe", 1), ("Warning", 2), ("Warning", 1)]
+    assert groups[1]["template"] == \
+        'GetSurfaceData: Surface="*" has # vertices'
+    assert groups[1]["example"] == ('GetSurfaceData: Surface="FACE 1" has 5 '
+                                    'vertices | Vertex 3 is collinear')
+    assert len(swap.parse_err(str(err), top=1)["groups"]) == 2
+
+    # Killed run has no end line
+    err.write_text(ERR_TXT.splitlines()[1] + "\n")
+    assert swap.parse_err(str(err))["completed"] is None
+
+
+def test_aggregate_errs(tmp_path):
+    for cz in ("1a", "4b"):
+        run_dpath = tmp_path / f"rep_doe_{cz}" / "run"
+        run_dpath.mkdir(parents=True)
+        (run_dpath / "eplusout.err").write_text(ERR_TXT)
+    (tmp_path / "eplusout.err").write_text("   **  Fatal  ** Bad\n")
+
+    summary = swap.aggregate_errs(str(tmp_path))
+    assert summary["runs"] == 3
+    assert summary["failed"] == [str(tmp_path / "eplusout.err")]
+    assert summary["counts"] == {"Fatal": 1, "Severe": 2, "Warning": 6}
+    fatal, severe, vertices = summary["groups"][:3]
+    assert fatal["template"] == "Bad" and fatal["runs"] == 1
+    assert (severe["count"], severe["runs"]) == (2, 2)
+    assert (vertices["count"], vertices["runs"]) == (4, 2)
+
+
+EPW_DPATH = os.path.join(os.path.dirname(__file__), "../epw")
+
+
+def test_load_ddy():
+    ddy = os.path.join(EPW_DPATH, "USA_AZ_Tucson-Davis-Monthan.AFB.722745_TMY3",
+                       "USA_AZ_Tucson-Davis-Monthan.AFB.722745_TMY3.ddy")
+    index = swap.load_ddy(ddy)
+    assert index["location"]["latitude"] == 32.17
+    assert index["location"]["elevation"] == 809.0
+    assert len(index["design_days"]) == 18
+    dd = index["design_days"]["Ann Clg .4% Condns DB=>MWB"]
+    assert (dd["month"], dd["day"], dd["max_db"]) == (7, 21, 40.8)
+
+    # Default selects DOE prototype htg, clg days
+    dds = swap.select_design_days(index)
+    assert [swap.ddy_condition(dd["name"]) for dd in dds] == [
+        "Ann Htg 99.6% Condns DB", "Ann Clg .4% Condns DB=>MWB"]
+    assert len(swap.select_design_days(index, ["clg .4%"])) == 4
+    with pytest.raises(ValueError):
+        swap.select_design_days(index, ["Clg 5%"])
+
+    # Custom ddy
+    ddy = os.path.join(EPW_DPATH, "USA_NM_Albuquerque.Intl.Sunport.723650_TMY3",
+                       "4b_custom.ddy")
+    index = swap.load_ddy(ddy)
+    assert list(index["design_days"]) == [
+        "Ann Clg .4% Condns DB=>MWB", "Ann Htg 99.6% Condns DB"]
+    text = swap.idf_text("SizingPeriod:DesignDay",
+                         index["design_days"]["Ann Htg 99.6% Condns DB"][
+                             "fields"])
+    assert text.startswith("SizingPeriod:DesignDay,\n  Albuquerque")
+    assert text.endswith("  FullResetAtBeginEnvironment;\n")
+
+
+def test_swap_cache_key_ddy(tmp_path):
+    osw, osm, ref, epw = _mk_sim(tmp_path)
+    ddy = tmp_path / "1a.ddy"
+    ddy.write_text("ddy")
+    osw_dict = swap.load_osw(osw)
+    key = swap.swap_cache_key(osw_dict, osm, ref, epw)
+    key_ddy = swap.swap_cache_key(osw_dict, osm, ref, epw, str(ddy))
+    assert key != key_ddy
+    assert key_ddy != swap.swap_cache_key(
+        osw_dict, osm, ref, epw, str(ddy), ["Clg 1%"])
+
+    args = swap.parse_args(["swap", osw, osm, ref, epw, "--ddy", str(ddy),
+                            "--ddy-select", "Clg 1%"])
+    assert args.ddy == str(ddy) and args.ddy_select == ["Clg 1%"]
+
+
+def test_screen_idf(tmp_path):
+    idf = tmp_path / "in.idf"
+    idf.write_text(
+        "Version,\n  9.6;\n\n"
+        "RunPeriod,\n  Run Period 1,  !- Name\n  1,\n  1,\n  2009,\n"
+        "  12,\n  31,\n  2009,\n  ,\n  Yes,\n  Yes,\n  No,\n  Yes,\n"
+        "  Yes;\n")
+    periods = [{"name": "Screen Week 2", "begin_month": 1, "begin_day": 8,
+                "end_month": 1, "end_day": 14},
+               {"name": "Screen Week 30", "begin_month": 7,
+                "begin_day": 23, "end_month": 7, "end_day": 29}]
+    _ = swap.screen_idf(str(idf), periods)
+    objs = list(swap.iter_idf_objects(str(idf)))
+    run_periods = [f for t, f in objs if t == "RunPeriod"]
+    assert [f[:7] for f in run_periods] == [
+        ["Screen Week 2", "1", "8", "2009", "1", "14", "2009"],
+        ["Screen Week 30", "7", "23", "2009", "7", "29", "2009"]]
+    assert run_periods[0][7:] == ["", "Yes", "Yes", "No", "Yes", "Yes"]
+    assert ("Output:Meter", ["Electricity:Facility", "RunPeriod"]) in objs
+    assert objs[0] == ("Version", ["9.6"])
+
+    # Screening periods are part of the sim cache key
+    osw = swap.dump_osw({"seed_file": "in.idf", "weather_file": "in.idf"},
+                        str(tmp_path / "workflow.osw"))
+    key = swap.sim_cache_key(osw)
+    (tmp_path / swap.SCREEN_FNAME).write_text("{}")
+    assert key != swap.sim_cache_key(osw)
+
+
+def test_estimate_sql_mb():
+    assert swap.report_intervals("Hourly", 365) == 8760
+    assert swap.report_intervals("Zone Timestep", 2, timestep=4) == 192
+    assert swap.report_intervals("Monthly", 365) == 12
+    assert swap.report_intervals("RunPeriod", 365) == 1
+
+    counts = {"zones": 10, "surfaces": 100, "nodes": 50}
+    eui = [(m, None, f) for m, f in swap.OUTPUT_PROFILES["eui-only"]]
+    assert swap.estimate_sql_mb(eui, counts, 365) == swap.SQL_BASE_MB
+    # 10 zones, 1 site x 8760 hrs
+    hourly = [("Zone Mean Air Temperature", "*", "Hourly"),
+              ("Site Outdoor Air Drybulb Temperature", "*", "Hourly")]
+    assert swap.estimate_sql_mb(hourly, counts, 365) == round(
+        swap.SQL_BASE_MB + 11 * 8760 * swap.SQL_ROW_BYTES / 1e6, 1)
+    debug = [(v, "*", f) for v, f in swap.OUTPUT_PROFILES["full-debug"]]
+    assert swap.estimate_sql_mb(debug, counts, 365, timestep=6) > \
+        swap.estimate_sql_mb(hourly, counts, 365) > swap.SQL_BASE_MB
+
+
+def test_swap_cache_key_outputs(tmp_path):
+    osw, osm, ref, epw = _mk_sim(tmp_path)
+    osw_dict = swap.load_osw(osw)
+    key = swap.swap_cache_key(osw_dict, osm, ref, epw)
+    assert key != swap.swap_cache_key(
+        osw_dict, osm, ref, epw, output_profile="eui-only")
+
+    args = swap.parse_args(["swap", osw, osm, ref, epw, "--outputs",
+                            "comfort-hourly"])
+    assert args.outputs == "comfort-hourly"
+    with pytest.raises(SystemExit):
+        _ = swap.parse_args(["swap", osw, osm, ref, epw, "--outputs", "x"])
@@ -0,0 +1,53 @@
+"""Unit tests for sqlite job ledger."""
+
+import swap.ledger as ledger
+
+
+def test_hash_inputs(tmp_path):
+    fpath = tmp_path / "in.osm"
+    fpath.write_text("a")
+    missing = str(tmp_path / "missing.osm")
+    h = ledger.hash_inputs([str(fpath), missing])
+    assert h == ledger.hash_inputs([missing, str(fpath)])
+
+    fpath.write_text("b")
+    assert h != ledger.hash_inputs([str(fpath), missing])
+
+
+def test_ledger_resume(tmp_path):
+    db_fpath = str(tmp_path / "ledger.sqlite")
+    with ledger.Ledger(db_fpath) as led:
+        # Crash leaves job running, so it's not done
+        _ = led.start("1a", "chain", "h0")
+        job_id = led.start("4b", "chain", "h0")
+        led.finish(job_id, "done", 2.0, artifacts={"sql": "a.sql"})
+        job_id = led.start("5a", "chain", "h0")
+        led.finish(job_id, "failed", 1.0, error="fail: boom")
+
+    with ledger.Ledger(db_fpath) as led:
+        assert led.is_done("4b", "chain", "h0")
+        assert not led.is_done("4b", "chain", "h1")  # inputs changed
+        assert not led.is_done("4b", "sim", "h0")
+        assert not led.is_done("1a", "chain", "h0")
+        assert not led.is_done("5a", "chain", "h0")
+
+        rows = led.jobs()
+        assert [row["name"] for row in rows] == ["5a", "4b", "1a"]
+        assert rows[1]["artifacts"] == {"sql": "a.sql"}
+        fails = led.failures()
+        assert {row["name"] for row in fails} == {"1a", "5a"}
+        assert led.slowest(1)[0]["name"] == "4b"
+        assert led.jobs(stage="sim") == []
+
+
+def test_ledger_history(tmp_path):
+    with ledger.Ledger(str(tmp_path / "ledger.sqlite")) as led:
+        feats = {"zones": 2, "surfaces": 10, "timestep": 6, "days": 365}
+        job_id = led.start("4b", "sim", "h0", features=feats)
+        led.finish(job_id, "done", 60.0)
+        job_id = led.start("5a", "sim", "h0", features=feats)
+        led.finish(job_id, "failed", 1.0)
+        _ = led.start("6a", "sim", "h0")
+        assert led.history("sim") == [(feats, 60.0)]
+        assert led.history("chain") == []
+        assert led.jobs()[-1]["features"] == feats
@@ -0,0 +1,151 @@
+"""Unit tests for async sim job queue."""
+
+import os
+import sys
+import time
+import json
+import asyncio
+import swap.orch as orch
+
+
+def _job(name, code="pass", **kwargs):
+    return orch.SimJob(name, [sys.executable, "-c", code], **kwargs)
+
+
+def test_run_jobs(tmp_path):
+    result_fpath = str(tmp_path / "result.json")
+    code = ("import json; json.dump({'outputs': {'sql': 'a.sql'}}, "
+            f"open({result_fpath!r}, 'w'))")
+    jobs = orch.run_jobs(
+        [_job("ok", code, result_fpath=result_fpath,
+              log_fpath=str(tmp_path / "ok.log")),
+         _job("fail", "import sys; sys.exit(3)")])
+    ok, fail = jobs
+    assert ok.state == "done" and ok.returncode == 0
+    assert ok.outputs == {"sql": "a.sql"}
+    assert fail.state == "failed" and fail.returncode == 3
+    assert fail.attempts == 1
+
+
+def test_run_jobs_retry(tmp_path):
+    # Fails first attempt, succeeds on retry
+    flag = tmp_path / "flag"
+    code = (f"import os, sys; p = {str(flag)!r}; "
+            "sys.exit(0) if os.path.exists(p) else open(p, 'w')")
+    code += "; sys.exit(1)"
+    job, = orch.run_jobs([_job("retry", code)], retries=2)
+    assert job.state == "done", job
+    assert job.attempts == 2
+
+    job, = orch.run_jobs([_job("fail", "raise SystemExit(1)")], retries=1)
+    assert job.state == "failed"
+    assert job.attempts == 2
+
+
+def test_max_jobs(tmp_path):
+    # Each job logs start, end; with max_jobs=1 they can't overlap
+    log_fpath = tmp_path / "order.log"
+    code = ("import time; f = open({!r}, 'a'); f.write('s'); f.flush(); "
+            "time.sleep(0.1); f.write('e')").format(str(log_fpath))
+    jobs = orch.run_jobs([_job(str(i), code) for i in range(3)], max_jobs=1)
+    assert all(job.state == "done" for job in jobs)
+    assert log_fpath.read_text() == "se" * 3
+
+
+def test_cancel():
+    sim_queue = orch.SimQueue(max_jobs=1)
+    sim_queue.add(_job("slow", "import time; time.sleep(30)"))
+    sim_queue.add(_job("queued"))
+
+    async def _run():
+        task = asyncio.ensure_future(sim_queue.run())
+        while "slow" not in sim_queue._procs:
+            await asyncio.sleep(0.01)
+        sim_queue.cancel("queued")
+        sim_queue.cancel("slow")
+        return await task
+
+    slow, queued = asyncio.run(_run())
+    assert slow.state == "cancelled" and slow.seconds < 30
+    assert queued.state == "cancelled" and queued.attempts == 0
+
+
+def test_sim_job(tmp_path):
+    osw_fpath = str(tmp_path / "workflow.osw")
+    job = orch.sim_job(osw_fpath, name="1a")
+    assert job.name == "1a"
+    assert job.cmds[2:4] == ["sim", osw_fpath]
+    assert "--quiet" not in job.cmds
+    assert job.result_fpath == str(tmp_path / "sim_result.json")
+
+
+def test_admit(monkeypatch):
+    monkeypatch.setattr(orch, "load_avg", lambda: 0.0)
+    monkeypatch.setattr(orch, "avail_mem_mb", lambda: 4096.0)
+    sim_queue = orch.SimQueue(cpus=[0, 1, 2, 3])
+    big = _job("big", threads=3)
+    small = _job("small", threads=2)
+    assert sim_queue._can_admit(big)
+    asyncio.run(sim_queue._admit(big))
+    assert big.cpus == [0, 1, 2]
+    assert not sim_queue._can_admit(small)  # 1 cpu free
+
+    # Load from other users throttles admission
+    sim_queue._release(big)
+    asyncio.run(sim_queue._admit(_job("one")))
+    assert sim_queue._can_admit(small)
+    monkeypatch.setattr(orch, "load_avg", lambda: 3.0)
+    assert not sim_queue._can_admit(small)
+
+    # Low memory too
+    monkeypatch.setattr(orch, "load_avg", lambda: 0.0)
+    monkeypatch.setattr(orch, "avail_mem_mb", lambda: 1024.0)
+    assert not sim_queue._can_admit(small)
+
+
+def test_pin_threads(tmp_path):
+    out_fpath = str(tmp_path / "out.json")
+    code = ("import os, json; json.dump([os.environ['OMP_NUM_THREADS'], "
+            "sorted(os.sched_getaffinity(0)) if hasattr(os, "
+            f"'sched_getaffinity') else None], open({out_fpath!r}, 'w'))")
+    cpus = orch.affinity_cpus()
+    job, = orch.run_jobs([_job("pin", code, threads=2)])
+    assert job.state == "done"
+    with open(out_fpath) as f:
+        threads, affinity = json.load(f)
+    assert threads == str(min(2, len(cpus)))
+    if affinity is not None:
+        assert affinity == cpus[:2]
+
+
+def test_cancel_kills_sim(tmp_path):
+    # Fake openstudio that sleeps in the session swap.py sim gives it
+    pid_fpath = tmp_path / "ops.pid"
+    ops_exe = tmp_path / "ops.sh"
+    ops_exe.write_text(f"#!/bin/sh\necho $$ > {pid_fpath}\nexec sleep 30\n")
+    ops_exe.chmod(0o755)
+    osw_fpath = tmp_path / "workflow_swap.osw"
+    osw_fpath.write_text("{}")
+    job = orch.sim_job(str(osw_fpath), name="sim")
+    job.cmds += ["--ops-exe", str(ops_exe), "--no-cache"]
+    sim_queue = orch.SimQueue(max_jobs=1)
+    sim_queue.add(job)
+
+    async def _run():
+        task = asyncio.ensure_future(sim_queue.run())
+        while not pid_fpath.exists() or not pid_fpath.read_text():
+            await asyncio.sleep(0.05)
+        sim_queue.cancel("sim")
+        return await task
+
+    job, = asyncio.run(_run())
+    assert job.state == "cancelled" and job.seconds < 30
+    pid = int(pid_fpath.read_text())
+    for _ in range(50):
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            break
+        time.sleep(0.1)
+    else:
+        raise AssertionError(f"sim {pid} still running")
@@ -0,0 +1,95 @@
+"""Unit tests for sim run time predictor."""
+
+import swap.orch as orch
+import swap.predict as predict
+
+OSM = """
+OS:Version,
+  {0}, !- Handle
+  3.2.0; !- Version Identifier
+
+OS:Timestep,
+  {1}, !- Handle
+  4; !- Number of Timesteps per Hour
+
+OS:SimulationControl,
+  {2}, !- Handle
+  , !- Do Zone Sizing Calculation
+  , !- Do System Sizing Calculation
+  , !- Do Plant Sizing Calculation
+  No, !- Run Simulation for Sizing Periods
+  {run_periods}; !- Run Simulation for Weather File Run Periods
+
+OS:RunPeriod,
+  {3}, !- Handle
+  Run Period 1, !- Name
+  1, !- Begin Month
+  1, !- Begin Day of Month
+  1, !- End Month
+  31; !- End Day of Month
+
+OS:SizingPeriod:DesignDay,
+  {4}, !- Handle
+  Htg 99.6% Condns DB; !- Name
+
+OS:ThermalZone,
+  {5}, !- Handle
+  Zone 1; !- Name
+
+OS:Surface,
+  {6}, !- Handle
+  Face 0; !- Name
+
+OS:Surface,
+  {7}, !- Handle
+  Face 1; !- Name
+"""
+
+
+def _osm(tmp_path, run_periods="Yes"):
+    fpath = tmp_path / "in.osm"
+    fpath.write_text(OSM.replace("{run_periods}", run_periods),
+                     encoding="latin-1")
+    return str(fpath)
+
+
+def test_osm_features(tmp_path):
+    feats = predict.osm_features(_osm(tmp_path), cz="4b")
+    assert feats == {"zones": 1, "surfaces": 2, "timestep": 4, "days": 32,
+                     "cz": "4b"}
+    assert predict.osm_work(feats) == 4 * 24 * 32 * 3
+
+    # Design day only run
+    feats = predict.osm_features(_osm(tmp_path, "No"))
+    assert feats["days"] == 1
+
+
+def test_duration_model():
+    feats = [{"zones": z, "surfaces": 9 * z, "timestep": 6, "days": 365}
+             for z in (1, 2, 4)]
+    history = [(f, 5.0 + 1e-4 * predict.osm_work(f)) for f in feats]
+    model = predict.DurationModel.fit(history)
+    assert abs(model.a - 5.0) < 1e-6 and abs(model.b - 1e-4) < 1e-9
+    assert model.predict(feats[0]) == history[0][1]
+
+    # One run, rate from it; no runs, default rate
+    model = predict.DurationModel.fit(history[:1])
+    assert model.predict(feats[0]) == history[0][1]
+    assert predict.DurationModel.fit([]).b == predict.SECS_PER_WORK
+
+
+def test_order_jobs():
+    jobs = [orch.SimJob(n, [], est_seconds=e)
+            for n, e in (("a", 10.0), ("b", 30.0), ("c", 20.0))]
+    assert [j.name for j in predict.order_jobs(jobs)] == ["b", "c", "a"]
+    assert [j.name for j in predict.order_jobs(jobs, "sjf")] == \
+        ["a", "c", "b"]
+    assert predict.order_jobs(jobs, "fifo") == jobs
+    # Any items, w/ their estimates from est
+    est = {"1a": 5.0, "4b": 50.0, "7": None}
+    assert predict.order_jobs(list(est), est=est.get) == ["4b", "1a", "7"]
+
+    sim_queue = orch.SimQueue(max_jobs=2)
+    for job in jobs:
+        sim_queue.add(job)
+    assert sim_queue.eta() == 30.0  # (10 + 30 + 20) / 2
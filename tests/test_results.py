@@ -0,0 +1,179 @@
+"""Unit tests for columnar eplusout.sql extraction."""
+
+import os
+import gzip
+import shutil
+import sqlite3
+import numpy as np
+import pytest
+import swap.results as results
+
+
+def _mk_sql(sql_fpath, series, hours=48, tabular=None):
+    """Fake eplusout.sql w/ E+ schema, series {(key, name, freq): values}.
+
+    Hourly vars get hours values, Monthly vars one per time step. Time
+    also has design day rows and a warmup row, which aren't reported.
+    """
+    conn = sqlite3.connect(sql_fpath)
+    conn.executescript(
+        "CREATE TABLE Time (TimeIndex INTEGER PRIMARY KEY, Year INTEGER, "
+        "Month INTEGER, Day INTEGER, Hour INTEGER, Minute INTEGER, "
+        "Dst INTEGER, Interval INTEGER, IntervalType INTEGER, "
+        "SimulationDays INTEGER, DayType TEXT, "
+        "EnvironmentPeriodIndex INTEGER, WarmupFlag INTEGER);"
+        "CREATE TABLE ReportDataDictionary (ReportDataDictionaryIndex "
+        "INTEGER PRIMARY KEY, IsMeter INTEGER, Type TEXT, IndexGroup TEXT, "
+        "TimestepType TEXT, KeyValue TEXT, Name TEXT, "
+        "ReportingFrequency TEXT, ScheduleName TEXT, Units TEXT);"
+        "CREATE TABLE ReportData (ReportDataIndex INTEGER PRIMARY KEY, "
+        "TimeIndex INTEGER, ReportDataDictionaryIndex INTEGER, Value REAL);"
+        "CREATE TABLE TabularDataWithStrings (ReportName TEXT, "
+        "ReportForString TEXT, TableName TEXT, RowName TEXT, "
+        "ColumnName TEXT, Units TEXT, Value TEXT);")
+    conn.execute("INSERT INTO Time (Month, Day, Hour, Minute, IntervalType, "
+                 "EnvironmentPeriodIndex, WarmupFlag) "
+                 "VALUES (1, 1, 1, 0, 1, 3, 1)")
+    hourly = []
+    for h in range(hours):
+        cur = conn.execute(
+            "INSERT INTO Time (Month, Day, Hour, Minute, IntervalType, "
+            "EnvironmentPeriodIndex, WarmupFlag) VALUES (1, ?, ?, 0, 1, 3, 0)",
+            (h // 24 + 1, h % 24 + 1))
+        hourly.append(cur.lastrowid)
+        # Interleaved monthly rows, like E+ writes them
+        if h == hours // 2:
+            cur = conn.execute(
+                "INSERT INTO Time (Month, IntervalType, "
+                "EnvironmentPeriodIndex) VALUES (1, 3, 3)")
+            monthly = [cur.lastrowid]
+    for i, ((key, name, freq), vals) in enumerate(series.items()):
+        conn.execute(
+            "INSERT INTO ReportDataDictionary (ReportDataDictionaryIndex, "
+            "IsMeter, KeyValue, Name, ReportingFrequency, Units) "
+            "VALUES (?, ?, ?, ?, ?, 'J')",
+            (i + 10, int(":" in name), key, name, freq))
+        times = hourly if freq == "Hourly" else monthly
+        conn.executemany(
+            "INSERT INTO ReportData (TimeIndex, ReportDataDictionaryIndex, "
+            "Value) VALUES (?, ?, ?)",
+            [(t, i + 10, v) for t, v in zip(times, vals)])
+    for (table, row, col), v in (tabular or {}).items():
+        conn.execute(
+            "INSERT INTO TabularDataWithStrings VALUES ('Report', "
+            "'Entire Facility', ?, ?, ?, 'GJ', ?)", (table, row, col, v))
+    conn.commit()
+    conn.close()
+    return sql_fpath
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_build_store(tmp_path, workers):
+    hours = np.arange(48, dtype=float)
+    sql_a = _mk_sql(str(tmp_path / "a.sql"), {
+        (None, "Electricity:Facility", "Hourly"): hours * 10,
+        ("ZONE 1", "Zone Mean Air Temperature", "Hourly"): hours + 20,
+        ("ZONE 2", "Zone Mean Air Temperature", "Hourly"): hours + 21,
+        (None, "Electricity:Facility", "Monthly"): [480.0]},
+        tabular={("End Uses", "Total End Uses", "Electricity"): " 12.5",
+                 ("End Uses", "Total End Uses", "Comment"): "n/a"})
+    # Shorter run w/o ZONE 2
+    sql_b = _mk_sql(str(tmp_path / "b.sql"), {
+        (None, "Electricity:Facility", "Hourly"): hours[:24] * 20,
+        ("ZONE 1", "Zone Mean Air Temperature", "Hourly"): hours[:24]},
+        hours=24, tabular={("End Uses", "Total End Uses", "Electricity"): 7})
+
+    store_dpath = results.build_store(
+        {"a": sql_a, "b": sql_b}, str(tmp_path / "store"), workers=workers)
+    store = results.ResultStore(store_dpath)
+    assert store.runs == ["a", "b"]
+    assert set(store.manifest["freqs"]) == {"Hourly", "Monthly"}
+
+    elec = store.series("Electricity:Facility")
+    assert elec.shape == (2, 48)
+    assert np.array_equal(elec[0], hours * 10)
+    assert np.array_equal(elec[1, :24], hours[:24] * 20)
+    assert np.isnan(elec[1, 24:]).all()
+    zone2 = store.series("Zone Mean Air Temperature", key="zone 2")
+    assert np.array_equal(zone2[0], hours + 21) and np.isnan(zone2[1]).all()
+    with pytest.raises(KeyError):
+        _ = store.series("Zone Mean Air Temperature")
+    assert store.series("Electricity:Facility", freq="Monthly")[0, 0] == 480
+
+    # Warmup rows skipped, hour 1-24 of day 1, 2
+    times = store.times()
+    assert times["day"][0, 24] == 2 and times["hour"][0, 24] == 1
+    assert times["env"][1, 0] == 3 and times["month"][1, 30] == -1
+    assert store.times("Monthly")["minute"][0, 0] == -1
+
+    elec_gj = store.tabular("End Uses", "Total End Uses", "Electricity")
+    assert elec_gj.tolist() == [12.5, 7.0]
+    with pytest.raises(KeyError):
+        _ = store.tabular("End Uses", "Total End Uses", "Comment")
+    assert isinstance(store.values(), np.memmap)
+
+
+def test_bench_extract(tmp_path):
+    sql = _mk_sql(str(tmp_path / "a.sql"), {
+        (None, "Electricity:Facility", "Hourly"): np.arange(48.0)})
+    secs = results.bench_extract(sql)
+    assert set(secs) == {"rows", "columnar"}
+
+
+@pytest.mark.parametrize("retention", ["keep", "archive", "drop"])
+def test_compact_run(tmp_path, retention):
+    hours = np.arange(48, dtype=float)
+    run_dpath = tmp_path / "run"
+    run_dpath.mkdir()
+    sql = _mk_sql(str(run_dpath / "eplusout.sql"), {
+        (None, "Electricity:Facility", "Hourly"): hours * 10,
+        ("ZONE 1", "Zone Mean Air Temperature", "Hourly"): hours + 20,
+        ("ZONE 1", "Zone Air Relative Humidity", "Hourly"): hours,
+        (None, "Electricity:Facility", "Monthly"): [480.0]},
+        tabular={("End Uses", "Total End Uses", "Electricity"): "12.5"})
+    for fname in ("in.idf", "eplusout.eso", "eplustbl.htm", "eplusout.err"):
+        (run_dpath / fname).write_text(fname)
+    # Sim cache entry of the run (swap.py run_sim)
+    cache_dpath = tmp_path / "cache"
+    cache_dpath.mkdir()
+    shutil.copy(sql, cache_dpath / "eplusout.sql")
+    with pytest.raises(ValueError):
+        _ = results.compact_run(sql, retention="delete")
+    manifest = results.compact_run(
+        sql, names=["Electricity:Facility", "zone mean air temperature"],
+        retention=retention, cache_dpath=str(cache_dpath))
+    assert [v[1] for v in manifest["freqs"]["Hourly"]["vars"]] == [
+        "Electricity:Facility", "Zone Mean Air Temperature"]
+
+    run = results.CompactRun(str(run_dpath))
+    assert np.array_equal(run.series("Electricity:Facility"), hours * 10)
+    assert np.array_equal(
+        run.series("Zone Mean Air Temperature", key="Zone 1"), hours + 20)
+    assert run.series("Electricity:Facility", freq="Monthly")[0] == 480
+    assert run.times()["hour"][23] == 24
+    assert run.tabular("End Uses", "Total End Uses", "Electricity") == 12.5
+    with pytest.raises(KeyError):
+        _ = run.series("Zone Air Relative Humidity")
+
+    fnames = set(os.listdir(run_dpath))
+    assert {"results.npz", "results.json", "eplusout.err"} <= fnames
+    if retention == "keep":
+        assert {"eplusout.sql", "in.idf", "eplusout.eso",
+                "eplustbl.htm"} <= fnames
+        secs = results.bench_load(sql, "Zone Mean Air Temperature", "zone 1")
+        assert set(secs) == {"sql", "compact"}
+    else:
+        assert not {"eplusout.sql", "in.idf", "eplusout.eso",
+                    "eplustbl.htm"} & fnames
+        assert manifest["raw"]["eplusout.sql"] == (
+            "archived" if retention == "archive" else "dropped")
+    if retention == "archive":
+        with gzip.open(run_dpath / "in.idf.gz", "rt") as f:
+            assert f.read() == "in.idf"
+
+    # Cache entry has the compacted results, raw sql per retention
+    cached = set(os.listdir(cache_dpath))
+    assert {"results.npz", "results.json"} <= cached
+    assert ("eplusout.sql" in cached) == (retention == "keep")
+    assert ("eplusout.sql.gz" in cached) == (retention == "archive")
+    assert not [f for f in cached if ".tmp" in f]
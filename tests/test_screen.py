@@ -0,0 +1,123 @@
+"""Unit tests for representative period screening."""
+
+import os
+import json
+import shutil
+import sqlite3
+import swap.epw as epw_
+import swap.screen as screen
+
+EPW_FPATH = os.path.join(
+    os.path.dirname(__file__), "../resources/weather",
+    "USA_AZ_Tucson-Davis-Monthan.AFB.722745_TMY3.epw")
+
+
+def test_select_periods():
+    epw = epw_.load_epw(EPW_FPATH, cache=False)
+    periods = screen.select_periods(epw, n=5)
+    assert len(periods) == 5
+    assert abs(sum(p["weight"] * p["days"] for p in periods) - 365) < 1e-9
+    p = periods[0]
+    assert p["name"] == f"Screen Week {p['index'] + 1}"
+    h0 = p["index"] * 168
+    assert (p["begin_month"], p["begin_day"]) == \
+        (epw["month"][h0], epw["day"][h0])
+    # >10x fewer days, annual weather totals w/in 10%
+    assert 365 / sum(p["days"] for p in periods) > 10
+    errs = screen.weather_error(epw, periods)
+    assert all(abs(v) < 10 for v in errs.values())
+
+    # Every day is its own cluster: exact
+    periods = screen.select_periods(epw, n=365, kind="day")
+    assert all(v == 0 for v in
+               screen.weather_error(epw, periods, "day").values())
+
+
+def test_sim_days():
+    # Warmup of each period and design day dominates short periods
+    assert screen.sim_days([7] * 5) == 5 * 13
+    assert screen.sim_days([1] * 35, design_days=2) == 35 * 7 + 2 * 7
+    assert screen.sim_days([365], 2) / screen.sim_days([1] * 35, 2) < 2
+
+
+def _mk_sql(sql_fpath, envs, end_uses=None):
+    """Fake eplusout.sql w/ RunPeriod meters {env: {meter: J}}."""
+    conn = sqlite3.connect(sql_fpath)
+    conn.executescript(
+        "CREATE TABLE EnvironmentPeriods (EnvironmentPeriodIndex INTEGER, "
+        "EnvironmentName TEXT);"
+        "CREATE TABLE Time (TimeIndex INTEGER, EnvironmentPeriodIndex "
+        "INTEGER);"
+        "CREATE TABLE ReportDataDictionary (ReportDataDictionaryIndex "
+        "INTEGER, IsMeter INTEGER, Name TEXT, ReportingFrequency TEXT);"
+        "CREATE TABLE ReportData (TimeIndex INTEGER, "
+        "ReportDataDictionaryIndex INTEGER, Value REAL);"
+        "CREATE TABLE TabularDataWithStrings (ReportName TEXT, "
+        "TableName TEXT, RowName TEXT, ColumnName TEXT, Units TEXT, "
+        "Value TEXT);")
+    meters = sorted({m for env in envs.values() for m in env})
+    for i, m in enumerate(meters):
+        conn.execute("INSERT INTO ReportDataDictionary VALUES (?, 1, ?, "
+                     "'Run Period')", (i, m))
+    for i, (env, vals) in enumerate(envs.items()):
+        conn.execute("INSERT INTO EnvironmentPeriods VALUES (?, ?)",
+                     (i, env))
+        conn.execute("INSERT INTO Time VALUES (?, ?)", (i, i))
+        for m, v in vals.items():
+            conn.execute("INSERT INTO ReportData VALUES (?, ?, ?)",
+                         (i, meters.index(m), v))
+    for fuel, v in (end_uses or {}).items():
+        conn.execute(
+            "INSERT INTO TabularDataWithStrings VALUES ('AnnualBuilding"
+            "UtilityPerformanceSummary', 'End Uses', 'Total End Uses', ?, "
+            "'GJ', ?)", (fuel, str(v)))
+    conn.commit()
+    conn.close()
+
+
+def test_screen_report(tmp_path):
+    # Seed osw in its own dir, w/ relative paths
+    sim_dpath = tmp_path / "run"
+    sim_dpath.mkdir()
+    epw_fpath = str(sim_dpath / "1a.epw")
+    shutil.copyfile(EPW_FPATH, epw_fpath)
+    # Seed w/ 2 sizing design days
+    with open(sim_dpath / "in_swap.osm", "w") as f:
+        f.write("OS:SizingPeriod:DesignDay,\n  {1}, !- Handle\n  Htg;\n"
+                "OS:SizingPeriod:DesignDay,\n  {2}, !- Handle\n  Clg;\n"
+                "OS:RunPeriod,\n  {3};\n")
+    osw_fpath = str(sim_dpath / "workflow_swap.osw")
+    with open(osw_fpath, "w") as f:
+        json.dump({"seed_file": "in_swap.osm", "weather_file": "1a.epw",
+                   "measure_paths": ["../measures"]}, f)
+
+    screen_osw = screen.write_screen(osw_fpath, epw_fpath, n=2)
+    assert screen_osw == str(sim_dpath / "screen" / "workflow_swap.osw")
+    with open(screen_osw, "r") as f:
+        osw_dict = json.load(f)
+    assert osw_dict["seed_file"] == str(sim_dpath / "in_swap.osm")
+    assert osw_dict["measure_paths"] == [str(sim_dpath / "../measures")]
+    screen_fpath = str(sim_dpath / "screen" / screen.SCREEN_FNAME)
+    with open(screen_fpath, "r") as f:
+        screen_dict = json.load(f)
+    periods = screen_dict["periods"]
+    assert screen_dict["design_days"] == 2
+    # 2 weeks + 2 design days, each w/ 6 warmup days, vs 365 + the same
+    assert screen_dict["sim_days"] == 2 * 13 + 2 * 7
+    assert screen_dict["speedup_days"] == round((371 + 14) / 40, 1)
+
+    # 1 GJ elec, 0.5 GJ gas per period, env names uppercased by E+
+    sql_fpath = str(tmp_path / "eplusout.sql")
+    _mk_sql(sql_fpath, {p["name"].upper(): {
+        "Electricity:Facility": 1e9, "NaturalGas:Facility": 5e8}
+        for p in periods})
+    ref_fpath = str(tmp_path / "ref.sql")
+    w = sum(p["weight"] for p in periods)
+    _mk_sql(ref_fpath, {}, {"Electricity": w, "Natural Gas": w / 4,
+                            "Water": 5.0})
+    report = screen.screen_report(sql_fpath, screen_fpath, ref_fpath)
+    assert abs(report["annual_gj"]["Electricity"] - w) < 1e-9
+    assert report["ref_gj"]["Total"] == w * 1.25
+    assert report["error_pct"]["Electricity"] == 0.0
+    assert report["error_pct"]["Natural Gas"] == 100.0
+    assert report["error_pct"]["Total"] == 20.0
@@ -0,0 +1,72 @@
+"""Unit tests for the Grasshopper swap component, w/o honeybee."""
+
+import io
+import os
+import sys
+import time
+import types
+import importlib
+import pytest
+
+pytestmark = pytest.mark.skipif(os.name == "nt", reason="uses sh, setsid")
+
+
+@pytest.fixture
+def swap_gh(monkeypatch):
+    """Import swap.swap_gh w/ honeybee, ladybug_rhino stubbed."""
+    stubs = {"honeybee.config": {"folders": object()},
+             "honeybee_energy.config": {"folders": object()},
+             "honeybee_energy.measure": {"Measure": object},
+             "ladybug_rhino.download": {"download_file": None}}
+    for name, attrs in stubs.items():
+        for mod_name in (name.split(".")[0], name):
+            if mod_name not in sys.modules:
+                monkeypatch.setitem(
+                    sys.modules, mod_name, types.ModuleType(mod_name))
+        for k, v in attrs.items():
+            monkeypatch.setattr(sys.modules[name], k, v, raising=False)
+    # Not run as the CLI component
+    monkeypatch.setattr(sys, "argv", ["swap_gh.py"])
+    monkeypatch.setattr(sys, "stdin", io.StringIO())
+    monkeypatch.delitem(sys.modules, "swap.swap_gh", raising=False)
+    return importlib.import_module("swap.swap_gh")
+
+
+def _alive(pid):
+    status_fpath = f"/proc/{pid}/status"
+    return os.path.exists(status_fpath) and \
+        "zombie" not in open(status_fpath).read()
+
+
+def test_run_subproc_timeout(swap_gh, tmp_path):
+    # Child spawns its own sleeping child, like openstudio w/ energyplus
+    pid_fpath = tmp_path / "child.pid"
+    log_fpath = str(tmp_path / "sim.log")
+    cmds = ["sh", "-c", f"sleep 30 & echo $! > {pid_fpath}; echo started; "
+            "sleep 30"]
+    t0 = time.time()
+    result = swap_gh.run_subproc(cmds, log_fpath=log_fpath, timeout=1,
+                                 check=False)
+    assert result.timed_out and not result.mem_killed
+    assert time.time() - t0 < 10
+    assert result.stdout == b"started\n"
+    # Grandchild was killed, SIGKILL lands async
+    pid = int(pid_fpath.read_text())
+    if os.path.exists("/proc"):
+        for _ in range(50):
+            if not _alive(pid):
+                break
+            time.sleep(0.1)
+        assert not _alive(pid)
+    # Readers closed the log once the pipes did
+    with open(log_fpath, "rb") as f:
+        assert f.read() == b"started\n"
+
+
+def test_run_subproc_check(swap_gh):
+    result = swap_gh.run_subproc(["sh", "-c", "echo out; echo err >&2"],
+                                 tail=1)
+    assert result.returncode == 0 and not result.timed_out
+    assert result.stdout == b"out\n" and result.stderr == b"err\n"
+    with pytest.raises(AssertionError):
+        swap_gh.run_subproc(["sh", "-c", "exit 3"])
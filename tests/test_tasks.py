@@ -86,3 +86,67 @@ def test_path_relpath():
 
 
 
+
+
+def test_find_czs(tmp_path):
+
+    for d in ["rep_doe_1a", "rep_doe_4b", "ref_doe_1a"]:
+        (tmp_path / d).mkdir()
+    (tmp_path / "rep_doe_null.txt").write_text("")
+
+    czs = tasks.find_czs(str(tmp_path))
+    assert czs == ["1a", "4b"], czs
+
+
+def test_run_chain_fail(monkeypatch, tmp_path):
+
+    # Missing sim dir is reported, not raised
+    monkeypatch.setattr(tasks, "SIM_GH_DPATH", str(tmp_path))
+    cz, status, dt = tasks.run_chain("1a")
+    assert cz == "1a"
+    assert status.startswith("fail: FileNotFoundError"), status
+    assert dt >= 0.0
+
+
+def test_stamp_stale(tmp_path):
+
+    fin, fout = tmp_path / "in.osm", tmp_path / "in_swap.osm"
+    fin.write_text("v1")
+    ins, outs = [Path(str(fin))], [Path(str(fout))]
+    stamp = Path(str(tmp_path / ".stamp" / "run_swap.json"))
+
+    # No stamp yet
+    assert tasks.is_stale(stamp, ins, outs)
+
+    # Stamp after run, then fresh
+    fout.write_text("swapped")
+    tasks.save_stamp(stamp, ins, outs)
+    assert not tasks.is_stale(stamp, ins, outs)
+
+    # Changed input, or deleted output is stale
+    fin.write_text("v2")
+    assert tasks.is_stale(stamp, ins, outs)
+    tasks.save_stamp(stamp, ins, outs)
+    fout.unlink()
+    assert tasks.is_stale(stamp, ins, outs)
+
+
+def test_compact_runs_skip(monkeypatch, tmp_path, capsys):
+
+    # 1a never ran, 4b has a sql but its swap inputs are gone
+    monkeypatch.setattr(tasks, "SIM_CLI_DPATH", str(tmp_path))
+    run_dpath = tmp_path / "rep_doe_4b" / "openstudio" / "run" / "run"
+    run_dpath.mkdir(parents=True)
+    (run_dpath / "eplusout.sql").write_text("")
+    compacted = []
+
+    def _compact_run(run_dpath, retention, names):
+        compacted.append(run_dpath.path)
+        return {"sql_size": 0, "bytes": 0, "raw": {}}
+
+    monkeypatch.setattr(tasks, "_compact_run", _compact_run)
+    tasks.compact_runs(tasks.Context(), czs="1a,4b")
+    assert compacted == [str(run_dpath)]
+    assert "Skip 1a" in capsys.readouterr().out
+    # Stale w/o inputs, so no stamp
+    assert not tasks.stamp_path("4b", "run_sim").exists()